@@ -0,0 +1,117 @@
+"""
+Micro-benchmark for JSON extraction from noisy LLM output.
+
+Compares the single-pass extractor (`services.json_extract.extract_json`) with the
+previous regex + brace-scan implementation on outputs shaped like what the
+providers actually return. Run from the project root:
+
+    python benchmarks/bench_extract_json.py [--repeat N]
+"""
+import argparse
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tabulate import tabulate  # noqa: E402
+
+from model.classes import Regulative  # noqa: E402
+from services.json_extract import extract_json, matches_model  # noqa: E402
+
+ANSWER = {
+    "A": ["commission"],
+    "D": ["shall"],
+    "I": ["optimize"],
+    "Bdir": ["investment"],
+    "Bdir,p": ["public"],
+    "Cac": ["in accordance with {section 4} of the \"Act\""],
+}
+
+
+def legacy_extract_json(raw: str) -> Any:
+    """The extractor used before the single-pass scanner, kept as the baseline."""
+    if not raw.strip():
+        raise json.JSONDecodeError("Empty input", raw, 0)
+    raw = re.sub(r"^```json\s*", "", raw.strip(), flags=re.IGNORECASE)
+    raw = re.sub(r"```$", "", raw.strip())
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        pass
+    brace_stack = []
+    json_start = None
+    for idx, ch in enumerate(raw):
+        if ch == '{':
+            if not brace_stack:
+                json_start = idx
+            brace_stack.append(ch)
+        elif ch == '}':
+            if brace_stack:
+                brace_stack.pop()
+                if not brace_stack:
+                    try:
+                        return json.loads(raw[json_start:idx + 1])
+                    except json.JSONDecodeError:
+                        pass
+    raise json.JSONDecodeError("No valid JSON object found in output", raw, 0)
+
+
+def reasoning_text(paragraphs: int) -> str:
+    """deepseek-reasoner style preamble with braces and quotes in the prose."""
+    paragraph = (
+        "Let me think about the attribute. The phrase \"the commission\" is the actor; "
+        "a set like {A, D, I} is required, and {x} marks a placeholder. "
+        "Considering the condition {in accordance with section 4} as Cac.\n"
+    )
+    return paragraph * paragraphs
+
+
+def cases() -> Dict[str, str]:
+    answer = json.dumps(ANSWER, indent=2)
+    return {
+        "bare JSON": answer,
+        "fenced JSON": f"```json\n{answer}\n```",
+        "chatty prefix/suffix": f"Sure! Here are the components:\n{answer}\nLet me know if you need more.",
+        "reasoning 5 KB": reasoning_text(25) + answer,
+        "reasoning 100 KB": reasoning_text(500) + answer,
+        "unbalanced prose brace 20 KB": "Note: the set {A, D " + reasoning_text(100) + answer,
+        "400 unmatched prose braces 10 KB": "Note: the set {A, D and {x " * 400 + answer,
+    }
+
+
+def main(repeat: int) -> None:
+    accept = matches_model(Regulative)
+    extractors: Dict[str, Callable[[str], Any]] = {
+        "legacy": legacy_extract_json,
+        "single-pass": lambda raw: extract_json(raw, accept),
+    }
+    rows = []
+    for name, raw in cases().items():
+        row = [name, f"{len(raw) / 1024:.1f}"]
+        for label, fn in extractors.items():
+            try:
+                ok = fn(raw) == ANSWER
+            except json.JSONDecodeError:
+                ok = False
+            seconds = min(timeit.repeat(lambda: _safe(fn, raw), number=repeat, repeat=3)) / repeat
+            row.append(f"{seconds * 1e6:,.1f}" + ("" if ok else " (wrong)"))
+        rows.append(row)
+    headers = ["Output", "KB"] + [f"{label} (µs)" for label in extractors]
+    print(tabulate(rows, headers=headers, tablefmt="github"))
+
+
+def _safe(fn: Callable[[str], Any], raw: str) -> Any:
+    try:
+        return fn(raw)
+    except json.JSONDecodeError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    main(parser.parse_args().repeat)
@@ -0,0 +1,89 @@
+"""
+Startup-time benchmark for the evaluation CLI.
+
+Times `import evaluate` in fresh interpreters (what a metrics-only re-run of
+cached results pays before doing any work), lists which heavy modules the
+import pulls in, and compares rendering the system prompt cold (LangChain
+template build) with a warm start from the rendered-prompt cache. Run from the
+project root:
+
+    python benchmarks/bench_startup.py [--repeat N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tabulate import tabulate  # noqa: E402
+
+HEAVY_MODULES = ("langchain", "langchain_core", "openai", "anthropic", "google.genai", "tqdm")
+
+RENDER = """
+import sys, time
+began = time.perf_counter()
+from evaluate import load_prompts
+from prompt_templates.registry import render_system_prompt
+fragments = load_prompts("regulative", include_examples=True)
+render_system_prompt(
+    "regulative_with_examples", cache_dir=sys.argv[1], statement_type="regulative",
+    definitions=fragments["definitions"], guidelines=fragments["guidelines"],
+    statement_information=fragments["statement_information"], examples=fragments["examples"],
+)
+print(time.perf_counter() - began, "langchain_core" in sys.modules)
+"""
+
+
+def _run(code: str, *args: str) -> str:
+    out = subprocess.run(
+        [sys.executable, "-c", code, *args], cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    return out.stdout.strip()
+
+
+def time_import(repeat: int) -> List[float]:
+    code = "import time; t = time.perf_counter(); import evaluate; print(time.perf_counter() - t)"
+    return [float(_run(code)) for _ in range(repeat)]
+
+
+def loaded_modules() -> List[str]:
+    code = (
+        "import sys, evaluate; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    return [m for m in _run(code).split(",") if m]
+
+
+def time_render(repeat: int) -> List[List[str]]:
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ("cold", "warm"):
+            samples = []
+            for _ in range(repeat if label == "warm" else 1):
+                seconds, langchain = _run(RENDER, cache_dir).split()
+                samples.append(float(seconds))
+            rows.append([
+                f"import + render ({label})",
+                f"{statistics.median(samples) * 1000:,.0f}",
+                "yes" if langchain == "True" else "no",
+            ])
+    return rows
+
+
+def main(repeat: int) -> None:
+    rows = [["import evaluate", f"{statistics.median(time_import(repeat)) * 1000:,.0f}", "-"]]
+    rows += time_render(repeat)
+    print(tabulate(rows, headers=["Step", "Median (ms)", "LangChain loaded"], tablefmt="github"))
+    heavy = loaded_modules()
+    print(f"\nHeavy modules loaded by `import evaluate`: {', '.join(heavy) or 'none'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args().repeat)
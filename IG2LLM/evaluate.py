@@ -1,23 +1,29 @@
+import asyncio
 import json
 import logging
+import os
+import time
+from itertools import islice
 from pathlib import Path
 import sys
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import argparse
 from dotenv import load_dotenv
-from tqdm import tqdm
 from tabulate import tabulate
 
-from services.llm_interface import LLMConfig, LLMInterface
-from util import csv_to_json
-from util.aggregation import aggregate_results
-from metrics import (
-    compute_component_metrics,
-    compute_aggregate_metrics_with_ci
-)
-from model.classes import Regulative, Constitutive
-from prompt_templates.registry import get_template
+from util import iter_csv
+from util.aggregation import IncrementalAggregator, iter_aggregated, min_presence
+from util.checkpoint import Checkpoint
+from util.fuzzy import DEFAULT_THRESHOLD
+from metrics import compute_metrics_with_ci, compute_metrics_with_ci_streaming
+from prompt_templates.builder import PROMPTS_DIR
+from prompt_templates.registry import render_system_prompt
+
+# The provider SDKs and LangChain are only imported when the LLM is actually
+# called, so re-scoring cached results starts quickly (see benchmarks/bench_startup.py)
+if TYPE_CHECKING:
+    from services.llm_interface import LLMInterface
 
 load_dotenv()
 logging.basicConfig(
@@ -35,12 +41,14 @@ def load_prompts(statement_type: str, include_examples: bool) -> Dict[str, str]:
     Read all prompt fragments (definitions, guidelines, examples, statement_information, logical operators)
     and return a dict of their contents.
     """
-    base = Path("prompts")
+    base = PROMPTS_DIR
     fragments = {
         "definitions":            f"{statement_type}_definitions.txt",
         "guidelines":             f"{statement_type}_guidelines.txt",
         "statement_information":  f"{statement_type}_information.txt",
         "logical":                "logical_operator.txt",
+        "packed":                 "packed_instructions.txt",
+        "coded":                  "coded_instructions.txt",
     }
     if include_examples:
         fragments["examples"] = f"{statement_type}_examples.txt"
@@ -57,46 +65,278 @@ def load_prompts(statement_type: str, include_examples: bool) -> Dict[str, str]:
     return contents
 
 
+class ExtractionInterrupted(Exception):
+    """
+    Raised when an extraction run is cancelled (e.g. Ctrl-C) before every statement
+    finished. `completed` holds the finished output rows in input order (empty when
+    the rows were only streamed to `on_result`); `count` is the number of finished rows.
+    """
+    def __init__(self, completed: List[Dict], count: Optional[int] = None):
+        self.completed = completed
+        self.count = len(completed) if count is None else count
+        super().__init__(f"Extraction interrupted after {self.count} statements")
+
+
+async def _extract_all(
+    data: Iterable[Dict],
+    llm: "LLMInterface",
+    system_text: str,
+    runs: int,
+    response_class,
+    lo_prompt: str,
+    concurrency: int,
+    on_result: Callable[[int, Dict], None],
+    adaptive: bool = False,
+    pack: int = 1,
+    packed_system_text: str = "",
+    total: Optional[int] = None,
+    lo_strategy: str = "per-run",
+) -> None:
+    """
+    Extract every statement in `data`, keeping up to `concurrency` statements (or
+    packs of `pack` statements) in flight. `data` is consumed lazily: only a
+    bounded window of statements is read ahead of the calls in flight, so memory
+    does not depend on the corpus size. Each finished row is handed to
+    `on_result` with its input index as soon as it is available.
+
+    With a `lo_prompt`, `lo_strategy` selects how the logical-operator pass runs:
+    "per-run" refines every sampled run (pipelined with the extraction calls),
+    "consensus" runs it once on the aggregated runs, after the statement has
+    released its slot, and stores the result under "consensus".
+    """
+    window = asyncio.Semaphore(concurrency)
+    # Statements read ahead so a free slot never waits for the iterator
+    read_ahead = 2 * max(1, concurrency)
+    # Votes of the statements in flight, fed run by run for adaptive sampling
+    votes = IncrementalAggregator(total_runs=runs)
+
+    def sampling(index: int) -> Dict:
+        if not adaptive:
+            return {}
+
+        def stop_early(results: List[Dict]) -> bool:
+            # `results` only grows, so each run is counted once
+            for result in results[votes.runs(index):]:
+                votes.add_run(index, result)
+            return votes.is_decided(index)
+
+        return dict(stop_early=stop_early, first_wave=min_presence(runs))
+
+    per_run_lo = lo_prompt if lo_strategy == "per-run" else ""
+
+    async def finish(index: int, item: Dict, resp: List[Dict], model: str) -> None:
+        row = {
+            "input":               item["input"],
+            "expected_components": item.get("expected_components"),
+            "results":             resp,
+            "runs_requested":      runs,
+            "runs_used":           len(resp),
+            "model":               model,
+        }
+        if "row" in item:
+            # Input position, keying the checkpoint row (see `util.checkpoint.row_key`)
+            row["row"] = item["row"]
+        if lo_prompt and not per_run_lo:
+            consensus = IncrementalAggregator(total_runs=runs)
+            for result in resp:
+                consensus.add_run(index, result)
+            components = consensus.consensus(index)
+            refined = await llm.arefine(
+                item["input"], components, lo_prompt, response_class
+            ) if components else {}
+            # A router may have failed over to another target for the LO pass
+            if getattr(refined, "target", model) != model:
+                row["lo_model"] = refined.target
+            row["consensus"] = refined
+        on_result(index, row)
+
+    async def extract(batch: List[Tuple[int, Dict]]) -> int:
+        (index, item), = batch
+        async with window:
+            resp = await llm.arun(
+                user_prompt=item["input"],
+                system_prompt=system_text,
+                runs=runs,
+                response_model=response_class,
+                lo_prompt=per_run_lo,
+                **sampling(index),
+            )
+        votes.pop(index)
+        await finish(index, item, resp, getattr(resp, "target", llm.target))
+        return 1
+
+    async def extract_pack(batch: List[Tuple[int, Dict]]) -> int:
+        async with window:
+            resp = await llm.arun_packed(
+                [(str(k + 1), item["input"]) for k, (_, item) in enumerate(batch)],
+                system_prompt=packed_system_text,
+                response_model=response_class,
+                runs=runs,
+                lo_prompt=per_run_lo,
+                pack_size=pack,
+            )
+        model = getattr(resp, "target", llm.target)
+        await asyncio.gather(*(
+            finish(index, item, resp[str(k + 1)], model) for k, (index, item) in enumerate(batch)
+        ))
+        return len(batch)
+
+    batch_size, worker = (pack, extract_pack) if pack > 1 else (1, extract)
+    source = enumerate(data)
+    tasks = set()
+    from tqdm import tqdm
+
+    try:
+        with tqdm(total=total, desc="Extraction", unit="stmt", file=sys.stdout) as bar:
+            while True:
+                while len(tasks) < read_ahead:
+                    batch = list(islice(source, batch_size))
+                    if not batch:
+                        break
+                    tasks.add(asyncio.ensure_future(worker(batch)))
+                if not tasks:
+                    break
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    bar.update(finished.result())
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _prepare_extraction(
+    statement_type: str, include_logic: bool, system_text: str, adaptive: bool, pack: int
+) -> Tuple[type, str, str]:
+    from model.classes import Regulative, Constitutive
+
+    ResponseClass = Regulative if statement_type == "regulative" else Constitutive
+
+    fragments = load_prompts(statement_type, include_examples=False)
+    lo_prompt = fragments["logical"] if include_logic else ""
+    packed_system_text = f"{system_text}\n\n{fragments['packed']}"
+    if pack > 1 and adaptive:
+        logging.warning("Adaptive sampling is not supported with --pack; sampling all runs")
+    return ResponseClass, lo_prompt, packed_system_text
+
+
+def stream_llm_on_data(
+    data: Iterable[Dict],
+    llm: "LLMInterface",
+    system_text: str,
+    runs: int,
+    statement_type: str,
+    on_result: Callable[[Dict], None],
+    include_logic: bool = False,
+    concurrency: int = 1,
+    adaptive: bool = False,
+    pack: int = 1,
+    total: Optional[int] = None,
+    lo_strategy: str = "per-run",
+) -> int:
+    """
+    Streaming variant of `run_llm_on_data`: statements are read lazily from `data`
+    and every finished row is only passed to `on_result` (in completion order),
+    so memory stays constant however many statements are processed. `total` is
+    only used for the progress bar. Returns the number of finished statements;
+    if the run is interrupted, `ExtractionInterrupted.count` carries it.
+    """
+    ResponseClass, lo_prompt, packed_system_text = _prepare_extraction(
+        statement_type, include_logic, system_text, adaptive, pack
+    )
+    finished = 0
+
+    def handle(index: int, row: Dict) -> None:
+        nonlocal finished
+        finished += 1
+        on_result(row)
+
+    try:
+        asyncio.run(_extract_all(
+            data, llm, system_text, runs, ResponseClass, lo_prompt, concurrency, handle,
+            adaptive, pack, packed_system_text, total, lo_strategy,
+        ))
+    except (KeyboardInterrupt, asyncio.CancelledError) as e:
+        raise ExtractionInterrupted([], count=finished) from e
+    return finished
+
+
 def run_llm_on_data(
     data: List[Dict],
-    llm: LLMInterface,
+    llm: "LLMInterface",
     system_text: str,
     runs: int,
     statement_type: str,
     include_logic: bool = False,
+    concurrency: int = 1,
+    on_result: Optional[Callable[[Dict], None]] = None,
+    adaptive: bool = False,
+    pack: int = 1,
+    lo_strategy: str = "per-run",
 ) -> List[Dict]:
     """
     Call the LLM on each statement, tracking progress with tqdm.
-    """
-    output: List[Dict] = []
-    ResponseClass = Regulative if statement_type == "regulative" else Constitutive
 
-    if include_logic:
-        lo_prompt = load_prompts(statement_type, include_examples=False)["logical"]
+    Statements are processed by an asyncio engine with at most `concurrency`
+    statements in flight; the returned list is always in input order. `on_result`
+    is called with each row as soon as its statement finishes. If the run is
+    interrupted, `ExtractionInterrupted` carries the rows that did finish.
 
-    for item in tqdm(data, desc="Extraction", unit="stmt", file=sys.stdout):
+    With `adaptive`, sampling for a statement stops as soon as the majority vote
+    in `aggregate_results` is decided; each row records `runs_requested` and
+    `runs_used`.
 
-        resp = llm.run(
-            user_prompt=item["input"],
-            system_prompt=system_text,
-            runs=runs,
-            response_model=ResponseClass,
-            lo_prompt=(lo_prompt if include_logic else "")
-        )
+    With `pack` > 1, up to `pack` statements are sent per request and answered as
+    one JSON array (adaptive sampling does not apply to packed requests).
 
-        output.append({
-            "input":               item["input"],
-            "expected_components": item.get("expected_components"),
-            "results":             resp,
-        })
-    return output
+    With `include_logic`, `lo_strategy` is "per-run" (LO pass on every run) or
+    "consensus" (one LO pass on the aggregated runs, see `_extract_all`).
+    """
+    ResponseClass, lo_prompt, packed_system_text = _prepare_extraction(
+        statement_type, include_logic, system_text, adaptive, pack
+    )
+    completed: Dict[int, Dict] = {}
+
+    def handle(index: int, row: Dict) -> None:
+        completed[index] = row
+        if on_result is not None:
+            on_result(row)
+
+    try:
+        asyncio.run(_extract_all(
+            data, llm, system_text, runs, ResponseClass, lo_prompt, concurrency, handle,
+            adaptive, pack, packed_system_text, len(data), lo_strategy,
+        ))
+    except (KeyboardInterrupt, asyncio.CancelledError) as e:
+        raise ExtractionInterrupted([completed[i] for i in sorted(completed)]) from e
 
-def save_json(data: List[Dict], path: Path) -> None:
+    return [completed[i] for i in range(len(data))]
+
+def save_jsonl(rows: Iterable[Dict], path: Path) -> int:
+    """
+    Write `rows` to the given JSONL file, one row per line, and return the count.
+    The file is written under a temporary name and renamed when complete, so its
+    existence means the results are final.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    with tmp.open("w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp, path)
+    logging.info("Saved %d results to %s", count, path)
+    return count
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict]:
     """
-    Serialize `data` to the given JSON file.
+    Yield the rows of a JSONL file one at a time.
     """
-    path.write_text(json.dumps(data, indent=4))
-    logging.info("Saved results to %s", path)
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
 
 
 def load_json(path: Path) -> List[Dict]:
@@ -121,13 +361,14 @@ def display_metrics(
 
     # Content-Level
     print("\nContent-Level Metrics:")
-    headers1 = ["Component", "Precision", "Recall", "F1"]
+    headers1 = ["Component", "Precision", "Recall", "F1 (95% CI)"]
     rows1 = [
         [
             comp,
             f"{m.get('precision', 0):.3f}",
             f"{m.get('recall',    0):.3f}",
             f"{m.get('f1',        0):.3f}"
+            + (f" ({m['ci'][0]:.3f} - {m['ci'][1]:.3f})" if "ci" in m else "")
         ]
         for comp, m in component_metrics.items()
     ]
@@ -147,12 +388,101 @@ def display_metrics(
         ])
     print(tabulate(rows2, headers=headers2, tablefmt="github"))
 
+
+def display_telemetry(summary: Dict[str, Dict[str, float]]) -> None:
+    """
+    Display per-call latency, token, retry and cost statistics for this run.
+    """
+    print("\nCall Telemetry:")
+    headers = [
+        "Kind", "Calls", "Cache Hits", "p50 (s)", "p95 (s)", "p99 (s)",
+        "Tokens/Stmt", "Retry Rate", "Parse Failures", "Repaired", "Est. Cost ($)",
+    ]
+    rows = [
+        [
+            kind,
+            s["calls"],
+            s["cache_hits"],
+            f"{s['p50']:.2f}",
+            f"{s['p95']:.2f}",
+            f"{s['p99']:.2f}",
+            f"{s['tokens_per_statement']:.0f}",
+            f"{s['retry_rate']:.1%}",
+            s["parse_failures"],
+            s["repaired"],
+            f"{s['cost']:.4f}",
+        ]
+        for kind, s in summary.items()
+    ]
+    if any(s.get("hedged") for s in summary.values()):
+        # Hedge cost is an upper bound: cancelled duplicates are billed at most like the answer
+        headers += ["Hedged (Won)", "Hedge Cost ($)"]
+        for row, s in zip(rows, summary.values()):
+            row += [f"{s['hedged']} ({s['hedge_wins']})", f"{s['hedge_cost']:.4f}"]
+    if any(s.get("streamed") for s in summary.values()):
+        # Medians over streamed calls; a cut stream was closed once its answer was complete
+        headers += ["TTFT p50 (s)", "JSON p50 (s)", "Streams Cut"]
+        for row, s in zip(rows, summary.values()):
+            row += [
+                "-" if s["ttft_p50"] is None else f"{s['ttft_p50']:.2f}",
+                "-" if s["json_p50"] is None else f"{s['json_p50']:.2f}",
+                f"{s['streams_cut']}/{s['streamed']}",
+            ]
+    print(tabulate(rows, headers=headers, tablefmt="github"))
+
+def display_model_metrics(per_model: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Display the aggregate metrics separately for each provider/model that
+    produced results (rows of a routed run record their `model`).
+    """
+    print("\nAggregate Content-Level Metrics per Model:")
+    headers = ["Model", "Statements", "Type", "Precision", "Recall", "F1 (95% CI)"]
+    rows = [
+        [
+            model, metrics["statements"], agg_type,
+            f"{m['precision']:.3f}",
+            f"{m['recall']:.3f}",
+            f"{m['f1']:.3f} ({m['ci'][0]:.3f} - {m['ci'][1]:.3f})",
+        ]
+        for model, metrics in per_model.items()
+        for agg_type, m in metrics["aggregate"].items()
+    ]
+    print(tabulate(rows, headers=headers, tablefmt="github"))
+
+def _mock_settings(providers: List[str], mock: Optional[Dict[str, Any]], data_csv: Path) -> Dict[str, Any]:
+    """
+    `LLMConfig` fields for the mock provider; without a source it answers with the
+    expected components of the data file.
+    """
+    if "mock" not in providers:
+        return {}
+    settings = {key: value for key, value in (mock or {}).items() if value is not None}
+    settings.setdefault("mock_source", str(data_csv))
+    return settings
+
+
 def main(
     runs: int,
     statement_type: str,
     difficulty: str,
     include_examples: bool,
     provider: str,
+    concurrency: int = 1,
+    cache_path: Optional[str] = None,
+    replay: bool = False,
+    bootstrap_iterations: int = 1000,
+    multi_sample: bool = True,
+    adaptive: bool = False,
+    pack: int = 1,
+    structured: bool = True,
+    fuzzy: Optional[float] = None,
+    lo_strategy: str = "per-run",
+    mock: Optional[Dict[str, Any]] = None,
+    hedge: Optional[float] = None,
+    fallbacks: Optional[List[str]] = None,
+    stream: bool = False,
+    output_format: str = "json",
+    poisson_bootstrap: bool = False,
 ):
     # Load data and prepare output paths
     data_csv = Path(f"data/{difficulty}_{statement_type}_statements.csv")
@@ -167,27 +497,66 @@ def main(
         return
 
     out_json = Path("results") / data_csv.with_name(
-        provider + "_" + data_csv.stem + ("_with_examples" if include_examples else "") + "_results.json"
+        provider + "_" + data_csv.stem + ("_with_examples" if include_examples else "")
+        + ("_coded" if output_format == "coded" else "") + "_results.json"
     ).name
 
+    # Results are streamed to JSONL; a legacy JSON results file is still read
+    out_jsonl = out_json.with_suffix(".jsonl")
+
     # Check for cached results
-    results = load_json(out_json)
-    if results is None:
+    telemetry_summary = None
+    if out_jsonl.exists():
+        logging.info("Loaded cached results from %s", out_jsonl)
+        results = iter_jsonl(out_jsonl)
+    elif out_json.exists():
+        logging.info("Loaded cached results from %s", out_json)
+        results = load_json(out_json)
+    else:
         logging.info("No cached results found, invoking LLM…")
-        # Convert CSV to JSON format
-        data = csv_to_json(str(data_csv), statement_type=statement_type)
+        # Statements are read lazily from the CSV (it is re-read rather than held in memory)
+        def statements() -> Iterator[Dict]:
+            return iter_csv(str(data_csv), statement_type=statement_type)
+
+        # Resume from the checkpoint: only statements without `runs` finished runs are sent.
+        # The index keeps one byte offset per statement, not the rows themselves.
+        checkpoint = Checkpoint(out_json.with_name(out_json.stem + ".checkpoint.jsonl"))
+        finished = checkpoint.index(
+            lambda row: row.get("runs_requested", len(row.get("results", []))) >= runs
+        )
+        total = sum(1 for _ in statements())
+
+        def unfinished() -> Iterator[Dict]:
+            # Rows are keyed by CSV position and text, so repeated statements resume separately
+            for row, item in enumerate(statements()):
+                if finished.find(row, item["input"]) is None:
+                    yield dict(item, row=row)
+
+        pending = sum(1 for _ in unfinished())
+        if finished:
+            logging.info(
+                "Resuming from %s: %d/%d statements already done",
+                checkpoint.path, total - pending, total,
+            )
+        from services.llm_interface import LLMConfig, LLMInterface, model_pricing
+        from services.router import LLMRouter, parse_target
+
         # Load prompt fragments
         prompts = load_prompts(statement_type, include_examples)
-        # Prepare the system prompt
+        # Prepare the system prompt (rendered prompts are cached by fragment hash)
         template_name = f"{statement_type}_with_examples" if include_examples else statement_type
-        template = get_template(template_name)
-        system_text = template.format(
+        system_text = render_system_prompt(
+            template_name,
+            cache_dir=out_dir / "prompt_cache",
             statement_type=statement_type,
             definitions=prompts["definitions"],
             guidelines=prompts["guidelines"],
             statement_information=prompts["statement_information"],
             examples=prompts.get("examples", ""),
         )
+        if output_format == "coded":
+            # The model answers in coded text, parsed locally into the same models
+            system_text = f"{system_text}\n\n{prompts['coded']}"
 
         print(system_text)  # Debug: print the system prompt
 
@@ -196,36 +565,134 @@ def main(
             provider=provider,           
             temperature=0.0,             
             timeout=15,                  
+            max_concurrency=concurrency,
+            cache_path=cache_path,
+            cache_replay=replay,
+            multi_sample=multi_sample,
+            structured_output=structured,
+            telemetry_path=str(out_json.with_name(out_json.stem + ".telemetry.jsonl")),
+            hedge_percentile=hedge,
+            stream=stream,
+            output_format=output_format,
+            **_mock_settings(
+                [provider] + [parse_target(t)[0] for t in fallbacks or []], mock, data_csv
+            ),
         )
 
-        llm = LLMInterface(
-            config=config,
-        )
+        # With fallback targets, calls fail over between providers behind circuit breakers
+        if fallbacks:
+            llm = LLMRouter([provider] + fallbacks, config)
+        else:
+            llm = LLMInterface(
+                config=config,
+            )
 
-        # Run the LLM on the data
-        results = run_llm_on_data(
-            data,
-            llm,
-            system_text,
-            runs,
-            statement_type,
-            include_logic=(difficulty == "hard")
+        # Run the LLM on the remaining data, checkpointing each finished statement
+        started = time.perf_counter()
+        try:
+            with checkpoint:
+                stream_llm_on_data(
+                    unfinished(),
+                    llm,
+                    system_text,
+                    runs,
+                    statement_type,
+                    on_result=checkpoint.append,
+                    include_logic=(difficulty == "hard"),
+                    concurrency=concurrency,
+                    adaptive=adaptive,
+                    pack=pack,
+                    total=pending,
+                    lo_strategy=lo_strategy,
+                )
+        except ExtractionInterrupted as interrupted:
+            logging.warning(
+                "Interrupted after %d/%d statements; progress saved to %s, re-run to resume",
+                total - pending + interrupted.count, total, checkpoint.path,
+            )
+            return
+        finally:
+            llm.telemetry.close()
+            llm.close()
+            logging.info(
+                "Extraction wall time: %.1fs for %d statements%s",
+                time.perf_counter() - started, pending,
+                f" (LO strategy: {lo_strategy})" if difficulty == "hard" else "",
+            )
+            if llm.cache is not None:
+                logging.info("Response cache %s: %s", llm.cache.path, llm.cache.stats())
+            if llm.usage["calls"]:
+                logging.info(
+                    "Token usage over %d calls: %d input (%d from provider prompt cache), %d output",
+                    llm.usage["calls"], llm.usage["input_tokens"],
+                    llm.usage["cached_input_tokens"], llm.usage["output_tokens"],
+                )
+            if llm.repairs:
+                logging.info("Outputs rescued by local JSON repair: %s", dict(llm.repairs))
+
+        telemetry_summary = llm.telemetry.summarize(
+            statements=pending, runs=runs, pricing=model_pricing()
         )
-        save_json(results, out_json)
-    else:
-        logging.info("Loaded cached results from %s", out_json)
 
-    # Aggregate & compute metrics
-    aggregated = aggregate_results(results, save=False)
-    comp_metrics = compute_component_metrics(aggregated)
-    agg_with_ci   = compute_aggregate_metrics_with_ci(
-        aggregated,
-        bootstrap_iterations=1000,
-        seed=42
+        # Write the final results, in CSV order, from the checkpoint
+        offsets = checkpoint.index()
+        used = 0
+
+        def ordered_rows() -> Iterator[Dict]:
+            nonlocal used
+            rows = checkpoint.rows_at(
+                offsets.find(row, item["input"]) for row, item in enumerate(statements())
+            )
+            for row in rows:
+                row["results"] = row["results"][:runs]
+                used += len(row["results"])
+                yield row
+
+        save_jsonl(ordered_rows(), out_jsonl)
+        if adaptive:
+            logging.info(
+                "Adaptive sampling used %d of %d runs (%.0f%%)",
+                used, runs * total, 100 * used / max(1, runs * total),
+            )
+        results = iter_jsonl(out_jsonl)
+
+    # Aggregate & compute metrics: the exact multinomial bootstrap holds the
+    # aggregated statements in memory, the Poisson bootstrap scores them in one pass
+    if fuzzy is not None:
+        logging.info("Merging near-duplicate variants (similarity >= %.2f)", fuzzy)
+    logging.info(
+        "Confidence intervals: %s bootstrap, %d iterations",
+        "Poisson (streaming)" if poisson_bootstrap else "multinomial (exact)", bootstrap_iterations,
     )
 
+    def score(rows: Iterable[Dict]) -> Dict[str, Any]:
+        if poisson_bootstrap:
+            return compute_metrics_with_ci_streaming(
+                iter_aggregated(rows, fuzzy=fuzzy), bootstrap_iterations=bootstrap_iterations, seed=42
+            )
+        return compute_metrics_with_ci(
+            list(iter_aggregated(rows, fuzzy=fuzzy)), bootstrap_iterations=bootstrap_iterations, seed=42
+        )
+
+    metrics_with_ci = score(results)
+
     # Display all four metric tables
-    display_metrics(comp_metrics, agg_with_ci, total=len(results))
+    display_metrics(
+        metrics_with_ci["components"], metrics_with_ci["aggregate"], total=metrics_with_ci["statements"]
+    )
+
+    # Routed runs can mix models: score each one on the statements it answered
+    def rows() -> Iterable[Dict]:
+        return iter_jsonl(out_jsonl) if out_jsonl.exists() else load_json(out_json)
+
+    models = sorted({row["model"] for row in rows() if "model" in row})
+    if len(models) > 1:
+        display_model_metrics({
+            model: score(row for row in rows() if row.get("model") == model)
+            for model in models
+        })
+    if telemetry_summary:
+        display_telemetry(telemetry_summary)
 
 
 if __name__ == "__main__":
@@ -236,8 +703,70 @@ if __name__ == "__main__":
     parser.add_argument("--type", choices=["r","c"], default="r")
     parser.add_argument("--level",choices=["1","2","3"], default="1")
     parser.add_argument("--examples", action="store_true")
-    parser.add_argument("--provider", choices=["openai","deepseek","gemini","claude"], default="openai")
+    parser.add_argument("--provider", choices=["openai","deepseek","gemini","claude","mock"], default="openai")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Maximum number of statements and LLM calls in flight")
+    parser.add_argument("--cache", default="results/llm_cache.sqlite",
+                        help="SQLite response cache shared across experiments")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    parser.add_argument("--replay", action="store_true",
+                        help="Answer every call from the cache; fail on a miss instead of calling the API")
+    parser.add_argument("--bootstrap", type=int, default=1000,
+                        help="Bootstrap iterations for the confidence intervals")
+    parser.add_argument("--poisson-bootstrap", action="store_true",
+                        help="Score in a single streaming pass with a Poisson bootstrap instead of the "
+                             "exact multinomial bootstrap (for result sets that do not fit in memory)")
+    parser.add_argument("--no-multi-sample", action="store_true",
+                        help="Request every run separately instead of several candidates per call")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Stop sampling a statement once its majority vote is decided")
+    parser.add_argument("--pack", type=int, default=1,
+                        help="Extract up to K statements per LLM request")
+    parser.add_argument("--no-structured", action="store_true",
+                        help="Parse free-text JSON instead of using the provider's structured output")
+    parser.add_argument("--fuzzy", type=float, nargs="?", const=DEFAULT_THRESHOLD, default=None,
+                        metavar="THRESHOLD",
+                        help="Merge near-duplicate variants before voting and scoring "
+                             f"(character 3-gram Jaccard similarity, default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--lo-strategy", choices=["per-run", "consensus"], default="per-run",
+                        help="Logical-operator pass for level 3: refine every run (pipelined with "
+                             "extraction) or only the aggregated consensus of the runs")
+    parser.add_argument("--hedge", type=float, nargs="?", const=95.0, default=None,
+                        metavar="PERCENTILE",
+                        help="Send a duplicate of requests still running after this percentile of "
+                             "recent latencies (default 95) and keep the first answer")
+    parser.add_argument("--fallback", action="append", default=None, metavar="PROVIDER[/MODEL]",
+                        help="Fail over to this target when --provider is unhealthy (repeatable, "
+                             "tried in order); each row records the model that answered it")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream completions and close the stream as soon as the answer's JSON "
+                             "object is complete (skips trailing explanations)")
+    parser.add_argument("--format", choices=["json", "coded"], default="json",
+                        help="Answer format of extraction calls: JSON, or compact IG coded text "
+                             "(A(x) D(shall) I(y)) parsed locally into the same models")
+    mock_group = parser.add_argument_group("mock provider (--provider mock, offline load testing)")
+    mock_group.add_argument("--mock-source", default=None,
+                            help="Results file to replay or labeled CSV to answer from "
+                                 "(default: the data CSV, i.e. perfect answers)")
+    mock_group.add_argument("--mock-latency", default=None, metavar="DIST",
+                            help="Latency distribution in seconds: fixed:S, uniform:LOW,HIGH, normal:MEAN,SD, "
+                                 "lognormal:MEDIAN,SIGMA or exponential:MEAN (default lognormal:0.5,0.5)")
+    mock_group.add_argument("--mock-429", type=float, default=0.0, metavar="RATE",
+                            help="Fraction of requests that fail with HTTP 429")
+    mock_group.add_argument("--mock-500", type=float, default=0.0, metavar="RATE",
+                            help="Fraction of requests that fail with HTTP 500")
+    mock_group.add_argument("--mock-timeout", type=float, default=0.0, metavar="RATE",
+                            help="Fraction of requests that time out")
+    mock_group.add_argument("--mock-malformed", type=float, default=0.0, metavar="RATE",
+                            help="Fraction of completions that are malformed JSON")
+    mock_group.add_argument("--mock-explanation", type=int, default=0, metavar="TOKENS",
+                            help="Tokens of explanation appended after each answer")
+    mock_group.add_argument("--mock-tps", type=float, default=None, metavar="TOKENS",
+                            help="Output tokens generated per second (default: instant)")
+    mock_group.add_argument("--mock-seed", type=int, default=None)
     args = parser.parse_args()
+    if args.format == "coded" and args.pack > 1:
+        parser.error("--format coded does not support --pack (packed answers are JSON)")
 
     statement_type = "regulative" if args.type == "r" else "constitutive"
     difficulty = { "1": "easy", "2": "medium", "3": "hard" }[args.level]
@@ -247,5 +776,31 @@ if __name__ == "__main__":
         statement_type=statement_type,
         difficulty=difficulty,
         include_examples=args.examples,
-        provider=args.provider
+        provider=args.provider,
+        concurrency=args.concurrency,
+        cache_path=None if args.no_cache else args.cache,
+        replay=args.replay,
+        bootstrap_iterations=args.bootstrap,
+        poisson_bootstrap=args.poisson_bootstrap,
+        multi_sample=not args.no_multi_sample,
+        adaptive=args.adaptive,
+        pack=args.pack,
+        structured=not args.no_structured,
+        fuzzy=args.fuzzy,
+        lo_strategy=args.lo_strategy,
+        hedge=args.hedge,
+        fallbacks=args.fallback,
+        stream=args.stream,
+        output_format=args.format,
+        mock=dict(
+            mock_source=args.mock_source,
+            mock_latency=args.mock_latency,
+            mock_rate_limit_rate=args.mock_429,
+            mock_server_error_rate=args.mock_500,
+            mock_timeout_rate=args.mock_timeout,
+            mock_malformed_rate=args.mock_malformed,
+            mock_explanation_tokens=args.mock_explanation,
+            mock_tokens_per_second=args.mock_tps,
+            mock_seed=args.mock_seed,
+        ),
     )
@@ -1,8 +1,16 @@
-from .component_metrics import compute_component_metrics,compute_aggregate_metrics, compute_aggregate_metrics_with_ci
+from .component_metrics import (
+    compute_component_metrics,
+    compute_aggregate_metrics,
+    compute_aggregate_metrics_with_ci,
+    compute_metrics_with_ci,
+    compute_metrics_with_ci_streaming,
+)
 
 __all__ = [
     "compute_component_metrics",
     "compute_aggregate_metrics",
     "compute_classification_metrics",
-    "compute_aggregate_metrics_with_ci"
+    "compute_aggregate_metrics_with_ci",
+    "compute_metrics_with_ci",
+    "compute_metrics_with_ci_streaming",
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from collections import defaultdict
+from itertools import islice
 import numpy as np
 
 def compute_component_metrics(aggregated_test_results):
@@ -97,46 +98,250 @@ def compute_aggregate_metrics(component_metrics):
         "macro": {"precision": macro_precision, "recall": macro_recall, "f1": macro_f1}
     }
 
-def compute_aggregate_metrics_with_ci(aggregated_test_results, bootstrap_iterations=1000, seed=None):
+def encode_component_counts(aggregated_test_results):
     """
-    Compute aggregate metrics with confidence intervals using bootstrap sampling.
+    Encode per-statement, per-component match counts as NumPy arrays.
+    Args:
+        aggregated_test_results (list): List of dictionaries containing expected and actual components.
+    Returns:
+        tuple: (symbols, counts, present) where
+            - symbols is the list of component symbols (column order),
+            - counts is an int array of shape (n_statements, n_symbols, 3) holding tp, fp, fn,
+            - present is a bool array of shape (n_statements, n_symbols) marking the symbols
+              that occur (expected or actual) in each statement.
+    """
+    symbol_index = {}
+    rows = []
+    for item in aggregated_test_results:
+        expected_dict = item.get("expected_components", {})
+        actual_dict = item.get("actual_components", {})
+        row = {}
+        for symbol in set(expected_dict) | set(actual_dict):
+            expected_variants = set(expected_dict.get(symbol, []))
+            actual_variants = set(actual_dict.get(symbol, []))
+            column = symbol_index.setdefault(symbol, len(symbol_index))
+            row[column] = (
+                len(expected_variants & actual_variants),
+                len(actual_variants - expected_variants),
+                len(expected_variants - actual_variants),
+            )
+        rows.append(row)
+
+    counts = np.zeros((len(rows), len(symbol_index), 3), dtype=np.int64)
+    present = np.zeros((len(rows), len(symbol_index)), dtype=bool)
+    for i, row in enumerate(rows):
+        for column, values in row.items():
+            counts[i, column] = values
+            present[i, column] = True
+    return list(symbol_index), counts, present
+
+def _safe_ratio(numerator, denominator):
+    """Element-wise numerator / denominator, 0 where the denominator is 0."""
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+def bootstrap_scores(counts, present, weights):
+    """
+    Score a batch of bootstrap resamples with matrix operations.
+    Args:
+        counts (np.ndarray): (n_statements, n_symbols, 3) tp/fp/fn counts from `encode_component_counts`.
+        present (np.ndarray): (n_statements, n_symbols) symbol presence from `encode_component_counts`.
+        weights (np.ndarray): (n_resamples, n_statements) number of times each statement is drawn.
+    Returns:
+        dict: Arrays with one entry per resample:
+            - "micro_f1", "macro_f1": shape (n_resamples,)
+            - "precision", "recall", "f1": per-component scores, shape (n_resamples, n_symbols)
+            - "present": whether each component occurs in the resample, shape (n_resamples, n_symbols)
+    """
+    weights = np.asarray(weights, dtype=float)
+    tp = weights @ counts[:, :, 0]
+    fp = weights @ counts[:, :, 1]
+    fn = weights @ counts[:, :, 2]
+    in_sample = (weights @ present) > 0
+    return _scores_from_counts(tp, fp, fn, in_sample)
+
+def _scores_from_counts(tp, fp, fn, in_sample):
+    """Micro/macro and per-component F1 from per-resample (n_resamples, n_symbols) counts."""
+    precision = _safe_ratio(tp, tp + fp)
+    recall = _safe_ratio(tp, tp + fn)
+    f1 = _safe_ratio(2 * precision * recall, precision + recall)
+
+    total_tp, total_fp, total_fn = tp.sum(axis=1), fp.sum(axis=1), fn.sum(axis=1)
+    micro_precision = _safe_ratio(total_tp, total_tp + total_fp)
+    micro_recall = _safe_ratio(total_tp, total_tp + total_fn)
+    micro_f1 = _safe_ratio(2 * micro_precision * micro_recall, micro_precision + micro_recall)
+    macro_f1 = _safe_ratio(np.where(in_sample, f1, 0).sum(axis=1), in_sample.sum(axis=1))
+
+    return {
+        "micro_f1": micro_f1,
+        "macro_f1": macro_f1,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "present": in_sample,
+    }
+
+def compute_metrics_with_ci(aggregated_test_results, bootstrap_iterations=1000, seed=None):
+    """
+    Compute aggregate and per-component metrics with bootstrap confidence intervals.
+
+    Per-statement tp/fp/fn counts are encoded into a matrix once; every bootstrap
+    resample is a row of a multinomial weight matrix, so all iterations are scored
+    with a few matrix products (processed in chunks to bound memory).
     Args:
         aggregated_test_results (list): List of dictionaries containing expected and actual components.
-            Each dictionary should have keys "expected_components" and "actual_components".
         bootstrap_iterations (int): Number of bootstrap iterations to perform.
         seed (int, optional): Random seed for reproducibility.
     Returns:
-        dict: A dictionary with aggregate metrics and confidence intervals:
-            - "micro": Dictionary with micro-averaged precision, recall, F1 score, and confidence interval
-            - "macro": Dictionary with macro-averaged precision, recall, F1 score, and confidence interval
+        dict: A dictionary with:
+            - "aggregate": "micro" and "macro" precision, recall, F1 score and F1 confidence interval
+            - "components": per-component precision, recall, F1 score and F1 confidence interval
+            - "statements": number of statements scored
     """
-    if seed is not None:
-        np.random.seed(seed)
+    rng = np.random.default_rng(seed)
 
     component_metrics = compute_component_metrics(aggregated_test_results)
     aggregate_metrics = compute_aggregate_metrics(component_metrics)
+    symbols, counts, present = encode_component_counts(aggregated_test_results)
+    n = len(aggregated_test_results)
+
+    micro_scores = np.zeros(bootstrap_iterations)
+    macro_scores = np.zeros(bootstrap_iterations)
+    component_scores = np.full((bootstrap_iterations, len(symbols)), np.nan)
+
+    if n > 0:
+        chunk = max(1, min(bootstrap_iterations, 4_000_000 // n))
+        probabilities = np.full(n, 1 / n)
+        for start in range(0, bootstrap_iterations, chunk):
+            stop = min(start + chunk, bootstrap_iterations)
+            weights = rng.multinomial(n, probabilities, size=stop - start)
+            scores = bootstrap_scores(counts, present, weights)
+            micro_scores[start:stop] = scores["micro_f1"]
+            macro_scores[start:stop] = scores["macro_f1"]
+            component_scores[start:stop] = np.where(scores["present"], scores["f1"], np.nan)
 
-    micro_scores = []
-    macro_scores = []
+    return _metrics_with_ci(component_metrics, aggregate_metrics, symbols,
+                            micro_scores, macro_scores, component_scores, n)
 
-    for _ in range(bootstrap_iterations):
-        sample = [np.random.choice(aggregated_test_results) for _ in range(len(aggregated_test_results))]
-        sample_component_metrics = compute_component_metrics(sample)
-        sample_aggregate_metrics = compute_aggregate_metrics(sample_component_metrics)
+def compute_metrics_with_ci_streaming(aggregated_test_results, bootstrap_iterations=1000, seed=None,
+                                      chunk_size=None):
+    """
+    Like `compute_metrics_with_ci`, but consumes an iterable of aggregated results
+    in a single pass with memory independent of the number of statements.
+
+    Uses the Poisson bootstrap: instead of drawing n statements with replacement
+    (which needs all n up front), every statement gets an independent Poisson(1)
+    weight per resample. Resample counts are accumulated chunk by chunk, so only
+    the (bootstrap_iterations, n_components) totals are kept. Point estimates are
+    identical to the batch version; the intervals agree up to resampling noise.
+    Args:
+        aggregated_test_results (iterable): Dictionaries containing expected and actual components.
+        bootstrap_iterations (int): Number of bootstrap iterations to perform.
+        seed (int, optional): Random seed for reproducibility.
+        chunk_size (int, optional): Statements encoded per step (default keeps the
+            weight matrix around 4M entries).
+    Returns:
+        dict: Same structure as `compute_metrics_with_ci`.
+    """
+    rng = np.random.default_rng(seed)
+    chunk_size = chunk_size or max(1, 4_000_000 // max(1, bootstrap_iterations))
+
+    symbol_index = {}
+    totals = np.zeros((0, 3), dtype=np.int64)
+    resampled = np.zeros((3, bootstrap_iterations, 0))
+    in_sample = np.zeros((bootstrap_iterations, 0), dtype=bool)
+    n = 0
+
+    iterator = iter(aggregated_test_results)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        n += len(chunk)
+        chunk_symbols, counts, present = encode_component_counts(chunk)
+        columns = [symbol_index.setdefault(symbol, len(symbol_index)) for symbol in chunk_symbols]
+        grow = len(symbol_index) - totals.shape[0]
+        if grow:
+            totals = np.pad(totals, ((0, grow), (0, 0)))
+            resampled = np.pad(resampled, ((0, 0), (0, 0), (0, grow)))
+            in_sample = np.pad(in_sample, ((0, 0), (0, grow)))
+
+        weights = rng.poisson(1.0, size=(bootstrap_iterations, len(chunk))).astype(float)
+        totals[columns] += counts.sum(axis=0)
+        for k in range(3):
+            resampled[k][:, columns] += weights @ counts[:, :, k]
+        in_sample[:, columns] |= (weights @ present) > 0
+
+    symbols = list(symbol_index)
+    component_metrics = {}
+    for column, symbol in enumerate(symbols):
+        tp, fp, fn = (int(v) for v in totals[column])
+        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+        recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+        f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
+        component_metrics[symbol] = {"tp": tp, "fp": fp, "fn": fn,
+                                     "precision": precision, "recall": recall, "f1": f1}
+    aggregate_metrics = compute_aggregate_metrics(component_metrics)
+
+    if n > 0:
+        scores = _scores_from_counts(resampled[0], resampled[1], resampled[2], in_sample)
+        micro_scores, macro_scores = scores["micro_f1"], scores["macro_f1"]
+        component_scores = np.where(scores["present"], scores["f1"], np.nan)
+    else:
+        micro_scores = macro_scores = np.zeros(bootstrap_iterations)
+        component_scores = np.full((bootstrap_iterations, 0), np.nan)
 
-        micro_scores.append(sample_aggregate_metrics["micro"]["f1"])
-        macro_scores.append(sample_aggregate_metrics["macro"]["f1"])
+    return _metrics_with_ci(component_metrics, aggregate_metrics, symbols,
+                            micro_scores, macro_scores, component_scores, n)
 
+def _metrics_with_ci(component_metrics, aggregate_metrics, symbols,
+                     micro_scores, macro_scores, component_scores, n):
+    """Attach 95% percentile intervals from bootstrap scores to the point estimates."""
     lo_micro, hi_micro = np.percentile(micro_scores, [2.5, 97.5])
     lo_macro, hi_macro = np.percentile(macro_scores, [2.5, 97.5])
 
+    components = {}
+    for column, symbol in enumerate(symbols):
+        metrics = component_metrics[symbol]
+        column_scores = component_scores[:, column]
+        if np.isnan(column_scores).all():
+            ci = (np.nan, np.nan)
+        else:
+            ci = tuple(np.nanpercentile(column_scores, [2.5, 97.5]))
+        components[symbol] = {"precision": metrics["precision"],
+                              "recall": metrics["recall"],
+                              "f1": metrics["f1"],
+                              "ci": ci}
+
     return {
-        "micro": {"precision": aggregate_metrics["micro"]["precision"],
-                  "recall": aggregate_metrics["micro"]["recall"],
-                  "f1": aggregate_metrics["micro"]["f1"],
-                  "ci": (lo_micro, hi_micro)},
-        "macro": {"precision": aggregate_metrics["macro"]["precision"],
-                  "recall": aggregate_metrics["macro"]["recall"],
-                  "f1": aggregate_metrics["macro"]["f1"],
-                  "ci": (lo_macro, hi_macro)}
-        }   
+        "aggregate": {
+            "micro": {"precision": aggregate_metrics["micro"]["precision"],
+                      "recall": aggregate_metrics["micro"]["recall"],
+                      "f1": aggregate_metrics["micro"]["f1"],
+                      "ci": (lo_micro, hi_micro)},
+            "macro": {"precision": aggregate_metrics["macro"]["precision"],
+                      "recall": aggregate_metrics["macro"]["recall"],
+                      "f1": aggregate_metrics["macro"]["f1"],
+                      "ci": (lo_macro, hi_macro)}
+        },
+        "components": components,
+        "statements": n,
+    }
+
+def compute_aggregate_metrics_with_ci(aggregated_test_results, bootstrap_iterations=1000, seed=None):
+    """
+    Compute aggregate metrics with confidence intervals using bootstrap sampling.
+    Args:
+        aggregated_test_results (list): List of dictionaries containing expected and actual components.
+            Each dictionary should have keys "expected_components" and "actual_components".
+        bootstrap_iterations (int): Number of bootstrap iterations to perform.
+        seed (int, optional): Random seed for reproducibility.
+    Returns:
+        dict: A dictionary with aggregate metrics and confidence intervals:
+            - "micro": Dictionary with micro-averaged precision, recall, F1 score, and confidence interval
+            - "macro": Dictionary with macro-averaged precision, recall, F1 score, and confidence interval
+    """
+    return compute_metrics_with_ci(
+        aggregated_test_results, bootstrap_iterations=bootstrap_iterations, seed=seed
+    )["aggregate"]
@@ -1 +1 @@
-from .registry import get_template
\ No newline at end of file
+from .registry import get_template, render_system_prompt
@@ -1,24 +1,49 @@
-from langchain.prompts import PromptTemplate
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Tuple
 
-def build_prompt_template(with_examples=False) -> PromptTemplate:
+if TYPE_CHECKING:
+    from langchain_core.prompts import PromptTemplate
+
+# Prompt fragments ship with the package, so they are resolved independently of the cwd
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+
+
+def template_source(with_examples=False) -> Tuple[str, List[str]]:
     """
-    Build a prompt template for generating statements.
+    Read the raw template text and its input variables (without importing LangChain).
     Args:
         with_examples (bool): Whether to include examples in the prompt.
         Returns:
-            PromptTemplate: A LangChain PromptTemplate object.
+            tuple: The template string and the list of input variable names.
     """
     input_variables = ["statement_type", "statement_information", "definitions", "guidelines"]
-    
-    with open("prompts/base_template.txt", "r") as file:
-        template = file.read()
+
+    template = (PROMPTS_DIR / "base_template.txt").read_text()
 
     if with_examples:
         input_variables.append("examples")
         template += "\n### Examples\n{examples}"
 
+    return template, input_variables
+
+
+def build_prompt_template(with_examples=False) -> "PromptTemplate":
+    """
+    Build a prompt template for generating statements.
+    Args:
+        with_examples (bool): Whether to include examples in the prompt.
+        Returns:
+            PromptTemplate: A LangChain PromptTemplate object.
+    """
+    # Imported here so code paths that never render a prompt do not load LangChain
+    try:
+        from langchain.prompts import PromptTemplate
+    except ImportError:  # LangChain >= 1.0 only ships it in langchain_core
+        from langchain_core.prompts import PromptTemplate
+
+    template, input_variables = template_source(with_examples)
+
     return PromptTemplate(
         template=template,
         input_variables=input_variables,
     )
-
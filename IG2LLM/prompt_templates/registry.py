@@ -1,12 +1,26 @@
-from .builder import build_prompt_template
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Union
 
+from .builder import build_prompt_template, template_source
+
+logger = logging.getLogger(__name__)
+
+# Template name -> build options. Templates are only constructed on first use.
 TEMPLATE_REGISTRY = {
-    "regulative": build_prompt_template(),
-    "regulative_with_examples": build_prompt_template(with_examples=True),
-    "constitutive": build_prompt_template(),
-    "constitutive_with_examples": build_prompt_template(with_examples=True),
+    "regulative": {"with_examples": False},
+    "regulative_with_examples": {"with_examples": True},
+    "constitutive": {"with_examples": False},
+    "constitutive_with_examples": {"with_examples": True},
 }
 
+_TEMPLATES: Dict[str, object] = {}
+_RENDERED: Dict[str, str] = {}
+
+
 def get_template(name: str):
     """
     Retrieve a prompt template by name from the registry.
@@ -19,5 +33,60 @@ def get_template(name: str):
     """
     if name not in TEMPLATE_REGISTRY:
         raise ValueError(f"Template '{name}' not found in registry.")
-    
-    return TEMPLATE_REGISTRY[name]
\ No newline at end of file
+
+    if name not in _TEMPLATES:
+        _TEMPLATES[name] = build_prompt_template(**TEMPLATE_REGISTRY[name])
+    return _TEMPLATES[name]
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def prompt_key(name: str, variables: Dict[str, str]) -> str:
+    """Hash of the template text and every fragment that goes into the prompt."""
+    if name not in TEMPLATE_REGISTRY:
+        raise ValueError(f"Template '{name}' not found in registry.")
+    template, _ = template_source(**TEMPLATE_REGISTRY[name])
+    parts = [_sha256(template)] + [
+        [key, _sha256(str(value))] for key, value in sorted(variables.items())
+    ]
+    return _sha256(json.dumps(parts))
+
+
+def render_system_prompt(
+    name: str, cache_dir: Optional[Union[str, Path]] = None, **variables: str
+) -> str:
+    """
+    Render the named template with `variables`, reusing earlier renders.
+
+    Rendered prompts are cached in memory and, with `cache_dir`, on disk under
+    a key derived from the template and fragment hashes (see `prompt_key`), so a
+    warm start neither builds the template nor imports LangChain. Editing any
+    fragment changes the key.
+
+    Args:
+        name (str): The name of the template to render.
+        cache_dir: Optional directory for the persistent cache.
+        variables: Values for the template's input variables.
+
+    Returns:
+        str: The rendered system prompt.
+    """
+    key = prompt_key(name, variables)
+    if key in _RENDERED:
+        return _RENDERED[key]
+
+    path = Path(cache_dir) / f"{key}.txt" if cache_dir else None
+    if path is not None and path.exists():
+        logger.debug("Loaded rendered prompt %s from %s", name, path)
+        rendered = path.read_text(encoding="utf-8")
+    else:
+        rendered = get_template(name).format(**variables)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(rendered, encoding="utf-8")
+            os.replace(tmp, path)
+    _RENDERED[key] = rendered
+    return rendered
@@ -0,0 +1,131 @@
+import asyncio
+import atexit
+import hashlib
+import importlib
+import importlib.util
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Connection-pool limits for the shared HTTP clients (see `httpx.Limits`)."""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    http2: bool = True
+
+    def http_client(self, client_cls: type) -> Any:
+        """
+        Build an HTTP client of `client_cls` with these limits.
+
+        SDKs pin their own httpx flavour (OpenAI and Anthropic ship a
+        `DefaultHttpxClient` subclass, which also sets TCP keep-alive), so the
+        `Limits` object comes from the library that defines `client_cls`.
+        """
+        base = next(c for c in client_cls.__mro__ if c.__name__ in ("Client", "AsyncClient"))
+        library = importlib.import_module(base.__module__.partition(".")[0])
+        http2 = self.http2 and http2_available()
+        if self.http2 and not http2:
+            logger.debug("h2 is not installed; pooled HTTP clients use HTTP/1.1")
+        return client_cls(
+            limits=library.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            http2=http2,
+            follow_redirects=True,
+        )
+
+
+# key -> SDK client
+_CLIENTS: Dict[Tuple, Any] = {}
+# key -> (event loop, SDK client); async clients are bound to the loop they were created on
+_ASYNC_CLIENTS: Dict[Tuple, Tuple[asyncio.AbstractEventLoop, Any]] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (`pip install h2`)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _key(provider: str, api_key: str, base_url: Optional[str], settings: PoolSettings) -> Tuple:
+    # The key itself is not kept in the pool index
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return provider, digest, base_url, settings
+
+
+def get_client(
+    provider: str,
+    api_key: str,
+    base_url: Optional[str],
+    ctor: Callable[[str, PoolSettings], Any],
+    settings: PoolSettings = PoolSettings(),
+) -> Any:
+    """
+    Return the process-wide SDK client for `provider`, API key and `base_url`.
+
+    The client is built once with `ctor(api_key, settings)`, which wraps an HTTP
+    client from `settings.http_client`, so every interface and worker thread in
+    the process reuses the same warm (TLS, keep-alive) connections. The SDK
+    clients and their httpx connection pools are thread-safe.
+    """
+    key = _key(provider, api_key, base_url, settings)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = _CLIENTS[key] = ctor(api_key, settings)
+            logger.debug("Created pooled %s client (%s)", provider, base_url or "default endpoint")
+        return client
+
+
+def get_async_client(
+    provider: str,
+    api_key: str,
+    base_url: Optional[str],
+    ctor: Callable[[str, PoolSettings], Any],
+    settings: PoolSettings = PoolSettings(),
+) -> Any:
+    """
+    Async counterpart of `get_client`, shared per running event loop.
+
+    An async HTTP client cannot be used across event loops, so there is one
+    client per loop; clients of loops that have been closed are dropped.
+    """
+    loop = asyncio.get_running_loop()
+    key = _key(provider, api_key, base_url, settings) + (id(loop),)
+    with _CLIENTS_LOCK:
+        for stale in [k for k, (owner, _) in _ASYNC_CLIENTS.items() if owner.is_closed()]:
+            del _ASYNC_CLIENTS[stale]
+        entry = _ASYNC_CLIENTS.get(key)
+        if entry is None or entry[0] is not loop:
+            entry = _ASYNC_CLIENTS[key] = (loop, ctor(api_key, settings))
+            logger.debug("Created pooled async %s client (%s)", provider, base_url or "default endpoint")
+        return entry[1]
+
+
+def pool_size() -> Dict[str, int]:
+    """Number of pooled sync and async clients."""
+    with _CLIENTS_LOCK:
+        return {"sync": len(_CLIENTS), "async": len(_ASYNC_CLIENTS)}
+
+
+def close_clients() -> None:
+    """Close the pooled sync clients and forget every pooled client."""
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            close = getattr(client, "close", None)
+            if callable(close):
+                close()
+        _CLIENTS.clear()
+        # Async clients can only be closed on their own loop; dropping them is enough
+        _ASYNC_CLIENTS.clear()
+
+
+atexit.register(close_clients)
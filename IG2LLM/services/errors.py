@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+from .rate_limit import _error_chain, http_status, is_rate_limit_error, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# SDK / transport exception class names, matched anywhere in the exception chain so
+# no provider SDK has to be imported to classify its errors
+_TIMEOUT_NAMES = ("Timeout", "DeadlineExceeded")
+_CONNECTION_NAMES = (
+    "APIConnectionError", "ConnectError", "ConnectionError", "RemoteProtocolError",
+    "ReadError", "WriteError", "NetworkError", "ProtocolError",
+)
+# google-genai / gRPC status names in error messages
+_TRANSIENT_STATUSES = ("UNAVAILABLE", "DEADLINE_EXCEEDED")
+
+
+class LLMError(Exception):
+    """
+    A provider call failed. Raised by the provider adapters (`LLMInterface._call_*`)
+    with the SDK error as its cause; `transient` tells whether retrying can help.
+    """
+    transient = False
+
+    def __init__(
+        self,
+        message: str,
+        provider: Optional[str] = None,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TransientError(LLMError):
+    """A failure that is expected to go away when the request is repeated."""
+    transient = True
+
+
+class RateLimitError(TransientError):
+    """HTTP 429 / quota exhausted."""
+
+
+class ServerError(TransientError):
+    """HTTP 5xx (including overloaded / unavailable)."""
+
+
+class RequestTimeoutError(TransientError):
+    """The request did not complete within its timeout."""
+
+
+class ConnectionFailedError(TransientError):
+    """The connection could not be established or was reset."""
+
+
+class AuthenticationError(LLMError):
+    """HTTP 401 / 403: missing or invalid credentials or permissions."""
+
+
+class BadRequestError(LLMError):
+    """Any other HTTP 4xx: the request itself is invalid (e.g. a rejected schema)."""
+
+
+def _names(err: BaseException):
+    for e in _error_chain(err):
+        for cls in type(e).__mro__:
+            yield cls.__name__
+
+
+def classify_error(err: BaseException, provider: Optional[str] = None) -> LLMError:
+    """
+    Map an SDK / transport exception to the `LLMError` taxonomy.
+
+    The HTTP status is taken from the exception or anything it wraps; errors
+    without one are classified by exception type (timeouts, connection resets)
+    and, for google-genai, by the gRPC status in the message. Anything else is a
+    plain, non-transient `LLMError`.
+    """
+    if isinstance(err, LLMError):
+        return err
+    status = http_status(err)
+    names = set(_names(err))
+    message = f"{provider or 'provider'} API error: {type(err).__name__}: {err}"
+    if is_rate_limit_error(err):
+        cls = RateLimitError
+    elif status == 408 or isinstance(err, asyncio.TimeoutError) or any(
+        t in n for n in names for t in _TIMEOUT_NAMES
+    ):
+        cls = RequestTimeoutError
+    elif status is not None and status >= 500:
+        cls = ServerError
+    elif status in (401, 403):
+        cls = AuthenticationError
+    elif status is not None and 400 <= status < 500:
+        cls = BadRequestError
+    elif names & set(_CONNECTION_NAMES):
+        cls = ConnectionFailedError
+    elif any(s in str(e) for e in _error_chain(err) for s in _TRANSIENT_STATUSES):
+        cls = ServerError
+    else:
+        cls = LLMError
+    return cls(message, provider=provider, status_code=status, retry_after=retry_after_seconds(err))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Exponential backoff with jitter for transient provider errors.
+
+    The n-th retry waits `min(max_delay, base_delay * 2 ** n)`, of which a random
+    `jitter` fraction is drawn uniformly (1.0 = "full jitter"), but never less than
+    the provider's `Retry-After`. Retrying stops after `max_retries` retries or once
+    the next attempt would start more than `max_elapsed` seconds after the first.
+    Rate-limited requests (429) have their own budget (`max_rate_limit_retries`)
+    and wait in the shared rate limiter instead of sleeping here.
+    """
+    max_retries: int = 4
+    max_rate_limit_retries: int = 8
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    jitter: float = 1.0
+    max_elapsed: Optional[float] = 300.0
+
+    @classmethod
+    def from_config(cls, config) -> "RetryPolicy":
+        """Build the policy from the `retry_*` fields of an `LLMConfig`."""
+        return cls(
+            max_retries=config.max_retries,
+            max_rate_limit_retries=config.max_rate_limit_retries,
+            base_delay=config.retry_base_delay,
+            max_delay=config.retry_max_delay,
+            jitter=config.retry_jitter,
+            max_elapsed=config.retry_max_elapsed,
+        )
+
+    def backoff(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number `retry` (0-based)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** retry)
+        delay -= delay * self.jitter * random.random()
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def allows(self, err: LLMError, retries: int, elapsed: float, delay: float = 0.0) -> bool:
+        """True if `err` may be retried after `retries` earlier retries and `elapsed` seconds."""
+        if not err.transient:
+            return False
+        budget = self.max_rate_limit_retries if isinstance(err, RateLimitError) else self.max_retries
+        if retries >= budget:
+            logger.error("Giving up after %d retries: %s", retries, err)
+            return False
+        if self.max_elapsed is not None and elapsed + delay > self.max_elapsed:
+            logger.error("Giving up after %.0fs of retries: %s", elapsed, err)
+            return False
+        return True
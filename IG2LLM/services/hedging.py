@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+
+class Hedger:
+    """
+    Decides when a slow request gets a duplicate ("hedge").
+
+    Latencies of recent unhedged requests are kept per call kind (extraction, LO
+    and packed calls have very different latency profiles). Once `min_samples`
+    have been seen, a request that has not returned after the `percentile`-th
+    latency of the window (and at least `min_delay` seconds) is hedged, as long
+    as hedges stay below `budget` (a fraction) of all requests, which bounds the
+    cost overhead.
+    """
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        min_delay: float = 1.0,
+        budget: float = 0.1,
+        window: int = 200,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = budget
+        self.window = window
+        self.requests = 0
+        self.hedges = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, kind: str) -> Optional[float]:
+        """
+        Seconds after which a new request of `kind` should be hedged, or None while
+        there are too few samples. Counts the request against the hedge budget.
+        """
+        with self._lock:
+            self.requests += 1
+            latencies = self._latencies.get(kind)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            return max(self.min_delay, float(np.percentile(latencies, self.percentile)))
+
+    def observe(self, kind: str, latency: float) -> None:
+        """Record the latency of a request that completed without a hedge."""
+        with self._lock:
+            latencies = self._latencies.get(kind)
+            if latencies is None:
+                latencies = self._latencies[kind] = deque(maxlen=self.window)
+            latencies.append(latency)
+
+    def try_hedge(self) -> bool:
+        """Take a hedge from the budget; False if the budget is used up."""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def refund(self) -> None:
+        """Return a hedge taken with `try_hedge` that was not sent."""
+        with self._lock:
+            self.hedges -= 1
@@ -0,0 +1,198 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+_DECODER = json.JSONDecoder()
+# The only characters that change the scanner state; everything else is skipped
+_SPECIAL = re.compile(r'[{}"\\]')
+# A JSON object opens with a key or closes immediately; prose braces ({x}) do not
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+
+def is_object(value: Any) -> bool:
+    return isinstance(value, dict)
+
+
+def has_key(key: str) -> Callable[[Any], bool]:
+    """Predicate accepting objects that contain `key`."""
+    return lambda value: isinstance(value, dict) and key in value
+
+
+class JSONStreamExtractor:
+    """
+    Single-pass extractor for the first JSON object in noisy LLM output.
+
+    Text can be fed in chunks as it arrives. Every character is scanned once
+    (runs of plain text are skipped with `str.find`/regex search), tracking
+    string/escape state and brace depth; `json.JSONDecoder.raw_decode` only runs
+    on a top-level candidate once it closes, so the total cost stays linear.
+    Braces inside string values do not affect the depth. The first decoded
+    object for which `accept` returns True is the result.
+
+    Example:
+        extractor = JSONStreamExtractor()
+        for chunk in stream:
+            if extractor.feed(chunk) is not None:
+                break
+        data = extractor.close()
+    """
+    def __init__(self, accept: Callable[[Any], bool] = is_object):
+        self.accept = accept
+        self.found = False
+        self.result: Any = None
+        # First decodable object, returned by `close` if none is accepted
+        self._fallback: Any = None
+        self._chunks: List[str] = []
+        self._length = 0
+        self._depth = 0
+        self._start = 0
+        self._in_string = False
+        # Offset of the character escaped by a backslash inside a string, if pending
+        self._escaped_at = -1
+        # Offsets of the braces currently open, and (start, end) of every nested
+        # object that closed inside a candidate, for the fallback in `close`
+        self._open: List[int] = []
+        self._nested: List[Tuple[int, int]] = []
+
+    def feed(self, chunk: str) -> Optional[Any]:
+        """Consume more text; return the accepted object once it is complete."""
+        if self.found:
+            return self.result
+        base = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        depth, in_string, escaped_at = self._depth, self._in_string, self._escaped_at
+        pos = 0
+        while True:
+            if depth == 0:
+                # Outside a candidate only an opening brace matters (prose quotes are ignored)
+                pos = chunk.find("{", pos)
+                if pos < 0:
+                    break
+                ch = "{"
+            else:
+                match = _SPECIAL.search(chunk, pos)
+                if match is None:
+                    break
+                ch, pos = match.group(), match.start()
+            if in_string:
+                if base + pos == escaped_at:
+                    pass
+                elif ch == "\\":
+                    escaped_at = base + pos + 1
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                self._open.append(base + pos)
+                if depth == 0:
+                    self._start = base + pos
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                start = self._open.pop()
+                if depth > 0:
+                    self._nested.append((start, base + pos + 1))
+                elif self._try(start, base + pos + 1):
+                    return self.result
+            pos += 1
+        self._depth, self._in_string, self._escaped_at = depth, in_string, escaped_at
+        return None
+
+    def close(self) -> Any:
+        """
+        Finish the stream and return the accepted object. If no top-level candidate
+        was accepted (e.g. an unmatched brace in prose swallowed the object, or the
+        output was cut off), the objects nested in candidates are tried in order of
+        their opening brace; failing that, the first JSON object found is returned,
+        and `JSONDecodeError` is raised if there is none.
+
+        Nested objects are decoded on their own balanced slice, so the fallback
+        costs the text length times the nesting depth; braces that never closed
+        are not decoded at all.
+        """
+        if self.found:
+            return self.result
+        for start, end in sorted(self._nested):
+            if self._try(start, end):
+                return self.result
+        if isinstance(self._fallback, dict):
+            return self._fallback
+        raise json.JSONDecodeError("No valid JSON object found in output", self._joined(), 0)
+
+    def _joined(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _try(self, start: int, end: int) -> bool:
+        # Decode a slice: error positions are computed relative to the decoded
+        # string, which would make failures on long outputs quadratic.
+        text = self._joined()
+        if not _OBJECT_START.match(text, start):
+            return False
+        try:
+            value, _ = _DECODER.raw_decode(text[start:end])
+        except json.JSONDecodeError:
+            return False
+        if self._fallback is None and isinstance(value, dict):
+            self._fallback = value
+        if not self.accept(value):
+            return False
+        self.found, self.result = True, value
+        return True
+
+
+def _strip_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text[3:]
+        if text[:4].lower() == "json":
+            text = text[4:]
+        if text.endswith("```"):
+            text = text[:-3]
+    return text
+
+
+def extract_json(text: str, accept: Callable[[Any], bool] = is_object) -> Any:
+    """Return the first accepted JSON object in `text` (see `JSONStreamExtractor`)."""
+    if not text.strip():
+        raise json.JSONDecodeError("Empty input", text, 0)
+    # Fast path: the whole output (minus a markdown fence) is the object
+    try:
+        value = json.loads(_strip_fence(text))
+        if accept(value):
+            return value
+    except json.JSONDecodeError:
+        pass
+    extractor = JSONStreamExtractor(accept)
+    extractor.feed(text)
+    return extractor.close()
+
+
+def extract_json_stream(chunks: Iterable[str], accept: Callable[[Any], bool] = is_object) -> Any:
+    """Like `extract_json`, but stops reading `chunks` as soon as an object is accepted."""
+    extractor = JSONStreamExtractor(accept)
+    for chunk in chunks:
+        if extractor.feed(chunk) is not None:
+            break
+    return extractor.close()
+
+
+@lru_cache(maxsize=None)
+def matches_model(model: Type[BaseModel]) -> Callable[[Any], bool]:
+    """
+    Predicate accepting objects that are empty or use at least one field of
+    `model` (by alias or name), so stray objects in reasoning text are skipped.
+    """
+    keys = set(model.model_fields)
+    keys.update(f.alias for f in model.model_fields.values() if f.alias)
+
+    def accept(value: Any) -> bool:
+        return isinstance(value, dict) and (not value or not keys.isdisjoint(value))
+
+    return accept
@@ -0,0 +1,214 @@
+import json
+import re
+from typing import Any, Callable, Iterator, List, Tuple
+
+# Closing quote of a JSON string: followed (after whitespace) by one of these, or the end
+_TERMINATORS = ",:}]"
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_DECODER = json.JSONDecoder(strict=False)
+
+
+def _segments(text: str) -> Iterator[Tuple[bool, str]]:
+    """
+    Split `text` into (is_string, chunk) pieces, where string chunks are
+    double-quoted JSON strings (quotes included; the last one may be unterminated).
+    """
+    start = 0
+    in_string = escape = False
+    for idx, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                yield True, text[start:idx + 1]
+                start, in_string = idx + 1, False
+        elif ch == '"':
+            if idx > start:
+                yield False, text[start:idx]
+            start, in_string = idx, True
+    if start < len(text):
+        yield in_string, text[start:]
+
+
+def _outside_strings(text: str, fn: Callable[[str], str]) -> str:
+    return "".join(chunk if is_string else fn(chunk) for is_string, chunk in _segments(text))
+
+
+def _is_terminator(text: str, idx: int) -> bool:
+    """True if the quote at `idx` is followed by a structural character (or nothing)."""
+    end = idx + 1
+    while end < len(text) and text[end].isspace():
+        end += 1
+    return end == len(text) or text[end] in _TERMINATORS
+
+
+def fix_single_quotes(text: str) -> str:
+    """Turn 'single-quoted' keys and values into double-quoted JSON strings."""
+    out: List[str] = []
+    idx = 0
+    in_string = escape = False
+    last = ""  # last structural character outside strings
+    while idx < len(text):
+        ch = text[idx]
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                last = ch
+        elif ch == '"':
+            out.append(ch)
+            in_string = True
+        elif ch == "'" and last in ("{", "[", ",", ":"):
+            end = idx + 1
+            while end < len(text) and not (
+                text[end] == "'" and text[end - 1] != "\\" and _is_terminator(text, end)
+            ):
+                end += 1
+            body = text[idx + 1:end].replace("\\'", "'").replace('"', '\\"')
+            out.append(f'"{body}"')
+            idx = end
+            last = '"'
+        else:
+            out.append(ch)
+            if not ch.isspace():
+                last = ch
+        idx += 1
+    return "".join(out)
+
+
+def fix_unescaped_quotes(text: str) -> str:
+    """
+    Escape double quotes inside strings, e.g. ["the "public" investment"]: a quote
+    only closes a string if a structural character follows it.
+    """
+    out: List[str] = []
+    in_string = escape = False
+    for idx, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                if _is_terminator(text, idx):
+                    in_string = False
+                else:
+                    out.append("\\")
+        elif ch == '"':
+            in_string = True
+        out.append(ch)
+    return "".join(out)
+
+
+def fix_python_literals(text: str) -> str:
+    """Replace True/False/None outside strings with their JSON spelling."""
+    pattern = re.compile(r"\b(True|False|None)\b")
+    return _outside_strings(text, lambda chunk: pattern.sub(lambda m: _PYTHON_LITERALS[m.group(1)], chunk))
+
+
+def fix_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket."""
+    pattern = re.compile(r",(\s*[}\]])")
+    return _outside_strings(text, lambda chunk: pattern.sub(r"\1", chunk))
+
+
+def fix_truncation(text: str) -> str:
+    """
+    Close output that was cut off (e.g. at the completion-token limit). The
+    unfinished trailing value is dropped rather than guessed, so the result only
+    contains what the model wrote completely.
+    """
+    stack: List[str] = []
+    expect_value = False
+    in_string = escape = False
+    safe, safe_stack = 0, []
+    for idx, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if stack and (stack[-1] == "[" or expect_value):
+                    safe, safe_stack = idx + 1, list(stack)
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+            expect_value = False
+            safe, safe_stack = idx + 1, list(stack)
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            safe, safe_stack = idx + 1, list(stack)
+            if not stack:
+                return text
+        elif ch == ",":
+            safe, safe_stack = idx, list(stack)
+            expect_value = False
+        elif ch == ":":
+            expect_value = True
+    if not stack and not in_string:
+        return text
+    closers = {"{": "}", "[": "]"}
+    return text[:safe].rstrip() + "".join(closers[c] for c in reversed(safe_stack))
+
+
+# Applied cumulatively in this order; the name is the repair-kind counter key
+REPAIRS: Tuple[Tuple[str, Callable[[str], str]], ...] = (
+    ("single_quotes", fix_single_quotes),
+    ("unescaped_quotes", fix_unescaped_quotes),
+    ("python_literals", fix_python_literals),
+    ("trailing_commas", fix_trailing_commas),
+    ("truncated", fix_truncation),
+)
+
+
+def _payload(raw: str) -> str:
+    """Strip markdown fences and leading chatter up to the first JSON object."""
+    text = re.sub(r"```(?:json)?", "", raw, flags=re.IGNORECASE)
+    start = text.find("{")
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object to repair", raw, 0)
+    return text[start:]
+
+
+def _try_decode(text: str) -> Tuple[bool, Any]:
+    try:
+        return True, _DECODER.raw_decode(text)[0]
+    except json.JSONDecodeError:
+        return False, None
+
+
+def repair_json(raw: str) -> Tuple[Any, List[str]]:
+    """
+    Apply deterministic fixes to almost-valid JSON until it parses.
+
+    Returns the parsed value and the kinds of repair that were needed (see
+    `REPAIRS`). Raises `json.JSONDecodeError` if the output cannot be rescued.
+    The caller still has to validate the result against its model.
+    """
+    text = _payload(raw)
+    applied: List[str] = []
+    for kind, fix in REPAIRS:
+        fixed = fix(text)
+        if fixed == text:
+            continue
+        text = fixed
+        applied.append(kind)
+        ok, data = _try_decode(text)
+        if ok:
+            return data, applied
+    ok, data = _try_decode(text)
+    if ok:
+        return data, applied
+    raise json.JSONDecodeError("Could not repair JSON output", raw, 0)
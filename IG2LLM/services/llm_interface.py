@@ -1,54 +1,260 @@
+import asyncio
+import hashlib
 import json
 import logging
 import os
-import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from textwrap import dedent
 from pydantic import BaseModel, Field, ValidationError
-from typing import Any, Dict, List, Optional, Type, Literal
+from typing import Any, Awaitable, Callable, Dict, Generator, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Type, Literal
+
+from .rate_limit import (
+    _error_chain,
+    estimate_tokens,
+    get_rate_limiter,
+    http_status,
+    resolve_limits,
+)
+from .client_pool import PoolSettings, get_async_client, get_client
+from .errors import RateLimitError, RetryPolicy, classify_error
+from .hedging import Hedger
+from .mock_provider import DEFAULT_LATENCY, MockClient
+from .json_extract import extract_json, has_key, is_object, matches_model
+from .json_repair import repair_json
+from .response_cache import ResponseCache
+from .schemas import OutputSchema, output_schema
+from .streaming import StreamCollector
+from .telemetry import CallRecord, Telemetry, parse_outcome
+from util.convert_to_json import parse_coded
+
+# Request/token budgets per provider ("default") and per model override. Values are
+# requests-per-minute / tokens-per-minute; None disables that bucket. They start from
+# the entry-tier published quotas and are refined from rate-limit headers at runtime.
+# Pricing is USD per million tokens, used for the cost estimate in the telemetry report.
 
 PROVIDERS: Dict[str, Dict[str, Any]] = {
     "openai": {
         "imports": ["openai"],
-        "client_ctor": lambda key: __import__("openai").OpenAI(api_key=key),
+        "client_ctor": lambda key, pool: __import__("openai").OpenAI(
+            api_key=key, http_client=pool.http_client(__import__("openai").DefaultHttpxClient)
+        ),
+        "async_client_ctor": lambda key, pool: __import__("openai").AsyncOpenAI(
+            api_key=key, http_client=pool.http_client(__import__("openai").DefaultAsyncHttpxClient)
+        ),
         "default_model": "gpt-4.1-2025-04-14",
         "api_key_env": "OPENAI_API_KEY",
+        # Completions that can be sampled in a single request (`n=`)
+        "max_candidates": 8,
+        "rate_limits": {
+            "default": {"rpm": 500, "tpm": 30_000},
+        },
+        "pricing": {
+            "gpt-4.1-2025-04-14": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+        },
     },
     "deepseek": {
         "imports": ["openai"],
-        "client_ctor": lambda key: __import__("openai").OpenAI(
-            api_key=key, base_url="https://api.deepseek.com"
+        "base_url": "https://api.deepseek.com",
+        "client_ctor": lambda key, pool: __import__("openai").OpenAI(
+            api_key=key,
+            base_url=PROVIDERS["deepseek"]["base_url"],
+            http_client=pool.http_client(__import__("openai").DefaultHttpxClient),
+        ),
+        "async_client_ctor": lambda key, pool: __import__("openai").AsyncOpenAI(
+            api_key=key,
+            base_url=PROVIDERS["deepseek"]["base_url"],
+            http_client=pool.http_client(__import__("openai").DefaultAsyncHttpxClient),
         ),
         "default_model": "deepseek-reasoner",
         "api_key_env": "DEEPSEEK_API_KEY",
+        "max_candidates": 1,
+        # DeepSeek does not enforce fixed quotas; only back off on 429s.
+        "rate_limits": {
+            "default": {"rpm": None, "tpm": None},
+        },
+        "pricing": {
+            "deepseek-reasoner": {"input": 0.55, "cached_input": 0.14, "output": 2.19},
+        },
     },
     "gemini": {
         "imports": ["google.genai"],
-        "client_ctor": lambda key: __import__("google.genai", fromlist=["Client"]).Client(
-            api_key=key
+        "client_ctor": lambda key, pool: __import__("google.genai", fromlist=["Client"]).Client(
+            api_key=key,
+            http_options=__import__("google.genai.types", fromlist=["HttpOptions"]).HttpOptions(
+                httpx_client=pool.http_client(__import__("httpx").Client)
+            ),
         ),
+        "async_client_ctor": lambda key, pool: __import__("google.genai", fromlist=["Client"]).Client(
+            api_key=key,
+            http_options=__import__("google.genai.types", fromlist=["HttpOptions"]).HttpOptions(
+                httpx_async_client=pool.http_client(__import__("httpx").AsyncClient)
+            ),
+        ).aio,
         "default_model": "gemini-2.0-flash",
         "api_key_env": "GEMINI_API_KEY",
+        # `candidate_count=`
+        "max_candidates": 8,
+        "rate_limits": {
+            "default": {"rpm": 15, "tpm": 1_000_000},
+            "gemini-2.0-flash": {"rpm": 2_000, "tpm": 4_000_000},
+        },
+        "pricing": {
+            "gemini-2.0-flash": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+        },
     },
     "claude": {
         "imports": ["anthropic"],
-        "client_ctor": lambda key: __import__("anthropic").Anthropic(api_key=key),
+        "client_ctor": lambda key, pool: __import__("anthropic").Anthropic(
+            api_key=key, http_client=pool.http_client(__import__("anthropic").DefaultHttpxClient)
+        ),
+        "async_client_ctor": lambda key, pool: __import__("anthropic").AsyncAnthropic(
+            api_key=key, http_client=pool.http_client(__import__("anthropic").DefaultAsyncHttpxClient)
+        ),
         "default_model": "claude-3-opus-20240229",
         "api_key_env": "ANTHROPIC_API_KEY",
+        "max_candidates": 1,
+        "rate_limits": {
+            "default": {"rpm": 50, "tpm": 20_000},
+        },
+        "pricing": {
+            "claude-3-opus-20240229": {"input": 15.00, "cached_input": 1.50, "output": 75.00},
+        },
+    },
+    # Offline provider for load tests (services/mock_provider.py); needs no API key
+    "mock": {
+        "imports": [],
+        "default_model": "mock",
+        "api_key_env": None,
+        "max_candidates": 8,
+        "rate_limits": {
+            "default": {"rpm": None, "tpm": None},
+        },
+        "pricing": {
+            "mock": {"input": 0.0, "cached_input": 0.0, "output": 0.0},
+        },
     },
 }
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Completion budget requested from every provider
+MAX_OUTPUT_TOKENS = 2048
+
+# Words in a 400 error message that identify a rejected response schema
+_SCHEMA_ERROR_HINTS = ("schema", "response_format")
+
+# A Gemini context cache is recreated once less than this share of its TTL (at most
+# 5 minutes) is left, so no request goes out with a cache about to expire
+GEMINI_CACHE_REFRESH = 0.1
+GEMINI_CACHE_REFRESH_MAX = 300.0
+
+
+def model_pricing() -> Dict[str, Dict[str, float]]:
+    """Per-token prices from `PROVIDERS`, keyed by "provider/model"."""
+    return {
+        f"{provider}/{model}": price
+        for provider, info in PROVIDERS.items()
+        for model, price in info.get("pricing", {}).items()
+    }
+
+
 class LLMConfig(BaseModel):
-    provider: Literal["openai", "deepseek", "gemini", "claude"] = "openai"
+    provider: Literal["openai", "deepseek", "gemini", "claude", "mock"] = "openai"
     model: Optional[str] = None
     temperature: float = Field(0.0, ge=0.0, le=2.0)
     timeout: int = Field(15, gt=0)
+    max_concurrency: int = Field(8, gt=0)
+    rpm: Optional[int] = Field(None, gt=0)
+    tpm: Optional[int] = Field(None, gt=0)
+    expected_output_tokens: int = Field(512, ge=0)
+    max_rate_limit_retries: int = Field(8, ge=0)
+    # Backoff for other transient errors (5xx, timeouts, connection resets); see RetryPolicy
+    max_retries: int = Field(4, ge=0)
+    retry_base_delay: float = Field(0.5, ge=0)
+    retry_max_delay: float = Field(30.0, ge=0)
+    retry_jitter: float = Field(1.0, ge=0.0, le=1.0)
+    retry_max_elapsed: Optional[float] = Field(300.0, gt=0)
+    # Hedging (async calls): duplicate a request still running after this percentile
+    # of recent latencies; None disables. See services/hedging.Hedger.
+    hedge_percentile: Optional[float] = Field(None, gt=0, lt=100)
+    hedge_min_samples: int = Field(20, ge=1)
+    hedge_min_delay: float = Field(1.0, ge=0)
+    hedge_budget: float = Field(0.1, ge=0, le=1)
+    cache_path: Optional[str] = None
+    cache_max_bytes: Optional[int] = Field(None, gt=0)
+    cache_max_age: Optional[float] = Field(None, gt=0)
+    cache_replay: bool = False
+    multi_sample: bool = True
+    prompt_caching: bool = True
+    gemini_cache_ttl: int = Field(3600, gt=0)
+    telemetry_path: Optional[str] = None
+    structured_output: bool = True
+    json_repair: bool = True
+    # Answer format of extraction calls: JSON, or IG coded text ("A(x) D(shall) I(y)")
+    # parsed locally with util.convert_to_json.parse_coded. LO and packed calls stay JSON.
+    output_format: Literal["json", "coded"] = "json"
+    # Stream completions and close the stream once the answer object is complete
+    stream: bool = False
+    # Shared HTTP connection pool (one per provider, API key and base URL per process)
+    max_connections: int = Field(100, gt=0)
+    max_keepalive_connections: int = Field(20, ge=0)
+    keepalive_expiry: float = Field(60.0, gt=0)
+    http2: bool = True
+    # Mock provider: answer source (results file or labeled CSV), latency distribution
+    # (see mock_provider.latency_sampler) and injected failure rates
+    mock_source: Optional[str] = None
+    mock_latency: str = DEFAULT_LATENCY
+    mock_rate_limit_rate: float = Field(0.0, ge=0.0, le=1.0)
+    mock_server_error_rate: float = Field(0.0, ge=0.0, le=1.0)
+    mock_timeout_rate: float = Field(0.0, ge=0.0, le=1.0)
+    mock_malformed_rate: float = Field(0.0, ge=0.0, le=1.0)
+    mock_explanation_tokens: int = Field(0, ge=0)
+    mock_tokens_per_second: Optional[float] = Field(None, gt=0)
+    mock_seed: Optional[int] = None
 
     class Config:
         extra = "allow"
 
+@dataclass
+class ChatResponse:
+    """
+    Completion candidate(s) returned by a provider adapter, with the metadata the
+    interface needs for rate limiting (token usage and response headers).
+    """
+    candidates: List[str]
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    headers: Mapping[str, str] = field(default_factory=dict)
+    # Part of `input_tokens` served from the provider's prompt cache
+    cached_input_tokens: Optional[int] = None
+    # Part of `output_tokens` spent on hidden reasoning
+    reasoning_tokens: Optional[int] = None
+    # Streamed responses: seconds to the first token and to the complete answer
+    # object(s), and whether the stream was closed early (see StreamCollector)
+    first_token: Optional[float] = None
+    json_complete: Optional[float] = None
+    stream_cut: bool = False
+
+    @property
+    def text(self) -> str:
+        return self.candidates[0] if self.candidates else ""
+
+    @property
+    def total_tokens(self) -> Optional[int]:
+        if self.input_tokens is None and self.output_tokens is None:
+            return None
+        return (self.input_tokens or 0) + (self.output_tokens or 0)
+
+class Completion(NamedTuple):
+    """One sampled completion and the telemetry record of the call that produced it."""
+    text: str
+    record: Optional[CallRecord] = None
+
 class LLMInterface:
     def __init__(
         self,
@@ -81,20 +287,122 @@ class LLMInterface:
                 raise ImportError(f"'{pkg}' is required for provider '{self.provider}'.") from e
 
         # Determine API key
-        key = api_key or os.getenv(info["api_key_env"])
-        if not key:
+        key = api_key or (os.getenv(info["api_key_env"]) if info["api_key_env"] else None)
+        if not key and info["api_key_env"] and not config.cache_replay:
             raise ValueError(
                 f"No API key provided for {self.provider!r}; set '{info['api_key_env']}'."
             )
 
-        # Instantiate client
-        self.client = info["client_ctor"](key)
+        # Clients come from the process-wide pool, so interfaces with the same provider,
+        # key and base URL share warm connections (the async client is fetched on first
+        # use). Replay runs are answered from the cache only and need no client.
+        self._pool_settings = PoolSettings(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+            http2=config.http2,
+        )
+        if self.provider == "mock":
+            self.client = MockClient.from_config(config)
+        else:
+            self.client = get_client(
+                self.provider, key, info.get("base_url"), info["client_ctor"], self._pool_settings
+            ) if key else None
+        self._api_key = key
+        self._async_client = None
+        self._async_client_loop = None
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._async_semaphore_loop = None
         # Resolve model
         self.model = config.model or info["default_model"]
         self.provider_kwargs = provider_kwargs
 
+        # Shared request/token budget for this provider and model
+        limits = resolve_limits(info, self.model)
+        self.rate_limiter = get_rate_limiter(
+            self.provider,
+            self.model,
+            rpm=config.rpm or limits.get("rpm"),
+            tpm=config.tpm or limits.get("tpm"),
+        )
+
+        # Backoff for failed requests
+        self.retry_policy = RetryPolicy.from_config(config)
+
+        # Optional hedging of slow async requests
+        self.hedger: Optional[Hedger] = None
+        if config.hedge_percentile is not None:
+            self.hedger = Hedger(
+                percentile=config.hedge_percentile,
+                min_samples=config.hedge_min_samples,
+                min_delay=config.hedge_min_delay,
+                budget=config.hedge_budget,
+            )
+
+        # Cumulative token usage, including provider prompt-cache hits
+        self.usage: Dict[str, int] = {
+            "calls": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0,
+        }
+        # Completions rescued by the local JSON repair stage, per repair kind
+        self.repairs: Counter = Counter()
+        self._usage_lock = threading.Lock()
+        # Gemini explicit context caches, keyed by system-prompt hash: (name, monotonic
+        # expiry), or None if not cacheable. Every cache created is deleted by `close`.
+        self._gemini_caches: Dict[str, Optional[Tuple[str, float]]] = {}
+        self._gemini_created: List[str] = []
+        self._gemini_caches_lock = threading.Lock()
+
+        # Set once the provider rejects a response schema; later calls use text parsing
+        self._schema_rejected = False
+
+        # Per-call telemetry (latency, tokens, retries, parse outcomes)
+        self.telemetry = Telemetry(config.telemetry_path)
+
+        # Optional persistent response cache
+        self.cache: Optional[ResponseCache] = None
+        if config.cache_path:
+            self.cache = ResponseCache(
+                config.cache_path,
+                max_bytes=config.cache_max_bytes,
+                max_age=config.cache_max_age,
+                replay=config.cache_replay,
+            )
+
         logger.info("Initialized LLMInterface(provider=%s, model=%s)", self.provider, self.model)
 
+    @property
+    def target(self) -> str:
+        """The "provider/model" this interface sends requests to."""
+        return f"{self.provider}/{self.model}"
+
+    @property
+    def async_client(self) -> Any:
+        """Pooled provider SDK client for the async call path of the running event loop."""
+        if self.provider == "mock":
+            return self.client
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            info = PROVIDERS[self.provider]
+            self._async_client = get_async_client(
+                self.provider, self._api_key, info.get("base_url"), info["async_client_ctor"],
+                self._pool_settings,
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    def _call_slot(self) -> asyncio.Semaphore:
+        """
+        Return the semaphore bounding in-flight async calls for the running event loop.
+
+        asyncio primitives are bound to the loop they are first used on, so a new
+        semaphore is created whenever the interface is reused under another loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_semaphore is None or self._async_semaphore_loop is not loop:
+            self._async_semaphore = asyncio.Semaphore(self.config.max_concurrency)
+            self._async_semaphore_loop = loop
+        return self._async_semaphore
+
     def run(
         self,
         user_prompt: str,
@@ -102,10 +410,16 @@ class LLMInterface:
         response_model: Type[BaseModel],
         runs: int = 1,
         lo_prompt: Optional[str] = None,         
+        stop_early: Optional[Callable[[List[Dict[str, Any]]], bool]] = None,
+        first_wave: int = 1,
         **call_overrides: Any,
     ) -> List[BaseModel]:
         """
         Send chat‐completions (and optional LO pass) and return validated models.
+
+        With `stop_early`, runs are sampled adaptively: `first_wave` runs are
+        requested first, then one at a time until `stop_early(results)` reports
+        that further runs cannot change the outcome (or `runs` is reached).
         """
         out: List[BaseModel] = []
         attempts = 0
@@ -113,73 +427,1030 @@ class LLMInterface:
         temperature = call_overrides.get("temperature", self.config.temperature)
         timeout     = call_overrides.get("timeout", self.config.timeout)
 
-        # Initialize here
-        lo_input: Optional[str] = None
-        raw_lo: Optional[str] = None
+        while len(out) < runs:
+            wave = self._next_wave(out, runs, stop_early, first_wave)
+            if not wave:
+                break
+            indices = list(range(attempts, wave + attempts))
+            attempts += len(indices)
+            try:
+                completions = self._chat_call_many(
+                    system_prompt, user_prompt, temperature, timeout, indices,
+                    **self._answer_format(response_model),
+                )
+
+                def finish(job: Tuple[int, Completion]) -> Optional[Dict[str, Any]]:
+                    return self._finish_candidate(
+                        job[1], job[0], runs, user_prompt, response_model, lo_prompt,
+                        temperature, timeout,
+                    )
+
+                jobs = list(zip(indices, completions))
+                if lo_prompt and len(jobs) > 1:
+                    # LO passes of the wave run concurrently instead of one after another
+                    workers = min(len(jobs), self.config.max_concurrency)
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        results = list(pool.map(finish, jobs))
+                else:
+                    results = [finish(job) for job in jobs]
+                out.extend(result for result in results if result is not None)
+            except Exception:
+                logger.exception("LLM call failed")
+                raise
+
+        return out
+
+    async def arun(
+        self,
+        user_prompt: str,
+        system_prompt: str,
+        response_model: Type[BaseModel],
+        runs: int = 1,
+        lo_prompt: Optional[str] = None,
+        stop_early: Optional[Callable[[List[Dict[str, Any]]], bool]] = None,
+        first_wave: int = 1,
+        **call_overrides: Any,
+    ) -> List[BaseModel]:
+        """
+        Async counterpart of `run`.
+
+        All outstanding runs for the statement are requested at once (bounded by
+        `config.max_concurrency` across the whole interface); runs that fail to parse
+        are re-requested in the next wave. Results are returned in the order they
+        were requested, so the output matches what `run` would produce.
+
+        The LO pass of a candidate starts as soon as the request that sampled it
+        returns, so it overlaps with the remaining extraction requests of this and
+        other statements instead of waiting for the whole wave.
+        """
+        out: List[BaseModel] = []
+        attempts = 0
+
+        temperature = call_overrides.get("temperature", self.config.temperature)
+        timeout     = call_overrides.get("timeout", self.config.timeout)
 
         while len(out) < runs:
-            attempts += 1
+            wave = self._next_wave(out, runs, stop_early, first_wave)
+            if not wave:
+                break
+            indices = list(range(attempts, wave + attempts))
+            attempts += len(indices)
+            async def sample(batch: List[int]) -> List[Optional[Dict[str, Any]]]:
+                completions = await self._achat_call_many(
+                    system_prompt, user_prompt, temperature, timeout, batch,
+                    **self._answer_format(response_model),
+                )
+                return await asyncio.gather(*(
+                    self._afinish_candidate(
+                        completion, index, runs, user_prompt, response_model, lo_prompt,
+                        temperature, timeout,
+                    )
+                    for index, completion in zip(batch, completions)
+                ))
+
             try:
-                raw = self._chat_call(system_prompt, user_prompt, temperature, timeout)
-                if not raw.strip():
-                    print(user_prompt)
-                    raise json.JSONDecodeError("Empty response", raw, 0)
-                data = self._extract_json(raw)
+                batches = await asyncio.gather(*(
+                    sample(batch) for batch in self._candidate_batches(indices)
+                ))
+            except Exception:
+                logger.exception("LLM call failed")
+                raise
+            out.extend(result for batch in batches for result in batch if result is not None)
 
-                if lo_prompt:
-                    lo_input = f"Input: {user_prompt}\n{data}"
-                    raw_lo = self._chat_call(lo_prompt, lo_input, temperature, timeout)
-                    data = self._extract_json(raw_lo)
+        return out
 
-                validated = response_model.model_validate(data)
-                out.append(validated.to_dict())
+    def refine(
+        self,
+        user_prompt: str,
+        components: Dict[str, Any],
+        lo_prompt: str,
+        response_model: Type[BaseModel],
+        **call_overrides: Any,
+    ) -> Dict[str, Any]:
+        """
+        Run the logical-operator pass once on already aggregated `components`
+        (the consensus LO strategy) instead of once per sampled run. The pass is
+        re-requested while its output fails to parse or validate.
+        """
+        temperature = call_overrides.get("temperature", self.config.temperature)
+        timeout     = call_overrides.get("timeout", self.config.timeout)
+        lo_input = f"Input: {user_prompt}\n{components}"
+        attempt = 0
+        while True:
+            completion = self._chat_call(
+                lo_prompt, lo_input, temperature, timeout, run_index=attempt, lo_pass=True,
+                **self._json_format(response_model),
+            )
+            attempt += 1
+            result = self._finish_refine(completion, attempt, lo_input, response_model)
+            if result is not None:
+                return result
+
+    async def arefine(
+        self,
+        user_prompt: str,
+        components: Dict[str, Any],
+        lo_prompt: str,
+        response_model: Type[BaseModel],
+        **call_overrides: Any,
+    ) -> Dict[str, Any]:
+        """Async counterpart of `refine`."""
+        temperature = call_overrides.get("temperature", self.config.temperature)
+        timeout     = call_overrides.get("timeout", self.config.timeout)
+        lo_input = f"Input: {user_prompt}\n{components}"
+        attempt = 0
+        while True:
+            completion = await self._achat_call(
+                lo_prompt, lo_input, temperature, timeout, run_index=attempt, lo_pass=True,
+                **self._json_format(response_model),
+            )
+            attempt += 1
+            result = self._finish_refine(completion, attempt, lo_input, response_model)
+            if result is not None:
+                return result
 
+    def _finish_refine(
+        self, completion: Completion, attempt: int, lo_input: str, response_model: Type[BaseModel]
+    ) -> Optional[Dict[str, Any]]:
+        """Validate a consensus LO completion; None when it has to be re-requested."""
+        raw_lo, record = completion
+        try:
+            data, repairs = self._reject_truncated(
+                self._parse_output(raw_lo, lo_input, matches_model(response_model)), raw_lo
+            )
+            result = response_model.model_validate(data).to_dict()
+        except (json.JSONDecodeError, ValidationError) as err:
+            self.telemetry.resolve(record, parse_outcome(err))
+            self._handle_parse_error(err, attempt, 1, raw_lo, None)
+            return None
+        self.telemetry.resolve(record, "repaired" if repairs else "ok")
+        self._record_repairs(repairs)
+        return result
+
+    async def arun_packed(
+        self,
+        statements: Sequence[Tuple[str, str]],
+        system_prompt: str,
+        response_model: Type[BaseModel],
+        runs: int = 1,
+        lo_prompt: Optional[str] = None,
+        pack_size: int = 8,
+        token_budget: Optional[int] = None,
+        **call_overrides: Any,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Extract several statements per request.
+
+        `statements` are (id, text) pairs. They are sent as a JSON array, up to
+        `pack_size` per request and chunked so the expected output stays within
+        `token_budget` tokens; `system_prompt` must ask for a {"results": [...]}
+        object keyed by id. Each entry is validated on its own, and only statements
+        that are missing from the answer or fail validation are re-requested. A
+        chunk whose whole answer is unparseable (typically truncated output) makes
+        later chunks smaller.
+
+        Returns a dict mapping each statement id to its list of validated runs.
+        """
+        temperature = call_overrides.get("temperature", self.config.temperature)
+        timeout     = call_overrides.get("timeout", self.config.timeout)
+        if token_budget is None:
+            token_budget = int(MAX_OUTPUT_TOKENS * 0.75)
+
+        texts = {str(sid): text for sid, text in statements}
+        out: Dict[str, List[Dict[str, Any]]] = {sid: [] for sid in texts}
+        attempts: Dict[str, int] = {sid: 0 for sid in texts}
+        requested = 0
+
+        async def finish(sid: str, components: Any, attempt: int) -> None:
+            raw_lo: Optional[str] = None
+            record: Optional[CallRecord] = None
+            lo_repairs: List[str] = []
+            try:
+                data = components
+                if lo_prompt:
+                    lo_input = f"Input: {texts[sid]}\n{data}"
+                    raw_lo, record = await self._achat_call(
+                        lo_prompt, lo_input, temperature, timeout,
+                        run_index=attempt - 1, lo_pass=True,
+                        **self._json_format(response_model),
+                    )
+                    data, lo_repairs = self._reject_truncated(
+                        self._loads(raw_lo, matches_model(response_model)), raw_lo
+                    )
+                result = response_model.model_validate(data).to_dict()
+                self.telemetry.resolve(record, "repaired" if lo_repairs else "ok")
+                self._record_repairs(lo_repairs)
+                if len(out[sid]) < runs:
+                    out[sid].append(result)
             except (json.JSONDecodeError, ValidationError) as err:
-                logger.warning("Parse error on attempt %d: %s\nRaw Output:\n%s", attempts, err, raw)
-                if lo_prompt and raw_lo is not None:
-                    logger.warning("LO Pass Output:\n%s", raw_lo)
-                if attempts >= runs * 10:
-                    raise RuntimeError("Too many failed attempts parsing LLM output.") from err
-                continue
+                self.telemetry.resolve(record, parse_outcome(err))
+                self._handle_parse_error(err, attempt, runs, json.dumps(components), raw_lo)
+
+        async def request(chunk: List[str], wave: int, first_index: int) -> bool:
+            user_prompt = json.dumps(
+                [{"id": sid, "input": texts[sid]} for sid in chunk], ensure_ascii=False
+            )
+            completions = await self._achat_call_many(
+                system_prompt, user_prompt, temperature, timeout,
+                list(range(first_index, first_index + wave)), kind="packed",
+                schema=self._output_schema(response_model, packed=True),
+                accept=has_key("results"),
+            )
+            parsed_any = False
+            finishing = []
+            for raw, record in completions:
+                for sid in chunk:
+                    attempts[sid] += 1
+                if record is not None:
+                    # Run indices are global across chunks; report the per-statement attempt
+                    record.attempt = max(attempts[sid] for sid in chunk)
+                try:
+                    parsed, repairs = self._parse_output(raw, user_prompt, has_key("results"))
+                    entries = parsed.get("results", [])
+                    self.telemetry.resolve(record, "repaired" if repairs else "ok")
+                    self._record_repairs(repairs)
+                except (json.JSONDecodeError, AttributeError) as err:
+                    self.telemetry.resolve(record, parse_outcome(err))
+                    logger.warning("Unparseable packed response for %d statements: %s", len(chunk), err)
+                    for sid in chunk:
+                        if attempts[sid] >= runs * 10:
+                            raise RuntimeError("Too many failed attempts parsing LLM output.") from err
+                    continue
+                # A truncated answer still yields its complete entries, but means the
+                # pack was too large for the output budget
+                parsed_any = parsed_any or "truncated" not in repairs
+                if "truncated" in repairs and entries and not self._closed_entry(raw):
+                    # The last entry was cut off inside its components; re-request it
+                    entries = entries[:-1]
+                by_id = {
+                    str(entry.get("id")): entry.get("components")
+                    for entry in entries if isinstance(entry, dict)
+                }
+                for sid in chunk:
+                    if sid in by_id:
+                        finishing.append(finish(sid, by_id[sid], attempts[sid]))
+                    else:
+                        self._handle_parse_error(
+                            ValueError(f"statement {sid} missing from packed response"),
+                            attempts[sid], runs, raw, None,
+                        )
+            try:
+                await asyncio.gather(*finishing)
             except Exception:
                 logger.exception("LLM call failed")
                 raise
+            return parsed_any
+
+        while True:
+            pending = [sid for sid in texts if len(out[sid]) < runs]
+            if not pending:
+                break
+            chunks = self._pack_chunks(pending, texts, pack_size, token_budget)
+            jobs = []
+            for chunk in chunks:
+                wave = max(runs - len(out[sid]) for sid in chunk)
+                jobs.append(request(chunk, wave, requested))
+                requested += wave
+            parsed = await asyncio.gather(*jobs)
+            if not all(parsed) and pack_size > 1:
+                pack_size = max(1, pack_size // 2)
+                logger.info("Reducing pack size to %d after unparseable responses", pack_size)
 
         return out
 
+    @staticmethod
+    def _closed_entry(raw: str) -> bool:
+        """
+        Whether truncated packed output ends right after a closed object, i.e. the
+        last (possibly unclosed) entry's components were written completely.
+        """
+        return raw.rstrip().rstrip(",").rstrip().endswith("}")
+
+    def _pack_chunks(
+        self, ids: List[str], texts: Dict[str, str], pack_size: int, token_budget: int
+    ) -> List[List[str]]:
+        """
+        Group statements into requests of at most `pack_size` statements whose
+        estimated output fits `token_budget`. The JSON answer repeats most of a
+        statement's text plus keys and quotes, so output is estimated at twice the
+        input plus a fixed per-statement overhead.
+        """
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for sid in ids:
+            cost = 2 * estimate_tokens(texts[sid]) + 32
+            if current and (len(current) >= pack_size or used + cost > token_budget):
+                chunks.append(current)
+                current, used = [], 0
+            current.append(sid)
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _next_wave(
+        out: List[Dict[str, Any]],
+        runs: int,
+        stop_early: Optional[Callable[[List[Dict[str, Any]]], bool]],
+        first_wave: int,
+    ) -> int:
+        """Number of runs to request next (0 once adaptive sampling has decided)."""
+        if stop_early is None:
+            return runs - len(out)
+        if out and stop_early(out):
+            return 0
+        target = max(len(out) + 1, min(runs, first_wave))
+        return min(runs, target) - len(out)
+
+    def _finish_candidate(
+        self,
+        completion: Completion,
+        index: int,
+        runs: int,
+        user_prompt: str,
+        response_model: Type[BaseModel],
+        lo_prompt: Optional[str],
+        temperature: float,
+        timeout: int,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Parse one sampled completion (running the LO pass on it if requested) and
+        validate it; returns None when the candidate has to be re-requested. See
+        `_candidate_steps` for the parsing and bookkeeping.
+        """
+        steps = self._candidate_steps(completion, index, runs, user_prompt, response_model, lo_prompt)
+        try:
+            lo_input = next(steps)
+            while True:
+                lo_input = steps.send(self._chat_call(
+                    lo_prompt, lo_input, temperature, timeout, run_index=index, lo_pass=True,
+                    **self._json_format(response_model),
+                ))
+        except StopIteration as done:
+            return done.value
+
+    async def _afinish_candidate(
+        self,
+        completion: Completion,
+        index: int,
+        runs: int,
+        user_prompt: str,
+        response_model: Type[BaseModel],
+        lo_prompt: Optional[str],
+        temperature: float,
+        timeout: int,
+    ) -> Optional[Dict[str, Any]]:
+        """Async counterpart of `_finish_candidate`."""
+        steps = self._candidate_steps(completion, index, runs, user_prompt, response_model, lo_prompt)
+        try:
+            lo_input = next(steps)
+            while True:
+                lo_input = steps.send(await self._achat_call(
+                    lo_prompt, lo_input, temperature, timeout, run_index=index, lo_pass=True,
+                    **self._json_format(response_model),
+                ))
+        except StopIteration as done:
+            return done.value
+
+    def _candidate_steps(
+        self,
+        completion: Completion,
+        index: int,
+        runs: int,
+        user_prompt: str,
+        response_model: Type[BaseModel],
+        lo_prompt: Optional[str],
+    ) -> Generator[str, Completion, Optional[Dict[str, Any]]]:
+        """
+        Parsing and bookkeeping of `_finish_candidate`, without the I/O: with an
+        `lo_prompt`, yields the LO input and expects the LO completion to be sent
+        back. Returns the validated result, or None when the candidate has to be
+        re-requested; the parse outcome is attached to the telemetry record of the
+        call that failed.
+        """
+        raw, record = completion
+        raw_lo: Optional[str] = None
+        try:
+            data, repairs = self._parse_answer(raw, user_prompt, response_model)
+            if lo_prompt:
+                self.telemetry.resolve(record, "repaired" if repairs else "ok")
+                self._record_repairs(repairs)
+                raw_lo, record = yield f"Input: {user_prompt}\n{data}"
+                data, repairs = self._reject_truncated(
+                    self._loads(raw_lo, matches_model(response_model)), raw_lo
+                )
+            result = response_model.model_validate(data).to_dict()
+        except (json.JSONDecodeError, ValidationError) as err:
+            self.telemetry.resolve(record, parse_outcome(err))
+            self._handle_parse_error(err, index + 1, runs, raw, raw_lo)
+            return None
+        self.telemetry.resolve(record, "repaired" if repairs else "ok")
+        self._record_repairs(repairs)
+        return result
+
+    def _parse_answer(
+        self, raw: str, user_prompt: str, response_model: Type[BaseModel]
+    ) -> Tuple[Any, List[str]]:
+        """
+        Parse an extraction completion in the configured `output_format`. Coded
+        text is parsed with `parse_coded`; an answer without any component of
+        `response_model`, or one that was cut off, is rejected like unparseable JSON.
+        """
+        if self.config.output_format != "coded":
+            return self._reject_truncated(
+                self._parse_output(raw, user_prompt, matches_model(response_model)), raw
+            )
+        data = parse_coded(raw or "", response_model)
+        if not data:
+            raise json.JSONDecodeError("No coded components", raw or "", 0)
+        return data, []
+
+    def _parse_output(
+        self, raw: str, user_prompt: str, accept: Callable[[Any], bool] = is_object
+    ) -> Tuple[Any, List[str]]:
+        """
+        Reject empty completions and extract the JSON payload from `raw`; see
+        `_loads` for `accept` and the returned repair kinds.
+        """
+        if not raw or not raw.strip():
+            logger.debug("Empty response for prompt: %s", user_prompt)
+            raise json.JSONDecodeError("Empty response", raw or "", 0)
+        return self._loads(raw, accept)
+
+    def _loads(
+        self, raw: str, accept: Callable[[Any], bool] = is_object
+    ) -> Tuple[Any, List[str]]:
+        """
+        Parse a completion that is normally bare JSON (structured output), falling
+        back to `_extract_json` for fenced or chatty text and then to the local
+        repair stage (trailing commas, quoting, truncation, ...), which saves a
+        new call for almost-valid output.
+
+        When the payload has to be searched for, the first object satisfying
+        `accept` (e.g. one with the response model's keys) is used. If only other
+        objects are found (e.g. the first entry of a truncated packed answer), the
+        repaired payload is used instead when it satisfies `accept`.
+
+        Returns the data and the kinds of repair that were applied. Repaired data
+        must still pass `model_validate` before it is accepted (`_record_repairs`).
+        """
+        try:
+            return json.loads(raw), []
+        except json.JSONDecodeError:
+            pass
+        try:
+            value = self._extract_json(raw, accept)
+        except json.JSONDecodeError:
+            if not self.config.json_repair:
+                raise
+            return repair_json(raw)
+        if accept(value) or not self.config.json_repair:
+            return value, []
+        try:
+            repaired, repairs = repair_json(raw)
+        except json.JSONDecodeError:
+            return value, []
+        return (repaired, repairs) if accept(repaired) else (value, [])
+
+    @staticmethod
+    def _reject_truncated(parsed: Tuple[Any, List[str]], raw: str) -> Tuple[Any, List[str]]:
+        """
+        Reject an extraction answer that only parsed after closing truncated output:
+        the dropped tail may have held components, so the answer must not count as
+        a vote and is re-requested instead.
+        """
+        data, repairs = parsed
+        if "truncated" in repairs:
+            raise json.JSONDecodeError("Truncated answer", raw, len(raw))
+        return data, repairs
+
+    def _record_repairs(self, repairs: List[str]) -> None:
+        """Count a repaired completion that was accepted."""
+        if not repairs:
+            return
+        logger.info("Repaired LLM output locally instead of re-calling (%s)", ", ".join(repairs))
+        with self._usage_lock:
+            self.repairs.update(repairs)
+
+    def _answer_format(self, response_model: Type[BaseModel]) -> Dict[str, Any]:
+        """
+        `schema` and `accept` for an extraction call. Coded answers are free text:
+        no schema is requested, and a streamed answer is read to the end since
+        there is no JSON object to close the stream at.
+        """
+        if self.config.output_format == "coded":
+            return dict(schema=None, accept=lambda value: False)
+        return self._json_format(response_model)
+
+    def _json_format(self, response_model: Type[BaseModel]) -> Dict[str, Any]:
+        """`schema` and `accept` for a JSON answer with the fields of `response_model`."""
+        return dict(schema=self._output_schema(response_model), accept=matches_model(response_model))
+
+    def _output_schema(
+        self, response_model: Type[BaseModel], packed: bool = False
+    ) -> Optional[OutputSchema]:
+        """Schema to request natively, or None when structured output is off."""
+        if not self.config.structured_output or self._schema_rejected:
+            return None
+        # Anthropic tool input property names cannot contain commas ("A,p")
+        return output_schema(response_model, packed, tool_keys=self.provider == "claude")
+
+    @staticmethod
+    def _handle_parse_error(
+        err: Exception, attempts: int, runs: int, raw: Optional[str], raw_lo: Optional[str]
+    ) -> None:
+        """Log an unparseable completion and give up once the attempt budget is spent."""
+        logger.warning("Parse error on attempt %d: %s\nRaw Output:\n%s", attempts, err, raw)
+        if raw_lo is not None:
+            logger.warning("LO Pass Output:\n%s", raw_lo)
+        if attempts >= runs * 10:
+            raise RuntimeError("Too many failed attempts parsing LLM output.") from err
+
     def _chat_call(
-        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int
-    ) -> str:
-        """Dispatch to provider-specific implementation."""
-        method = getattr(self, f"_call_{self.provider}")
-        return method(system_prompt, user_prompt, temperature, timeout)
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        run_index: int = 0,
+        lo_pass: bool = False,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> Completion:
+        """Request a single completion; see `_chat_call_many`."""
+        return self._chat_call_many(
+            system_prompt, user_prompt, temperature, timeout, [run_index], lo_pass,
+            schema=schema, accept=accept,
+        )[0]
 
-    def _call_openai(
-        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int
-    ) -> str:
-        """Call OpenAI API with the given prompts and parameters."""
+    async def _achat_call(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        run_index: int = 0,
+        lo_pass: bool = False,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> Completion:
+        """Async counterpart of `_chat_call`."""
+        return (await self._achat_call_many(
+            system_prompt, user_prompt, temperature, timeout, [run_index], lo_pass,
+            schema=schema, accept=accept,
+        ))[0]
+
+    def _chat_call_many(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        run_indices: List[int],
+        lo_pass: bool = False,
+        kind: Optional[str] = None,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> List[Completion]:
+        """
+        Return one completion per entry in `run_indices`.
+
+        Responses are served from / written to the response cache when one is
+        configured; `run_index` and `lo_pass` are part of the cache key so repeated
+        runs of the same statement stay distinct samples. Missing completions are
+        sampled several per request where the provider supports it (`n=` /
+        `candidate_count`), otherwise as concurrent single requests.
+
+        Every provider request (and cache hit) gets a telemetry record of the given
+        `kind` ("extraction" or "lo" by default); callers resolve its parse outcome.
+
+        With `schema`, the completion is constrained through the provider's native
+        structured-output mechanism. With `config.stream`, a streamed completion is
+        cut off once it contains a JSON object satisfying `accept`.
+        """
+        kind = kind or ("lo" if lo_pass else "extraction")
+        completions = self._cached_candidates(
+            system_prompt, user_prompt, temperature, run_indices, lo_pass, kind, schema
+        )
+        batches = self._candidate_batches([i for i in run_indices if i not in completions])
+        records = [self._new_record(kind, batch) for batch in batches]
+        if len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(batches), self.config.max_concurrency)) as pool:
+                responses = list(pool.map(
+                    lambda job: self._dispatch(
+                        system_prompt, user_prompt, temperature, timeout, len(job[0]), job[1],
+                        schema, accept,
+                    ),
+                    zip(batches, records),
+                ))
+        else:
+            responses = [
+                self._dispatch(
+                    system_prompt, user_prompt, temperature, timeout, len(batch), record, schema,
+                    accept,
+                )
+                for batch, record in zip(batches, records)
+            ]
+        for batch, resp, record in zip(batches, responses, records):
+            self._store_candidates(
+                completions, batch, resp, record, system_prompt, user_prompt, temperature,
+                lo_pass, schema,
+            )
+        return [completions.get(i, Completion("")) for i in run_indices]
+
+    async def _achat_call_many(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        run_indices: List[int],
+        lo_pass: bool = False,
+        kind: Optional[str] = None,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> List[Completion]:
+        """Async counterpart of `_chat_call_many`."""
+        kind = kind or ("lo" if lo_pass else "extraction")
+        completions = self._cached_candidates(
+            system_prompt, user_prompt, temperature, run_indices, lo_pass, kind, schema
+        )
+        batches = self._candidate_batches([i for i in run_indices if i not in completions])
+        records = [self._new_record(kind, batch) for batch in batches]
+        responses = await asyncio.gather(*(
+            self._adispatch(
+                system_prompt, user_prompt, temperature, timeout, len(batch), record, schema,
+                accept,
+            )
+            for batch, record in zip(batches, records)
+        ))
+        for batch, resp, record in zip(batches, responses, records):
+            self._store_candidates(
+                completions, batch, resp, record, system_prompt, user_prompt, temperature,
+                lo_pass, schema,
+            )
+        return [completions.get(i, Completion("")) for i in run_indices]
+
+    def _candidate_batches(self, run_indices: List[int]) -> List[List[int]]:
+        """Split the runs to sample into groups that can share one provider request."""
+        size = PROVIDERS[self.provider].get("max_candidates", 1) if self.config.multi_sample else 1
+        return [run_indices[i:i + size] for i in range(0, len(run_indices), size)]
+
+    def _new_record(self, kind: str, batch: List[int]) -> CallRecord:
+        return CallRecord(
+            provider=self.provider,
+            model=self.model,
+            kind=kind,
+            attempt=batch[0] + 1,
+            candidates=len(batch),
+        )
+
+    def _cached_candidates(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        run_indices: List[int],
+        lo_pass: bool,
+        kind: str,
+        schema: Optional[OutputSchema],
+    ) -> Dict[int, Completion]:
+        completions: Dict[int, Completion] = {}
+        if self.cache is None:
+            return completions
+        for index in run_indices:
+            cached = self.cache.get(
+                self._cache_key(system_prompt, user_prompt, temperature, index, lo_pass, schema)
+            )
+            if cached is not None:
+                record = self._new_record(kind, [index])
+                record.response_cache_hit = True
+                self.telemetry.finish(record)
+                completions[index] = Completion(cached, record)
+        return completions
+
+    def _store_candidates(
+        self,
+        completions: Dict[int, Completion],
+        batch: List[int],
+        resp: ChatResponse,
+        record: CallRecord,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        lo_pass: bool,
+        schema: Optional[OutputSchema],
+    ) -> None:
+        """Assign the candidates of one response to their run indices (and cache them)."""
+        if len(resp.candidates) < len(batch):
+            logger.warning(
+                "Requested %d candidates, received %d", len(batch), len(resp.candidates)
+            )
+            # Missing candidates are never parsed; count them as empty outputs
+            for _ in range(len(batch) - len(resp.candidates)):
+                self.telemetry.resolve(record, "json_error")
+        for index, text in zip(batch, resp.candidates):
+            completions[index] = Completion(text, record)
+            if self.cache is not None:
+                self.cache.put(
+                    self._cache_key(
+                        system_prompt, user_prompt, temperature, index, lo_pass, schema
+                    ),
+                    text or "",
+                )
+
+    def _dispatch(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        n: int,
+        record: CallRecord,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """
+        Dispatch to provider-specific implementation, waiting for rate-limit budget
+        first and backing off (instead of failing) when the provider returns 429.
+        A request whose schema the provider rejects is re-sent without it.
+        Latency, token usage and retries are written to `record`.
+        """
+        method = self._provider_method("_", accept)
+        estimate = self._estimate_call_tokens(system_prompt, user_prompt, n)
+        began = time.perf_counter()
+        while True:
+            self.rate_limiter.acquire(estimate)
+            sent = time.perf_counter()
+            try:
+                resp = method(system_prompt, user_prompt, temperature, timeout, n, schema)
+            except Exception as err:
+                if schema is not None and self._reject_schema(err):
+                    schema = None
+                    continue
+                delay = self._retry_delay(err, record, began)
+                if delay is None:
+                    self._finish_record(record, None, sent, began, err)
+                    raise
+                time.sleep(delay)
+                continue
+            self.rate_limiter.on_success(resp.headers, estimate, resp.total_tokens)
+            self._record_usage(resp)
+            self._finish_record(record, resp, sent, began)
+            return resp
+
+    async def _adispatch(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        n: int,
+        record: CallRecord,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """
+        Async counterpart of `_dispatch`, bounded by `max_concurrency`. With
+        hedging enabled, slow requests are duplicated (see `_ahedged_call`).
+        """
+        method = self._provider_method("_a", accept)
+        estimate = self._estimate_call_tokens(system_prompt, user_prompt, n)
+        began = time.perf_counter()
+        async with self._call_slot():
+            while True:
+                await self.rate_limiter.aacquire(estimate)
+                sent = time.perf_counter()
+                try:
+                    if self.hedger is None:
+                        resp = await method(system_prompt, user_prompt, temperature, timeout, n, schema)
+                    else:
+                        resp = await self._ahedged_call(
+                            lambda: method(system_prompt, user_prompt, temperature, timeout, n, schema),
+                            record, estimate,
+                        )
+                except Exception as err:
+                    if schema is not None and self._reject_schema(err):
+                        schema = None
+                        continue
+                    delay = self._retry_delay(err, record, began)
+                    if delay is None:
+                        self._finish_record(record, None, sent, began, err)
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                self.rate_limiter.on_success(resp.headers, estimate, resp.total_tokens)
+                self._record_usage(resp)
+                self._finish_record(record, resp, sent, began)
+                if self.hedger is not None and not record.hedged:
+                    self.hedger.observe(record.kind, record.latency)
+                return resp
+
+    def _provider_method(
+        self, prefix: str, accept: Callable[[Any], bool]
+    ) -> Callable[..., Any]:
+        """
+        The `_call_<provider>` adapter (`prefix` "_" or "_a" for async), or its
+        streaming counterpart `_stream_<provider>` bound to `accept` when
+        `config.stream` is set.
+        """
+        if not self.config.stream:
+            return getattr(self, f"{prefix}call_{self.provider}")
+        stream = getattr(self, f"{prefix}stream_{self.provider}")
+        return lambda *args: stream(*args, accept=accept)
+
+    async def _ahedged_call(
+        self,
+        request: Callable[[], Awaitable[ChatResponse]],
+        record: CallRecord,
+        estimate: int,
+    ) -> ChatResponse:
+        """
+        Await `request()`; if it has not returned within the hedging delay for this
+        kind of call, send a duplicate and return whichever succeeds first. The
+        other request is cancelled. A duplicate is only sent while the hedge budget
+        lasts and the rate limiter has room for it without waiting; it does not take
+        a concurrency slot of its own.
+        """
+        primary = asyncio.ensure_future(request())
+        tasks = [primary]
         try:
-            resp = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": dedent(system_prompt)},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=temperature,
-                timeout=timeout,
-                seed=0,
-                max_completion_tokens=2048,
-                **self.provider_kwargs,
-            )
-            return resp.choices[0].message.content
-        except Exception as e:
-            raise RuntimeError("OpenAI API error") from e
+            delay = self.hedger.delay(record.kind)
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self.hedger.try_hedge():
+                return await primary
+            if not self.rate_limiter.try_reserve(estimate):
+                self.hedger.refund()
+                return await primary
+            logger.debug("Hedging %s call after %.1fs", record.kind, delay)
+            record.hedged = True
+            hedge = asyncio.ensure_future(request())
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        record.hedge_won = task is hedge
+                        return task.result()
+            # Both failed: surface the original request's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
-    def _call_deepseek(
-        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int
+    def _finish_record(
+        self,
+        record: CallRecord,
+        resp: Optional[ChatResponse],
+        sent: float,
+        began: float,
+        err: Optional[BaseException] = None,
+    ) -> None:
+        """Fill in timing and usage for a finished request and hand it to telemetry."""
+        now = time.perf_counter()
+        record.latency = now - sent
+        record.elapsed = now - began
+        if resp is not None:
+            record.prompt_tokens = resp.input_tokens
+            record.cached_prompt_tokens = resp.cached_input_tokens
+            record.completion_tokens = resp.output_tokens
+            record.reasoning_tokens = resp.reasoning_tokens
+            record.ttft = resp.first_token
+            record.time_to_json = resp.json_complete
+            record.stream_cut = resp.stream_cut
+        if err is not None:
+            record.error = f"{type(err).__name__}: {err}"
+        self.telemetry.finish(record)
+
+    def _record_usage(self, resp: ChatResponse) -> None:
+        """Log cached vs. uncached input tokens for one call and add them to `usage`."""
+        cached = resp.cached_input_tokens or 0
+        logger.debug(
+            "Call usage: input=%s (cached=%d, uncached=%s) output=%s",
+            resp.input_tokens, cached,
+            None if resp.input_tokens is None else resp.input_tokens - cached,
+            resp.output_tokens,
+        )
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["input_tokens"] += resp.input_tokens or 0
+            self.usage["cached_input_tokens"] += cached
+            self.usage["output_tokens"] += resp.output_tokens or 0
+
+    def _cache_key(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        run_index: int,
+        lo_pass: bool,
+        schema: Optional[OutputSchema] = None,
     ) -> str:
-        """Call DeepSeek API with the given prompts and parameters."""
-        resp = self.client.chat.completions.create(
+        return ResponseCache.make_key(
+            self.provider, self.model, system_prompt, user_prompt,
+            temperature, run_index, lo_pass,
+            extra=schema.fingerprint() if schema is not None else None,
+        )
+
+    def _estimate_call_tokens(self, system_prompt: str, user_prompt: str, n: int = 1) -> int:
+        """Token cost charged against the TPM budget before the real usage is known."""
+        return (
+            estimate_tokens(system_prompt)
+            + estimate_tokens(user_prompt)
+            + self.config.expected_output_tokens * n
+        )
+
+    def _reject_schema(self, err: Exception) -> bool:
+        """
+        True if `err` is the provider refusing the response schema: an HTTP 400
+        whose message is about the schema (`response_format`, `response_schema`,
+        `input_schema`, ...). Text parsing is used for the rest of the run. Any
+        other bad request (context length, invalid parameter) is not a schema
+        rejection and fails as a `BadRequestError`.
+        """
+        if http_status(err) != 400:
+            return False
+        messages = [str(e).lower() for e in _error_chain(err)]
+        if not any(hint in m for m in messages for hint in _SCHEMA_ERROR_HINTS):
+            return False
+        logger.warning("Provider rejected the response schema, falling back to text parsing: %s", err)
+        self._schema_rejected = True
+        return True
+
+    def _retry_delay(self, err: Exception, record: CallRecord, began: float) -> Optional[float]:
+        """
+        Classify a failed request and decide whether to try again: None to give up,
+        otherwise the seconds to wait first (see `RetryPolicy`). A 429 is registered
+        with the rate limiter, which then holds back every request for this provider
+        and model, so the request itself is re-queued without sleeping.
+        """
+        err = classify_error(err, self.provider)
+        elapsed = time.perf_counter() - began
+        if isinstance(err, RateLimitError):
+            if not self.retry_policy.allows(err, record.rate_limit_retries, elapsed):
+                return None
+            self.rate_limiter.on_rate_limited(err.retry_after)
+            record.rate_limit_retries += 1
+            return 0.0
+        delay = self.retry_policy.backoff(record.transient_retries, err.retry_after)
+        if not self.retry_policy.allows(err, record.transient_retries, elapsed, delay):
+            return None
+        logger.warning("%s; retrying in %.1fs", err, delay)
+        record.transient_retries += 1
+        return delay
+
+    def _openai_request(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        n: int,
+        schema: Optional[OutputSchema] = None,
+    ) -> Dict[str, Any]:
+        """Keyword arguments for an OpenAI chat-completions request."""
+        request: Dict[str, Any] = dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": dedent(system_prompt)},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=temperature,
+            timeout=timeout,
+            seed=0,
+            max_completion_tokens=MAX_OUTPUT_TOKENS,
+            **self.provider_kwargs,
+        )
+        if n > 1:
+            request["n"] = n
+        if schema is not None:
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": schema.name, "schema": schema.schema, "strict": True},
+            }
+        if self.config.prompt_caching:
+            # Automatic prefix caching: the system prompt is the stable prefix, and a
+            # key derived from it routes every statement to the same cache shard.
+            request.setdefault("prompt_cache_key", self._prompt_hash(system_prompt)[:32])
+        return request
+
+    def _deepseek_request(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        n: int,
+        schema: Optional[OutputSchema] = None,
+    ) -> Dict[str, Any]:
+        """Keyword arguments for a DeepSeek chat-completions request (one candidate only)."""
+        request: Dict[str, Any] = dict(
             model=self.model,
             messages=[
                 {"role": "system", "content": dedent(system_prompt)},
@@ -188,89 +1459,801 @@ class LLMInterface:
             stream=False,
             **self.provider_kwargs,
         )
-        return resp.choices[0].message.content
+        if schema is not None:
+            # DeepSeek only offers JSON mode, not schema-constrained decoding
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _gemini_request(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        n: int,
+        schema: Optional[OutputSchema] = None,
+        cached: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Keyword arguments for a Gemini generate_content request. The system prompt
+        is sent as a context cache if one is available, unless `cached` is False.
+        """
+        from google.genai import types
+        config: Dict[str, Any] = dict(
+            max_output_tokens=MAX_OUTPUT_TOKENS,
+            temperature=temperature,
+            seed=0,
+        )
+        cached_content = self._gemini_cached_content(system_prompt) if cached else None
+        if cached_content:
+            config["cached_content"] = cached_content
+        else:
+            config["system_instruction"] = dedent(system_prompt)
+        if n > 1:
+            config["candidate_count"] = n
+        if schema is not None:
+            config["response_mime_type"] = "application/json"
+            config["response_json_schema"] = schema.schema
+        return dict(
+            model=self.model,
+            config=types.GenerateContentConfig(**config),
+            contents=[user_prompt],
+            **self.provider_kwargs,
+        )
+
+    def _claude_request(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        timeout: int,
+        n: int,
+        schema: Optional[OutputSchema] = None,
+    ) -> Dict[str, Any]:
+        """Keyword arguments for an Anthropic messages request (one candidate only)."""
+        system: Any = dedent(system_prompt)
+        if self.config.prompt_caching:
+            # Mark the shared system prompt as a cacheable prefix
+            system = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        request: Dict[str, Any] = dict(
+            model=self.model,
+            system=system,
+            messages=[
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=temperature,
+            timeout=timeout,
+            max_tokens=MAX_OUTPUT_TOKENS,
+            **self.provider_kwargs,
+        )
+        if schema is not None:
+            # Anthropic has no response-format option; force a tool whose input is the answer
+            request["tools"] = [{
+                "name": schema.name,
+                "description": "Record the extracted components.",
+                "input_schema": schema.schema,
+            }]
+            request["tool_choice"] = {"type": "tool", "name": schema.name}
+        return request
+
+    @staticmethod
+    def _prompt_hash(system_prompt: str) -> str:
+        return hashlib.sha256(dedent(system_prompt).encode("utf-8")).hexdigest()
+
+    def _gemini_cached_content(self, system_prompt: str) -> Optional[str]:
+        """
+        Name of a Gemini explicit context cache holding `system_prompt`, created on
+        first use and recreated shortly before its TTL runs out. Prompts below the
+        model's minimum cacheable size (or any other cache failure) are remembered
+        and sent uncached.
+        """
+        if not self.config.prompt_caching or self.client is None:
+            return None
+        key = self._prompt_hash(system_prompt)
+        ttl = self.config.gemini_cache_ttl
+        with self._gemini_caches_lock:
+            now = time.monotonic()
+            if key in self._gemini_caches:
+                entry = self._gemini_caches[key]
+                if entry is None:
+                    return None
+                name, expires = entry
+                if now < expires - min(GEMINI_CACHE_REFRESH * ttl, GEMINI_CACHE_REFRESH_MAX):
+                    return name
+                logger.info("Gemini context cache %s is about to expire, recreating it", name)
+            from google.genai import types
+            try:
+                cache = self.client.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=dedent(system_prompt),
+                        ttl=f"{ttl}s",
+                    ),
+                )
+            except Exception as e:
+                logger.info("Gemini context caching unavailable, sending prompt uncached: %s", e)
+                self._gemini_caches[key] = None
+                return None
+            self._gemini_caches[key] = (cache.name, now + ttl)
+            self._gemini_created.append(cache.name)
+            logger.info("Created Gemini context cache %s", cache.name)
+            return cache.name
+
+    def _drop_gemini_cache(self, err: Exception, request: Dict[str, Any]) -> bool:
+        """
+        True if `request` failed because the context cache it names no longer
+        exists (expired or deleted). The cache is forgotten, so the next request
+        creates a new one.
+        """
+        name = getattr(request["config"], "cached_content", None)
+        if not name or http_status(err) not in (400, 403, 404):
+            return False
+        if not any("cache" in str(e).lower() for e in _error_chain(err)):
+            return False
+        with self._gemini_caches_lock:
+            for key, entry in list(self._gemini_caches.items()):
+                if entry is not None and entry[0] == name:
+                    del self._gemini_caches[key]
+        logger.warning("Gemini context cache %s is gone, sending the prompt inline: %s", name, err)
+        return True
+
+    def _gemini_send(self, send: Callable[[Dict[str, Any]], Any], *args: Any) -> Any:
+        """
+        `send(request)` for the Gemini request built from `args` (see
+        `_gemini_request`). If its context cache is gone, the request is sent once
+        more with the system prompt inline.
+        """
+        request = self._gemini_request(*args)
+        try:
+            return send(request)
+        except Exception as err:
+            if not self._drop_gemini_cache(err, request):
+                raise
+            return send(self._gemini_request(*args, cached=False))
+
+    async def _agemini_send(self, send: Callable[[Dict[str, Any]], Awaitable[Any]], *args: Any) -> Any:
+        """Async counterpart of `_gemini_send`."""
+        # Create the context cache off the event loop before building the request
+        await asyncio.to_thread(self._gemini_cached_content, args[0])
+        request = self._gemini_request(*args)
+        try:
+            return await send(request)
+        except Exception as err:
+            if not self._drop_gemini_cache(err, request):
+                raise
+            return await send(self._gemini_request(*args, cached=False))
+
+    def close(self) -> None:
+        """Delete the Gemini context caches this interface created."""
+        with self._gemini_caches_lock:
+            created, self._gemini_created = self._gemini_created, []
+            self._gemini_caches.clear()
+        for name in created:
+            try:
+                self.client.caches.delete(name=name)
+                logger.info("Deleted Gemini context cache %s", name)
+            except Exception as e:
+                # An expired cache is already gone
+                logger.debug("Could not delete Gemini context cache %s: %s", name, e)
+
+    def _call_openai(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Call OpenAI API with the given prompts and parameters."""
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(
+                **self._openai_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            )
+            return self._openai_response(raw)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    def _call_deepseek(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Call DeepSeek API with the given prompts and parameters."""
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(
+                **self._deepseek_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            )
+            return self._openai_response(raw)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
 
     def _call_gemini(
-        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int
-    ) -> str:
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
         """Call Gemini API with the given prompts and parameters."""
-        from google.genai import types
         try:
-            resp = self.client.models.generate_content(
-                model=self.model,
-                config=types.GenerateContentConfig(
-                    max_output_tokens=2048,
-                    temperature=temperature,
-                    seed=0,
-                    system_instruction=dedent(system_prompt),
-                ),
-                contents=[user_prompt],
-                **self.provider_kwargs,
+            resp = self._gemini_send(
+                lambda request: self.client.models.generate_content(**request),
+                system_prompt, user_prompt, temperature, timeout, n, schema,
             )
-            if not resp or not resp.text:
-                raise ValueError("Empty response from Gemini API")
-            return resp.text
+            return self._gemini_response(resp)
         except Exception as e:
-            raise RuntimeError("Gemini API error") from e
+            raise classify_error(e, self.provider) from e
         
     def _call_claude(
-        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int
-    ) -> str:
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
         """Call Claude API with the given prompts and parameters."""
         try:
-            resp = self.client.messages.create(
-                model=self.model,
-                system=dedent(system_prompt),
-                messages=[
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=temperature,
-                timeout=timeout,
-                max_tokens=2048,
-                **self.provider_kwargs,
-            )
-            return resp.content[0].text
+            raw = self.client.messages.with_raw_response.create(
+                **self._claude_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            )
+            return self._claude_response(raw.parse(), raw.headers, schema)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    def _call_mock(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Answer from the offline mock provider (no network)."""
+        try:
+            return self._mock_response(self.client.complete(system_prompt, user_prompt, n, timeout))
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _acall_openai(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Async variant of `_call_openai`."""
+        try:
+            raw = await self.async_client.chat.completions.with_raw_response.create(
+                **self._openai_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            )
+            return self._openai_response(raw)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _acall_deepseek(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Async variant of `_call_deepseek`."""
+        try:
+            raw = await self.async_client.chat.completions.with_raw_response.create(
+                **self._deepseek_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            )
+            return self._openai_response(raw)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _acall_gemini(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Async variant of `_call_gemini`."""
+        try:
+            resp = await self._agemini_send(
+                lambda request: self.async_client.models.generate_content(**request),
+                system_prompt, user_prompt, temperature, timeout, n, schema,
+            )
+            return self._gemini_response(resp)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _acall_claude(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Async variant of `_call_claude`."""
+        try:
+            raw = await self.async_client.messages.with_raw_response.create(
+                **self._claude_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            )
+            return self._claude_response(await raw.parse(), raw.headers, schema)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _acall_mock(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+    ) -> ChatResponse:
+        """Async variant of `_call_mock`."""
+        try:
+            return self._mock_response(
+                await self.client.acomplete(system_prompt, user_prompt, n, timeout)
+            )
         except Exception as e:
-            raise RuntimeError("Claude API error") from e
+            raise classify_error(e, self.provider) from e
+
+    def _stream_openai(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Streaming variant of `_call_openai`; stops reading once every answer is complete."""
+        try:
+            return self._openai_stream(
+                self._openai_request(system_prompt, user_prompt, temperature, timeout, n, schema),
+                n, accept, system_prompt, user_prompt,
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    def _stream_deepseek(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Streaming variant of `_call_deepseek`."""
+        try:
+            return self._openai_stream(
+                self._deepseek_request(system_prompt, user_prompt, temperature, timeout, n, schema),
+                n, accept, system_prompt, user_prompt,
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    def _stream_gemini(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Streaming variant of `_call_gemini`."""
+        def consume(request: Dict[str, Any]) -> ChatResponse:
+            collector = StreamCollector(n, accept)
+            stream = self.client.models.generate_content_stream(**request)
+            last = None
+            try:
+                for last in stream:
+                    if self._feed_gemini_chunk(collector, last):
+                        break
+            finally:
+                stream.close()
+            return self._gemini_streamed(collector, last, system_prompt, user_prompt)
+
+        try:
+            return self._gemini_send(
+                consume, system_prompt, user_prompt, temperature, timeout, n, schema
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    def _stream_claude(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Streaming variant of `_call_claude`."""
+        try:
+            collector = StreamCollector(n, accept)
+            request = self._claude_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            raw = self.client.messages.with_raw_response.create(**request, stream=True)
+            stream = raw.parse()
+            usage: Dict[str, Optional[int]] = {}
+            try:
+                for event in stream:
+                    if self._feed_claude_event(collector, event, usage):
+                        break
+            finally:
+                stream.close()
+            return self._restore_tool_keys(self._streamed_response(
+                collector, system_prompt, user_prompt, raw.headers, **usage
+            ), schema)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    def _stream_mock(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Streaming variant of `_call_mock`."""
+        try:
+            collector = StreamCollector(n, accept)
+            stream = self.client.stream(system_prompt, user_prompt, n, timeout)
+            try:
+                for index, text in stream:
+                    if collector.feed(index, text):
+                        collector.cut = True
+                        break
+            finally:
+                stream.close()
+            return self._streamed_response(
+                collector, system_prompt, user_prompt,
+                input_tokens=stream.input_tokens, output_tokens=stream.output_tokens,
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _astream_openai(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Async variant of `_stream_openai`."""
+        try:
+            return await self._aopenai_stream(
+                self._openai_request(system_prompt, user_prompt, temperature, timeout, n, schema),
+                n, accept, system_prompt, user_prompt,
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _astream_deepseek(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Async variant of `_stream_deepseek`."""
+        try:
+            return await self._aopenai_stream(
+                self._deepseek_request(system_prompt, user_prompt, temperature, timeout, n, schema),
+                n, accept, system_prompt, user_prompt,
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _astream_gemini(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Async variant of `_stream_gemini`."""
+        async def consume(request: Dict[str, Any]) -> ChatResponse:
+            collector = StreamCollector(n, accept)
+            stream = await self.async_client.models.generate_content_stream(**request)
+            last = None
+            try:
+                async for last in stream:
+                    if self._feed_gemini_chunk(collector, last):
+                        break
+            finally:
+                await stream.aclose()
+            return self._gemini_streamed(collector, last, system_prompt, user_prompt)
+
+        try:
+            return await self._agemini_send(
+                consume, system_prompt, user_prompt, temperature, timeout, n, schema
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _astream_claude(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Async variant of `_stream_claude`."""
+        try:
+            collector = StreamCollector(n, accept)
+            request = self._claude_request(system_prompt, user_prompt, temperature, timeout, n, schema)
+            raw = await self.async_client.messages.with_raw_response.create(**request, stream=True)
+            stream = await raw.parse()
+            usage: Dict[str, Optional[int]] = {}
+            try:
+                async for event in stream:
+                    if self._feed_claude_event(collector, event, usage):
+                        break
+            finally:
+                await stream.close()
+            return self._restore_tool_keys(self._streamed_response(
+                collector, system_prompt, user_prompt, raw.headers, **usage
+            ), schema)
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    async def _astream_mock(
+        self, system_prompt: str, user_prompt: str, temperature: float, timeout: int,
+        n: int = 1,
+        schema: Optional[OutputSchema] = None,
+        accept: Callable[[Any], bool] = is_object,
+    ) -> ChatResponse:
+        """Async variant of `_stream_mock`."""
+        try:
+            collector = StreamCollector(n, accept)
+            stream = await self.client.astream(system_prompt, user_prompt, n, timeout)
+            try:
+                async for index, text in stream:
+                    if collector.feed(index, text):
+                        collector.cut = True
+                        break
+            finally:
+                stream.close()
+            return self._streamed_response(
+                collector, system_prompt, user_prompt,
+                input_tokens=stream.input_tokens, output_tokens=stream.output_tokens,
+            )
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+
+    def _openai_stream(
+        self,
+        request: Dict[str, Any],
+        n: int,
+        accept: Callable[[Any], bool],
+        system_prompt: str,
+        user_prompt: str,
+    ) -> ChatResponse:
+        """Stream an OpenAI-compatible chat completion, closing it once `collector.done`."""
+        collector = StreamCollector(n, accept)
+        raw = self.client.chat.completions.with_raw_response.create(**self._openai_stream_request(request))
+        stream = raw.parse()
+        usage = None
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if self._feed_openai_chunk(collector, chunk):
+                    break
+        finally:
+            stream.close()
+        return self._streamed_response(
+            collector, system_prompt, user_prompt, raw.headers, **self._openai_usage(usage)
+        )
+
+    async def _aopenai_stream(
+        self,
+        request: Dict[str, Any],
+        n: int,
+        accept: Callable[[Any], bool],
+        system_prompt: str,
+        user_prompt: str,
+    ) -> ChatResponse:
+        """Async counterpart of `_openai_stream`."""
+        collector = StreamCollector(n, accept)
+        raw = await self.async_client.chat.completions.with_raw_response.create(
+            **self._openai_stream_request(request)
+        )
+        stream = raw.parse()
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if self._feed_openai_chunk(collector, chunk):
+                    break
+        finally:
+            await stream.close()
+        return self._streamed_response(
+            collector, system_prompt, user_prompt, raw.headers, **self._openai_usage(usage)
+        )
 
     @staticmethod
-    def _extract_json(raw: str) -> Any:
+    def _openai_stream_request(request: Dict[str, Any]) -> Dict[str, Any]:
+        # Usage arrives in a final chunk, which an early close skips
+        return {**request, "stream": True, "stream_options": {"include_usage": True}}
+
+    @staticmethod
+    def _feed_openai_chunk(collector: StreamCollector, chunk: Any) -> bool:
+        """Feed the content deltas of one chunk; True once the stream can be closed."""
+        for choice in chunk.choices:
+            collector.feed(choice.index, choice.delta.content)
+        collector.cut = collector.done
+        return collector.done
+
+    @staticmethod
+    def _feed_gemini_chunk(collector: StreamCollector, chunk: Any) -> bool:
+        """Feed the text parts of one streamed Gemini response; True once it can be closed."""
+        for position, cand in enumerate(getattr(chunk, "candidates", None) or []):
+            if cand.content is None:
+                continue
+            collector.feed(
+                position if cand.index is None else cand.index,
+                "".join(
+                    part.text for part in (cand.content.parts or [])
+                    if part.text and not getattr(part, "thought", False)
+                ),
+            )
+        collector.cut = collector.done
+        return collector.done
+
+    @staticmethod
+    def _feed_claude_event(
+        collector: StreamCollector, event: Any, usage: Dict[str, Optional[int]]
+    ) -> bool:
         """
-        Attempt to find and parse the first valid JSON object in the given string,
-        ignoring surrounding junk like markdown fences or trailing tokens.
+        Feed one Anthropic stream event (answer text or forced tool-call JSON) and
+        collect its usage into `usage`; True once the stream can be closed.
         """
-        if not raw.strip():
-            raise json.JSONDecodeError("Empty input", raw, 0)
+        if event.type == "message_start":
+            usage.update(LLMInterface._claude_usage(event.message.usage))
+            # Output tokens are only final in message_delta
+            usage.pop("output_tokens", None)
+        elif event.type == "content_block_delta":
+            delta = event.delta
+            collector.feed(0, getattr(delta, "text", None) or getattr(delta, "partial_json", None))
+        elif event.type == "message_delta":
+            usage["output_tokens"] = getattr(event.usage, "output_tokens", None)
+        collector.cut = collector.done
+        return collector.done
 
-        # Remove markdown fencing if any
-        raw = re.sub(r"^```json\s*", "", raw.strip(), flags=re.IGNORECASE)
-        raw = re.sub(r"```$", "", raw.strip())
+    def _gemini_streamed(
+        self, collector: StreamCollector, last: Any, system_prompt: str, user_prompt: str
+    ) -> ChatResponse:
+        """Build a ChatResponse from a Gemini stream; `last` is the last chunk read."""
+        if not any(collector.candidates()):
+            raise ValueError("Empty response from Gemini API")
+        http = getattr(last, "sdk_http_response", None)
+        return self._streamed_response(
+            collector, system_prompt, user_prompt, getattr(http, "headers", None),
+            **self._gemini_usage(getattr(last, "usage_metadata", None)),
+        )
 
-        # Try direct parse
-        try:
-            return json.loads(raw)
-        except json.JSONDecodeError:
-            pass  # Fall back to more aggressive search
-
-        # Try to locate the first JSON object manually
-        brace_stack = []
-        json_start = None
-
-        for idx, ch in enumerate(raw):
-            if ch == '{':
-                if not brace_stack:
-                    json_start = idx
-                brace_stack.append(ch)
-            elif ch == '}':
-                if brace_stack:
-                    brace_stack.pop()
-                    if not brace_stack:
-                        # Found a full JSON object
-                        json_str = raw[json_start:idx + 1]
-                        try:
-                            return json.loads(json_str)
-                        except json.JSONDecodeError:
-                            pass  # Keep scanning
-
-        # If no valid JSON found
-        raise json.JSONDecodeError("No valid JSON object found in output", raw, 0)
\ No newline at end of file
+    @staticmethod
+    def _streamed_response(
+        collector: StreamCollector,
+        system_prompt: str,
+        user_prompt: str,
+        headers: Optional[Mapping[str, str]] = None,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        cached_input_tokens: Optional[int] = None,
+        reasoning_tokens: Optional[int] = None,
+    ) -> ChatResponse:
+        """
+        Build a ChatResponse from a `StreamCollector`. Token counts the provider had
+        not reported when the stream was closed are estimated from the text.
+        """
+        candidates = collector.candidates()
+        if input_tokens is None:
+            input_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        if output_tokens is None:
+            output_tokens = sum(estimate_tokens(text) for text in candidates)
+        return ChatResponse(
+            candidates=candidates,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            headers=headers or {},
+            cached_input_tokens=cached_input_tokens,
+            reasoning_tokens=reasoning_tokens,
+            first_token=collector.first_token,
+            json_complete=collector.json_complete,
+            stream_cut=collector.cut,
+        )
+
+    @staticmethod
+    def _restore_tool_keys(response: ChatResponse, schema: Optional[OutputSchema]) -> ChatResponse:
+        """
+        Map tool input keys renamed by `schema` back in streamed Claude candidates.
+        Candidates that are not complete JSON are left for the caller's repair.
+        """
+        if schema is None or not schema.renamed:
+            return response
+        candidates = []
+        for text in response.candidates:
+            try:
+                text = json.dumps(schema.restore(json.loads(text)))
+            except json.JSONDecodeError:
+                pass
+            candidates.append(text)
+        response.candidates = candidates
+        return response
+
+    @staticmethod
+    def _openai_usage(usage: Any) -> Dict[str, Optional[int]]:
+        """Token counts of an OpenAI-compatible `usage` object (None if absent)."""
+        if usage is None:
+            return {}
+        # OpenAI reports prompt-cache hits in prompt_tokens_details, DeepSeek at top level
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None)
+        if cached is None:
+            cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        completion_details = getattr(usage, "completion_tokens_details", None)
+        return dict(
+            input_tokens=getattr(usage, "prompt_tokens", None),
+            output_tokens=getattr(usage, "completion_tokens", None),
+            cached_input_tokens=cached,
+            reasoning_tokens=getattr(completion_details, "reasoning_tokens", None),
+        )
+
+    @staticmethod
+    def _gemini_usage(usage: Any) -> Dict[str, Optional[int]]:
+        """Token counts of a google-genai `usage_metadata` object (None if absent)."""
+        if usage is None:
+            return {}
+        return dict(
+            input_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+            cached_input_tokens=getattr(usage, "cached_content_token_count", None),
+            reasoning_tokens=getattr(usage, "thoughts_token_count", None),
+        )
+
+    @staticmethod
+    def _claude_usage(usage: Any) -> Dict[str, Optional[int]]:
+        """Token counts of an Anthropic `usage` object (None if absent)."""
+        if usage is None:
+            return {}
+        # Anthropic's input_tokens excludes cache reads and writes; report the total
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        input_tokens = getattr(usage, "input_tokens", None)
+        return dict(
+            input_tokens=None if input_tokens is None else input_tokens + cache_read + cache_write,
+            output_tokens=getattr(usage, "output_tokens", None),
+            cached_input_tokens=cache_read,
+        )
+
+    @classmethod
+    def _openai_response(cls, raw: Any) -> ChatResponse:
+        """Build a ChatResponse from an OpenAI-compatible raw (header-carrying) response."""
+        resp = raw.parse()
+        choices = sorted(resp.choices, key=lambda choice: choice.index)
+        return ChatResponse(
+            candidates=[choice.message.content for choice in choices],
+            headers=raw.headers,
+            **cls._openai_usage(getattr(resp, "usage", None)),
+        )
+
+    @classmethod
+    def _gemini_response(cls, resp: Any) -> ChatResponse:
+        """Build a ChatResponse from a google-genai GenerateContentResponse."""
+        candidates = [
+            "".join(
+                part.text for part in (cand.content.parts or [])
+                if part.text and not getattr(part, "thought", False)
+            )
+            for cand in (getattr(resp, "candidates", None) or [])
+            if cand.content is not None
+        ]
+        if not any(candidates):
+            raise ValueError("Empty response from Gemini API")
+        http = getattr(resp, "sdk_http_response", None)
+        return ChatResponse(
+            candidates=candidates,
+            headers=getattr(http, "headers", None) or {},
+            **cls._gemini_usage(getattr(resp, "usage_metadata", None)),
+        )
+
+    @classmethod
+    def _claude_response(
+        cls, resp: Any, headers: Mapping[str, str], schema: Optional[OutputSchema] = None
+    ) -> ChatResponse:
+        """
+        Build a ChatResponse from a parsed Anthropic message and its response
+        headers; tool input keys renamed by `schema` are mapped back.
+        """
+        # A forced tool call carries the structured answer as its input
+        tool_inputs = [block.input for block in resp.content if block.type == "tool_use"]
+        if tool_inputs and schema is not None:
+            tool_inputs[0] = schema.restore(tool_inputs[0])
+        text = json.dumps(tool_inputs[0]) if tool_inputs else resp.content[0].text
+        return ChatResponse(
+            candidates=[text],
+            headers=headers,
+            **cls._claude_usage(getattr(resp, "usage", None)),
+        )
+
+    @staticmethod
+    def _mock_response(resp: Any) -> ChatResponse:
+        """Build a ChatResponse from a mock provider response."""
+        return ChatResponse(
+            candidates=resp.candidates,
+            input_tokens=resp.input_tokens,
+            output_tokens=resp.output_tokens,
+        )
+
+    @staticmethod
+    def _extract_json(raw: str, accept: Callable[[Any], bool] = is_object) -> Any:
+        """
+        Attempt to find and parse the first valid JSON object in the given string,
+        ignoring surrounding junk like markdown fences, reasoning text or trailing
+        tokens. Uses the single-pass scanner in `json_extract`.
+        """
+        return extract_json(raw, accept)
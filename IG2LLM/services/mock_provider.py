@@ -0,0 +1,373 @@
+"""
+Offline stand-in for an LLM provider, used to load-test the orchestration layer
+(concurrency, rate limiting, retries, parsing) without network access or cost.
+
+Answers are replayed from a results file (`*_results.jsonl` / `.json`, cycling
+through the recorded runs of each statement) or synthesized from the
+`expected_components` of a labeled CSV or results file. Every request sleeps
+for a latency drawn from a configurable distribution and can fail with an HTTP
+429, an HTTP 500 or a timeout, or return malformed JSON, at configurable rates.
+Extractions are answered in JSON, or in coded text when the system prompt asks
+for it (`CODED_FORMAT_MARKER`). Answers can be followed by a chatty explanation and generated at a fixed token
+rate, and can be streamed, to measure streaming with early termination.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from .rate_limit import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY = "lognormal:0.5,0.5"
+
+# Heading of prompts/coded_instructions.txt; a system prompt containing it asks
+# for coded text instead of JSON
+CODED_FORMAT_MARKER = "### Return Format (Coded Text)"
+
+# Ways a malformed completion is corrupted; the first two can be repaired locally
+MALFORMED_KINDS = ("trailing_comma", "truncated", "prose")
+
+# Trailing commentary appended after the answer (`explanation_tokens`)
+_EXPLANATION = (
+    "The attribute is the actor that carries out the aim, the deontic expresses the "
+    "obligation, and the object receives the action; the remaining context narrows the "
+    "conditions under which the statement applies. "
+)
+
+
+class MockAPIError(Exception):
+    """HTTP error raised by the mock provider, shaped like the SDK errors (`status_code`)."""
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+        self.response = _MockHTTPResponse(status_code, headers)
+
+
+class _MockHTTPResponse(NamedTuple):
+    status_code: int
+    headers: Mapping[str, str]
+
+
+class MockTimeoutError(TimeoutError):
+    """Raised when a simulated request exceeds its timeout."""
+
+
+class MockResponse(NamedTuple):
+    candidates: List[str]
+    input_tokens: int
+    output_tokens: int
+
+
+class MockStream:
+    """
+    A streamed mock completion. Iterating (sync or async) yields (candidate index,
+    text) chunks of about one token, paced at the client's token rate. Closing the
+    stream stops generation; `output_tokens` counts the tokens sent so far, so an
+    early close is billed only for what was generated.
+    """
+    def __init__(self, candidates: List[str], input_tokens: int, tokens_per_second: Optional[float]):
+        interval = 1.0 / tokens_per_second if tokens_per_second else 0.0
+        # (offset after the first token, candidate index, text); candidates generate in
+        # parallel, so chunks are ordered by position, then candidate
+        chunks = [
+            (k, index, text[start:start + CHARS_PER_TOKEN])
+            for index, text in enumerate(candidates)
+            for k, start in enumerate(range(0, len(text), CHARS_PER_TOKEN))
+        ]
+        chunks.sort(key=lambda chunk: chunk[:2])
+        self._chunks = [(k * interval, index, text) for k, index, text in chunks]
+        self.input_tokens = input_tokens
+        self.output_tokens = 0
+        self.closed = False
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        elapsed = 0.0
+        for at, index, text in self._chunks:
+            if at > elapsed:
+                time.sleep(at - elapsed)
+                elapsed = at
+            if self.closed:
+                return
+            self.output_tokens += 1
+            yield index, text
+
+    async def __aiter__(self):
+        elapsed = 0.0
+        for at, index, text in self._chunks:
+            if at > elapsed:
+                await asyncio.sleep(at - elapsed)
+                elapsed = at
+            if self.closed:
+                return
+            self.output_tokens += 1
+            yield index, text
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def latency_sampler(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution into a sampler returning seconds.
+
+    Supported specs (parameters in seconds):
+        fixed:S, uniform:LOW,HIGH, normal:MEAN,SD, lognormal:MEDIAN,SIGMA,
+        exponential:MEAN. Samples are clipped at zero.
+    """
+    name, _, params = spec.partition(":")
+    try:
+        args = [float(p) for p in params.split(",")] if params else []
+    except ValueError as e:
+        raise ValueError(f"Invalid latency distribution: {spec!r}") from e
+    samplers: Dict[str, Tuple[int, Callable[..., float]]] = {
+        "fixed": (1, lambda rng, s: s),
+        "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+        "normal": (2, lambda rng, mean, sd: rng.gauss(mean, sd)),
+        "lognormal": (2, lambda rng, median, sigma: median * rng.lognormvariate(0.0, sigma)),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1.0 / mean) if mean > 0 else 0.0),
+    }
+    if name not in samplers or len(args) != samplers[name][0]:
+        raise ValueError(
+            f"Invalid latency distribution: {spec!r}; expected one of "
+            "fixed:S, uniform:LOW,HIGH, normal:MEAN,SD, lognormal:MEDIAN,SIGMA, exponential:MEAN"
+        )
+    sample = samplers[name][1]
+    return lambda rng: max(0.0, sample(rng, *args))
+
+
+def load_answers(path: str) -> Dict[str, List[Dict[str, List[str]]]]:
+    """
+    Map each statement text to the component dicts the mock answers with.
+
+    Results files contribute their recorded runs (`results`), falling back to
+    `expected_components`; labeled CSVs contribute their `expected_components`
+    (the statement type is taken from the file name, as in `data/`).
+    """
+    source = Path(path)
+    if source.suffix == ".csv":
+        from util.convert_to_json import iter_csv
+        statement_type = "constitutive" if "constitutive" in source.name else "regulative"
+        rows: Iterator[Dict[str, Any]] = iter_csv(str(source), statement_type)
+    elif source.suffix == ".jsonl":
+        with source.open(encoding="utf-8") as f:
+            rows = iter([json.loads(line) for line in f if line.strip()])
+    else:
+        with source.open(encoding="utf-8") as f:
+            rows = iter(json.load(f))
+    answers: Dict[str, List[Dict[str, List[str]]]] = {}
+    for row in rows:
+        runs = [r for r in row.get("results") or [] if isinstance(r, dict)]
+        if not runs and "expected_components" in row:
+            runs = [row["expected_components"]]
+        if runs:
+            answers[row["input"]] = runs
+    logger.info("Mock provider loaded answers for %d statements from %s", len(answers), source)
+    return answers
+
+
+def malform(text: str, kind: str) -> str:
+    """Corrupt a JSON completion the way LLM output typically breaks."""
+    if kind == "trailing_comma":
+        return text[:-1] + ",}" if text.endswith("}") else text + ","
+    if kind == "truncated":
+        return text[: max(1, len(text) // 2)]
+    return "I'm sorry, but I can't provide the components for this statement."
+
+
+class MockClient:
+    """
+    Thread-safe mock provider; `complete` / `acomplete` (and the streaming
+    `stream` / `astream`) stand in for the SDK call.
+
+    Args:
+        answers: Statement text -> component dicts to answer with (see `load_answers`).
+        latency: Latency distribution spec (see `latency_sampler`).
+        rate_limit_rate: Probability that a request fails with HTTP 429.
+        server_error_rate: Probability that a request fails with HTTP 500.
+        timeout_rate: Probability that a request hangs until its timeout.
+        malformed_rate: Probability that a candidate is malformed JSON.
+        explanation_tokens: Tokens of commentary appended after each (well-formed) answer.
+        tokens_per_second: Generation speed per candidate; None returns the whole
+            completion at once (the latency is then the full request time).
+        retry_after: `Retry-After` seconds sent with 429s (None omits the header).
+        seed: Seed for latency, failure and corruption draws.
+    """
+    def __init__(
+        self,
+        answers: Optional[Dict[str, List[Dict[str, List[str]]]]] = None,
+        latency: str = DEFAULT_LATENCY,
+        rate_limit_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        explanation_tokens: int = 0,
+        tokens_per_second: Optional[float] = None,
+        retry_after: Optional[float] = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.answers = answers or {}
+        self._latency = latency_sampler(latency)
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.timeout_rate = timeout_rate
+        self.malformed_rate = malformed_rate
+        self.explanation_tokens = explanation_tokens
+        self.tokens_per_second = tokens_per_second
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Next recorded run to replay, per statement
+        self._cursors: Dict[str, Iterator[Dict[str, List[str]]]] = {}
+        self.requests = 0
+
+    @classmethod
+    def from_config(cls, config: Any) -> "MockClient":
+        """Build the client from the `mock_*` fields of an `LLMConfig`."""
+        return cls(
+            answers=load_answers(config.mock_source) if config.mock_source else None,
+            latency=config.mock_latency,
+            rate_limit_rate=config.mock_rate_limit_rate,
+            server_error_rate=config.mock_server_error_rate,
+            timeout_rate=config.mock_timeout_rate,
+            malformed_rate=config.mock_malformed_rate,
+            explanation_tokens=config.mock_explanation_tokens,
+            tokens_per_second=config.mock_tokens_per_second,
+            seed=config.mock_seed,
+        )
+
+    def complete(self, system_prompt: str, user_prompt: str, n: int, timeout: float) -> MockResponse:
+        delay, failure, candidates = self._draw(system_prompt, user_prompt, n, timeout)
+        time.sleep(delay + self._generation_time(candidates))
+        return self._respond(failure, timeout, system_prompt, user_prompt, candidates)
+
+    async def acomplete(
+        self, system_prompt: str, user_prompt: str, n: int, timeout: float
+    ) -> MockResponse:
+        delay, failure, candidates = self._draw(system_prompt, user_prompt, n, timeout)
+        await asyncio.sleep(delay + self._generation_time(candidates))
+        return self._respond(failure, timeout, system_prompt, user_prompt, candidates)
+
+    def stream(self, system_prompt: str, user_prompt: str, n: int, timeout: float) -> MockStream:
+        """Streaming variant of `complete`: the latency is the time to the first token."""
+        delay, failure, candidates = self._draw(system_prompt, user_prompt, n, timeout)
+        time.sleep(delay)
+        return self._open_stream(failure, timeout, system_prompt, user_prompt, candidates)
+
+    async def astream(
+        self, system_prompt: str, user_prompt: str, n: int, timeout: float
+    ) -> MockStream:
+        delay, failure, candidates = self._draw(system_prompt, user_prompt, n, timeout)
+        await asyncio.sleep(delay)
+        return self._open_stream(failure, timeout, system_prompt, user_prompt, candidates)
+
+    def _generation_time(self, candidates: List[str]) -> float:
+        if not self.tokens_per_second or not candidates:
+            return 0.0
+        return max(estimate_tokens(text) for text in candidates) / self.tokens_per_second
+
+    def _open_stream(
+        self,
+        failure: Optional[str],
+        timeout: float,
+        system_prompt: str,
+        user_prompt: str,
+        candidates: List[str],
+    ) -> MockStream:
+        resp = self._respond(failure, timeout, system_prompt, user_prompt, candidates)
+        return MockStream(resp.candidates, resp.input_tokens, self.tokens_per_second)
+
+    def _draw(
+        self, system_prompt: str, user_prompt: str, n: int, timeout: float
+    ) -> Tuple[float, Optional[str], List[str]]:
+        """Draw the latency, failure mode and candidates of one request."""
+        with self._lock:
+            self.requests += 1
+            latency = self._latency(self._rng)
+            u = self._rng.random()
+            failure = None
+            for mode, rate in (
+                ("rate_limit", self.rate_limit_rate),
+                ("server_error", self.server_error_rate),
+                ("timeout", self.timeout_rate),
+            ):
+                if u < rate:
+                    failure = mode
+                    break
+                u -= rate
+            coded = CODED_FORMAT_MARKER in system_prompt
+            candidates = [self._answer(user_prompt, coded) for _ in range(n)]
+            candidates = [
+                malform(text, self._rng.choice(MALFORMED_KINDS))
+                if self._rng.random() < self.malformed_rate else text + self._explanation()
+                for text in candidates
+            ]
+        if failure == "timeout" or latency > timeout:
+            return timeout, "timeout", []
+        return latency, failure, candidates
+
+    def _respond(
+        self,
+        failure: Optional[str],
+        timeout: float,
+        system_prompt: str,
+        user_prompt: str,
+        candidates: List[str],
+    ) -> MockResponse:
+        if failure == "timeout":
+            raise MockTimeoutError(f"Mock request timed out after {timeout}s")
+        if failure == "rate_limit":
+            raise MockAPIError(429, "Rate limit exceeded (mock)", retry_after=self.retry_after)
+        if failure == "server_error":
+            raise MockAPIError(500, "Internal server error (mock)")
+        return MockResponse(
+            candidates=candidates,
+            input_tokens=estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+            output_tokens=sum(estimate_tokens(text) for text in candidates),
+        )
+
+    def _explanation(self) -> str:
+        if not self.explanation_tokens:
+            return ""
+        size = self.explanation_tokens * CHARS_PER_TOKEN
+        text = "\n\nExplanation: " + _EXPLANATION * (size // len(_EXPLANATION) + 1)
+        return text[:size]
+
+    def _answer(self, user_prompt: str, coded: bool = False) -> str:
+        """
+        Answer for an extraction, LO ("Input: ...") or packed (JSON array) prompt;
+        with `coded`, an extraction is answered in coded text ("A(x) I(y)").
+        """
+        if user_prompt.startswith("["):
+            try:
+                items = json.loads(user_prompt)
+            except json.JSONDecodeError:
+                items = None
+            if isinstance(items, list):
+                return json.dumps({"results": [
+                    {"id": str(item.get("id")), "components": self._components(item.get("input", ""))}
+                    for item in items if isinstance(item, dict)
+                ]}, ensure_ascii=False)
+        if user_prompt.startswith("Input: "):
+            # LO pass: "Input: <statement>\n<components of the run>"
+            user_prompt = user_prompt[len("Input: "):].rsplit("\n", 1)[0]
+        elif coded:
+            from util.convert_to_json import to_coded
+            return to_coded(self._components(user_prompt))
+        return json.dumps(self._components(user_prompt), ensure_ascii=False)
+
+    def _components(self, statement: str) -> Dict[str, List[str]]:
+        runs = self.answers.get(statement)
+        if not runs:
+            return {}
+        cursor = self._cursors.get(statement)
+        if cursor is None:
+            cursor = self._cursors[statement] = itertools.cycle(runs)
+        return next(cursor)
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to size requests before dispatch.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, tokenizer-free estimate of the number of tokens in `text`.
+    """
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute / 60` units per second.
+
+    Reservations are allowed to drive the bucket negative: the caller is told how
+    long to wait until its reservation is covered, which keeps the bucket usable
+    from both threads and coroutines without holding a lock while sleeping.
+    """
+    def __init__(self, per_minute: float, now: Optional[float] = None):
+        self.per_minute = float(per_minute)
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float, scale: float) -> None:
+        rate = self.per_minute * scale / 60.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float, scale: float) -> float:
+        """Take `amount` units and return the number of seconds until they are covered."""
+        self._refill(now, scale)
+        amount = min(amount, self.capacity)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / (self.per_minute * scale / 60.0)
+
+    def adjust(self, delta: float) -> None:
+        """Return (positive) or charge (negative) units after the real cost is known."""
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+    def resize(self, per_minute: float) -> None:
+        """Change the budget, keeping at most the new capacity of the current balance."""
+        self.per_minute = self.capacity = float(per_minute)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def observe(self, limit: Optional[float], remaining: Optional[float]) -> None:
+        """Align the bucket with limits reported by the provider."""
+        if limit:
+            self.per_minute = self.capacity = float(limit)
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budget for one provider/model pair.
+
+    The effective refill rate is scaled by an additive-increase/multiplicative-decrease
+    factor: every 429 halves it and pauses dispatch for the advertised (or backed-off)
+    delay, every successful call nudges it back towards the configured budget.
+
+    `clock` is the monotonic time source (injectable for tests).
+    """
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        min_scale: float = 0.05,
+        recovery_step: float = 0.05,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm, clock()) if rpm else None
+        self.tokens = TokenBucket(tpm, clock()) if tpm else None
+        self.scale = 1.0
+        self.min_scale = min_scale
+        self.recovery_step = recovery_step
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.blocked_until = 0.0
+        self.consecutive_limits = 0
+        self._lock = threading.Lock()
+
+    def set_limits(self, rpm: Optional[float], tpm: Optional[float]) -> None:
+        """Replace the configured budget (None removes that bucket)."""
+        with self._lock:
+            self.rpm, self.tpm = rpm, tpm
+            self.requests = self._resized(self.requests, rpm)
+            self.tokens = self._resized(self.tokens, tpm)
+
+    def _resized(self, bucket: Optional[TokenBucket], per_minute: Optional[float]) -> Optional[TokenBucket]:
+        if not per_minute:
+            return None
+        if bucket is None:
+            return TokenBucket(per_minute, self._clock())
+        bucket.resize(per_minute)
+        return bucket
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens; return the delay before dispatching."""
+        with self._lock:
+            now = self._clock()
+            delay = max(0.0, self.blocked_until - now)
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now, self.scale))
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.reserve(tokens, now, self.scale))
+            return delay
+
+    def try_reserve(self, tokens: int) -> bool:
+        """Reserve one request and `tokens` tokens only if that needs no waiting."""
+        with self._lock:
+            now = self._clock()
+            if now < self.blocked_until:
+                return False
+            buckets = [
+                (bucket, amount)
+                for bucket, amount in ((self.requests, 1), (self.tokens, tokens))
+                if bucket is not None
+            ]
+            for bucket, amount in buckets:
+                bucket._refill(now, self.scale)
+                if bucket.tokens < min(amount, bucket.capacity):
+                    return False
+            for bucket, amount in buckets:
+                bucket.reserve(amount, now, self.scale)
+            return True
+
+    def acquire(self, tokens: int) -> None:
+        """Block the calling thread until the request fits the budget."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            logger.debug("Rate limiter delaying request by %.2fs", delay)
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: int) -> None:
+        """Async counterpart of `acquire`."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            logger.debug("Rate limiter delaying request by %.2fs", delay)
+            await asyncio.sleep(delay)
+
+    def on_success(
+        self,
+        headers: Optional[Mapping[str, str]] = None,
+        estimated_tokens: int = 0,
+        actual_tokens: Optional[int] = None,
+    ) -> None:
+        """Record a completed call: reconcile token usage, read headers and speed up."""
+        with self._lock:
+            if self.tokens is not None and actual_tokens is not None:
+                self.tokens.adjust(estimated_tokens - actual_tokens)
+            if headers:
+                self._observe_headers(headers)
+            self.consecutive_limits = 0
+            self.scale = min(1.0, self.scale + self.recovery_step)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """
+        Record a 429: slow down and pause all dispatch. Returns the pause in seconds.
+        """
+        with self._lock:
+            self.consecutive_limits += 1
+            self.scale = max(self.min_scale, self.scale / 2)
+            if retry_after is None:
+                retry_after = min(
+                    self.max_backoff, self.base_backoff * 2 ** (self.consecutive_limits - 1)
+                )
+            self.blocked_until = max(self.blocked_until, self._clock() + retry_after)
+            logger.warning(
+                "Rate limited; pausing %.1fs and scaling budget to %.0f%%",
+                retry_after, self.scale * 100,
+            )
+            return retry_after
+
+    def _observe_headers(self, headers: Mapping[str, str]) -> None:
+        headers = {k.lower(): v for k, v in headers.items()}
+        if self.requests is not None:
+            self.requests.observe(
+                _header_number(headers, RATE_LIMIT_HEADERS["requests_limit"]),
+                _header_number(headers, RATE_LIMIT_HEADERS["requests_remaining"]),
+            )
+        if self.tokens is not None:
+            self.tokens.observe(
+                _header_number(headers, RATE_LIMIT_HEADERS["tokens_limit"]),
+                _header_number(headers, RATE_LIMIT_HEADERS["tokens_remaining"]),
+            )
+
+
+# Header names used by OpenAI-compatible APIs and Anthropic for rate-limit state.
+RATE_LIMIT_HEADERS: Dict[str, Tuple[str, ...]] = {
+    "requests_limit": ("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit"),
+    "requests_remaining": ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining"),
+    "tokens_limit": ("x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit"),
+    "tokens_remaining": ("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"),
+}
+
+
+def _header_number(headers: Mapping[str, str], names: Tuple[str, ...]) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return None
+
+
+def _status_code(err: BaseException) -> Optional[int]:
+    """HTTP status of an SDK error (OpenAI/Anthropic `status_code`, google-genai `code`)."""
+    for attr in ("status_code", "code"):
+        value = getattr(err, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _error_chain(err: BaseException):
+    seen = set()
+    while err is not None and id(err) not in seen:
+        seen.add(id(err))
+        yield err
+        err = err.__cause__ or err.__context__
+
+
+def http_status(err: BaseException) -> Optional[int]:
+    """HTTP status of `err` or of the first exception it wraps that carries one."""
+    for e in _error_chain(err):
+        status = _status_code(e)
+        if status is not None:
+            return status
+    return None
+
+
+def is_rate_limit_error(err: BaseException) -> bool:
+    """True if `err`, or any exception it wraps, is an HTTP 429 from the provider."""
+    for e in _error_chain(err):
+        if _status_code(e) == 429:
+            return True
+        if "RESOURCE_EXHAUSTED" in str(e):
+            return True
+    return False
+
+
+def retry_after_seconds(err: BaseException) -> Optional[float]:
+    """Delay requested by the provider via `Retry-After` / `retryDelay`, if any."""
+    for e in _error_chain(err):
+        response = getattr(e, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            for name in ("retry-after-ms", "retry-after"):
+                value = headers.get(name)
+                if value is None:
+                    continue
+                try:
+                    seconds = float(value)
+                except ValueError:
+                    continue
+                return seconds / 1000 if name.endswith("-ms") else seconds
+        match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(e))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+_LIMITERS: Dict[Tuple[str, str], RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(
+    provider: str, model: str, rpm: Optional[float], tpm: Optional[float]
+) -> RateLimiter:
+    """
+    Return the process-wide limiter for `provider`/`model`, so every interface
+    talking to the same quota shares one budget. If the limiter already exists
+    with a different `rpm`/`tpm`, its budget is updated to the new values (the
+    latest configuration wins for every interface sharing it).
+    """
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get((provider, model))
+        if limiter is None:
+            limiter = _LIMITERS[(provider, model)] = RateLimiter(rpm=rpm, tpm=tpm)
+        elif (limiter.rpm, limiter.tpm) != (rpm, tpm):
+            logger.info(
+                "Updating rate limits for %s/%s: rpm %s -> %s, tpm %s -> %s",
+                provider, model, limiter.rpm, rpm, limiter.tpm, tpm,
+            )
+            limiter.set_limits(rpm, tpm)
+        return limiter
+
+
+def resolve_limits(info: Dict[str, Any], model: str) -> Dict[str, Optional[float]]:
+    """Look up the RPM/TPM budget for `model` in a `PROVIDERS` entry."""
+    limits = info.get("rate_limits", {})
+    return {**limits.get("default", {}), **limits.get(model, {})}
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    response    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a call has no cached response."""
+
+
+class ResponseCache:
+    """
+    Disk-backed (SQLite) cache of raw LLM completions.
+
+    Entries are content-addressed: the key hashes everything that determines a
+    completion (see `make_key`), so editing one prompt fragment or adding one
+    statement only invalidates the calls that actually changed.
+
+    Args:
+        path: SQLite database file; parent directories are created as needed.
+        max_bytes: Evict least-recently-used entries once stored responses exceed this size.
+        max_age: Evict entries older than this many seconds.
+        replay: Read-only replay mode; nothing is written and misses raise `CacheMissError`.
+    """
+    # Eviction is checked on open and after this many writes.
+    EVICT_EVERY = 256
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        replay: bool = False,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if replay and not self.path.exists():
+            raise FileNotFoundError(f"Replay cache not found: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        if not replay:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self.evict()
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        run_index: int,
+        lo_pass: bool,
+        extra: Optional[str] = None,
+    ) -> str:
+        """
+        Content hash identifying one provider call. `extra` covers any other
+        request option that changes the completion (e.g. an output schema).
+        """
+        system_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        key = [provider, model, system_hash, user_prompt, temperature, run_index, lo_pass]
+        if extra is not None:
+            key.append(extra)
+        payload = json.dumps(key, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for `key`, or None (raises in replay mode)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.replay:
+                    raise CacheMissError(f"No cached response for key {key}")
+                return None
+            self.hits += 1
+            if not self.replay:
+                self._conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Store `response` under `key` (no-op in replay mode)."""
+        if self.replay:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self.writes += 1
+            due = self.writes % self.EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Apply age- and size-based eviction; return the number of entries removed."""
+        if self.replay:
+            return 0
+        removed = 0
+        with self._lock:
+            if self.max_age is not None:
+                cur = self._conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)
+                )
+                removed += cur.rowcount
+            if self.max_bytes is not None:
+                total = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    rows = self._conn.execute(
+                        "SELECT key, size FROM responses ORDER BY accessed_at"
+                    )
+                    stale = []
+                    for key, size in rows:
+                        if total <= self.max_bytes:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                    removed += len(stale)
+            self._conn.commit()
+            self.evictions += removed
+        if removed:
+            logger.info("Evicted %d cached responses from %s", removed, self.path)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/write/eviction counters for this process."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
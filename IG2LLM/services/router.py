@@ -0,0 +1,263 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .llm_interface import LLMConfig, LLMInterface
+from .telemetry import Telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Health of one routing target, judged from its recent calls.
+
+    A call fails if it raises or, with `slow_call_seconds`, if it takes longer
+    than that. Once at least `min_calls` of the last `window` calls are recorded
+    and the failure rate reaches `failure_rate`, the circuit opens and the target
+    gets no traffic for `cooldown` seconds. After that, a single probe call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: Optional[float] = None,
+        cooldown: float = 30.0,
+        name: str = "target",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.name = name
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def retry_at(self) -> float:
+        """Clock time at which an open circuit lets a probe through."""
+        return self.opened_at + self.cooldown
+
+    def allow(self) -> bool:
+        """True if a call may be sent now; in half-open state this claims the probe."""
+        with self._lock:
+            if self.state == self.OPEN and self._clock() >= self.retry_at:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        """Record the outcome of a call sent after `allow`."""
+        failed = not ok or (self.slow_call_seconds is not None and latency > self.slow_call_seconds)
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open("probe failed")
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    logger.info("Circuit for %s closed", self.name)
+                return
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls:
+                rate = sum(self._outcomes) / len(self._outcomes)
+                if self.state == self.CLOSED and rate >= self.failure_rate:
+                    self._open(f"failure rate {rate:.0%} over {len(self._outcomes)} calls")
+
+    def release(self) -> None:
+        """Give back a half-open probe whose call was cancelled before it finished."""
+        with self._lock:
+            self._probing = False
+
+    def _open(self, reason: str) -> None:
+        self.state = self.OPEN
+        self.opened_at = self._clock()
+        self._outcomes.clear()
+        logger.warning(
+            "Circuit for %s opened (%s); no traffic for %.0fs", self.name, reason, self.cooldown
+        )
+
+
+class RoutedList(list):
+    """Result list of a routed call, tagged with the target that produced it."""
+    target: str
+
+
+class RoutedDict(dict):
+    """Result dict of a routed call, tagged with the target that produced it."""
+    target: str
+
+
+def _tag(result: Any, target: str) -> Any:
+    if isinstance(result, list):
+        result = RoutedList(result)
+    elif isinstance(result, dict):
+        result = RoutedDict(result)
+    else:
+        return result
+    result.target = target
+    return result
+
+
+def parse_target(spec: str) -> Tuple[str, Optional[str]]:
+    """Split a "provider[/model]" target into provider and model (None = provider default)."""
+    provider, _, model = spec.partition("/")
+    return provider, model or None
+
+
+class LLMRouter:
+    """
+    Routes calls over an ordered list of provider/model targets with failover.
+
+    Each target is an `LLMInterface` built from `config` with the target's
+    provider and model; they share one telemetry sink and response cache. A call
+    goes to the first target whose circuit breaker admits it; if it fails (after
+    the interface's own retries), the next admitted target is tried, so traffic
+    shifts to healthy targets while a degraded one is skipped until its breaker
+    probes it again. If every circuit is open, the targets are tried anyway, the
+    one closest to its next probe first.
+
+    Results are tagged with the serving target (`result.target`, "provider/model").
+    The router offers the call API of `LLMInterface` (`run`, `arun`, `refine`,
+    `arefine`, `arun_packed`).
+
+    Args:
+        targets: "provider[/model]" specs, most preferred first.
+        config: Settings shared by every target (provider and model are replaced).
+        breaker: Keyword arguments for each target's `CircuitBreaker`.
+    """
+    def __init__(
+        self,
+        targets: Sequence[str],
+        config: LLMConfig,
+        breaker: Optional[Dict[str, Any]] = None,
+    ):
+        if not targets:
+            raise ValueError("LLMRouter needs at least one target")
+        self.config = config
+        self.telemetry = Telemetry(config.telemetry_path)
+        self.interfaces: List[LLMInterface] = []
+        for i, spec in enumerate(targets):
+            provider, model = parse_target(spec)
+            llm = LLMInterface(config=config.model_copy(update=dict(
+                provider=provider,
+                model=model,
+                telemetry_path=None,
+                # One cache connection, shared below; keys include provider and model
+                cache_path=config.cache_path if i == 0 else None,
+            )))
+            llm.telemetry = self.telemetry
+            if i:
+                llm.cache = self.interfaces[0].cache
+            self.interfaces.append(llm)
+        self.cache = self.interfaces[0].cache
+        self.breakers = [
+            CircuitBreaker(**{"name": llm.target, **(breaker or {})}) for llm in self.interfaces
+        ]
+        logger.info("Routing over %s", ", ".join(llm.target for llm in self.interfaces))
+
+    @property
+    def target(self) -> str:
+        """The most preferred target."""
+        return self.interfaces[0].target
+
+    @property
+    def usage(self) -> Dict[str, int]:
+        total: Counter = Counter()
+        for llm in self.interfaces:
+            total.update(llm.usage)
+        return dict(total)
+
+    @property
+    def repairs(self) -> Counter:
+        total: Counter = Counter()
+        for llm in self.interfaces:
+            total.update(llm.repairs)
+        return total
+
+    def close(self) -> None:
+        """Release provider-side resources of every target (see `LLMInterface.close`)."""
+        for llm in self.interfaces:
+            llm.close()
+
+    def run(self, *args: Any, **kwargs: Any) -> Any:
+        return self._route("run", args, kwargs)
+
+    def refine(self, *args: Any, **kwargs: Any) -> Any:
+        return self._route("refine", args, kwargs)
+
+    async def arun(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._aroute("arun", args, kwargs)
+
+    async def arefine(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._aroute("arefine", args, kwargs)
+
+    async def arun_packed(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._aroute("arun_packed", args, kwargs)
+
+    def _order(self) -> Iterator[int]:
+        """Targets to try, in preference order, skipping open circuits."""
+        tried = False
+        for index, breaker in enumerate(self.breakers):
+            if breaker.allow():
+                tried = True
+                yield index
+        if not tried:
+            yield from sorted(range(len(self.breakers)), key=lambda i: self.breakers[i].retry_at)
+
+    def _failed(self, index: int, err: Exception, began: float) -> None:
+        self.breakers[index].record(False, time.perf_counter() - began)
+        logger.warning("%s failed: %s", self.interfaces[index].target, err)
+
+    def _route(self, name: str, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        error: Optional[Exception] = None
+        for index in self._order():
+            llm, began = self.interfaces[index], time.perf_counter()
+            try:
+                result = getattr(llm, name)(*args, **kwargs)
+            except Exception as err:
+                self._failed(index, err, began)
+                error = error or err
+                continue
+            except BaseException:
+                self.breakers[index].release()
+                raise
+            self.breakers[index].record(True, time.perf_counter() - began)
+            return _tag(result, llm.target)
+        raise error
+
+    async def _aroute(self, name: str, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        error: Optional[Exception] = None
+        for index in self._order():
+            llm, began = self.interfaces[index], time.perf_counter()
+            try:
+                result = await getattr(llm, name)(*args, **kwargs)
+            except Exception as err:
+                self._failed(index, err, began)
+                error = error or err
+                continue
+            except BaseException:
+                self.breakers[index].release()
+                raise
+            self.breakers[index].record(True, time.perf_counter() - began)
+            return _tag(result, llm.target)
+        raise error
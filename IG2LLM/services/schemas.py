@@ -0,0 +1,101 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Tuple, Type
+
+from pydantic import BaseModel
+
+# Characters not allowed in Anthropic tool input property names (^[a-zA-Z0-9_.-]{1,64}$)
+_UNSAFE_KEY = re.compile(r"[^a-zA-Z0-9_.-]")
+
+
+class OutputSchema(NamedTuple):
+    """
+    A named JSON Schema passed to a provider's structured-output mechanism.
+
+    `renamed` holds (schema name, field alias) pairs for properties whose alias
+    had to be renamed in the schema (see `output_schema(tool_keys=True)`).
+    """
+    name: str
+    schema: Dict[str, Any]
+    renamed: Tuple[Tuple[str, str], ...] = ()
+
+    def fingerprint(self) -> str:
+        """Stable serialization, used to keep cached responses per schema apart."""
+        return json.dumps([self.name, self.schema], sort_keys=True)
+
+    def restore(self, value: Any) -> Any:
+        """Rename the keys of an answer to this schema back to the field aliases."""
+        if not self.renamed:
+            return value
+        return _rename_keys(value, dict(self.renamed))
+
+
+def _rename_keys(value: Any, names: Dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        return {names.get(k, k): _rename_keys(v, names) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rename_keys(v, names) for v in value]
+    return value
+
+
+def _strict(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rewrite a pydantic JSON Schema into the strict subset accepted by the
+    structured-output APIs: every property is required, no additional properties,
+    and no titles or defaults.
+    """
+    out: Dict[str, Any] = {
+        k: v for k, v in schema.items() if k not in ("title", "default", "description")
+    }
+    if out.get("type") == "object" and "properties" in out:
+        out["properties"] = {name: _strict(prop) for name, prop in out["properties"].items()}
+        out["required"] = list(out["properties"])
+        out["additionalProperties"] = False
+    if isinstance(out.get("items"), dict):
+        out["items"] = _strict(out["items"])
+    return out
+
+
+@lru_cache(maxsize=None)
+def output_schema(
+    model: Type[BaseModel], packed: bool = False, tool_keys: bool = False
+) -> OutputSchema:
+    """
+    Strict JSON Schema for `model`, keyed by field alias (so "A,p" rather than "Ap").
+
+    Components are lists, so "absent" is an empty list and making every property
+    required loses nothing. With `packed`, the schema describes the
+    {"results": [{"id": ..., "components": ...}]} answer of a packed request.
+
+    With `tool_keys` (Anthropic tool input), aliases with characters a tool
+    property name may not contain are renamed ("A,p" -> "A_p"); answers are
+    mapped back with `OutputSchema.restore`.
+    """
+    components = _strict(model.model_json_schema(by_alias=True))
+    renamed: Tuple[Tuple[str, str], ...] = ()
+    if tool_keys:
+        renamed = tuple(
+            (_UNSAFE_KEY.sub("_", key), key)
+            for key in components["properties"] if _UNSAFE_KEY.search(key)
+        )
+        safe = {key: name for name, key in renamed}
+        components["properties"] = {
+            safe.get(key, key): prop for key, prop in components["properties"].items()
+        }
+        components["required"] = list(components["properties"])
+    if not packed:
+        return OutputSchema(model.__name__, components, renamed)
+    entry = {
+        "type": "object",
+        "properties": {"id": {"type": "string"}, "components": components},
+        "required": ["id", "components"],
+        "additionalProperties": False,
+    }
+    schema = {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": entry}},
+        "required": ["results"],
+        "additionalProperties": False,
+    }
+    return OutputSchema(f"{model.__name__}Pack", schema, renamed)
@@ -0,0 +1,66 @@
+import time
+from typing import Any, Callable, List, Optional
+
+from .json_extract import JSONStreamExtractor, is_object
+
+
+class StreamCollector:
+    """
+    Collects the text of a streamed completion, per candidate, and detects when
+    every candidate's answer is complete.
+
+    Each candidate's chunks are fed to a `JSONStreamExtractor`; a candidate is
+    complete once it has produced an object accepted by `accept` (e.g. one with
+    the response model's keys), so the caller can close the stream instead of
+    paying for and waiting on trailing explanations.
+
+    `first_token` and `json_complete` are the seconds from the request to the
+    first text chunk and to the moment the last candidate's object completed
+    (None if it never did). The caller sets `cut` when it closes the stream
+    before the provider finished.
+
+    Example:
+        collector = StreamCollector(n, matches_model(Regulative))
+        for index, text in stream:
+            if collector.feed(index, text):
+                collector.cut = True
+                break
+        candidates = collector.candidates()
+    """
+    def __init__(
+        self,
+        n: int = 1,
+        accept: Callable[[Any], bool] = is_object,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self._clock = clock
+        self._started = clock()
+        self._texts: List[List[str]] = [[] for _ in range(n)]
+        self._extractors = [JSONStreamExtractor(accept) for _ in range(n)]
+        self._pending = n
+        self.first_token: Optional[float] = None
+        self.json_complete: Optional[float] = None
+        self.cut = False
+
+    @property
+    def done(self) -> bool:
+        """True once every candidate has a complete answer object."""
+        return self._pending == 0
+
+    def feed(self, index: int, text: Optional[str]) -> bool:
+        """Add a chunk of candidate `index`; returns `done`."""
+        if not text or not 0 <= index < len(self._texts):
+            return self.done
+        if self.first_token is None:
+            self.first_token = self._clock() - self._started
+        self._texts[index].append(text)
+        extractor = self._extractors[index]
+        if not extractor.found and extractor.feed(text) is not None:
+            self._pending -= 1
+            if self._pending == 0:
+                self.json_complete = self._clock() - self._started
+        return self.done
+
+    def candidates(self) -> List[str]:
+        """Text received so far, per candidate."""
+        return ["".join(parts) for parts in self._texts]
@@ -0,0 +1,333 @@
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_CALL_IDS = itertools.count(1)
+
+
+@dataclass
+class CallRecord:
+    """
+    Telemetry for one provider request (or one response-cache hit).
+
+    `kind` is "extraction", "lo" or "packed". A request that samples several
+    candidates gets one record; `outcomes` collects the parse outcome of each
+    candidate ("ok", "repaired", "json_error", "validation_error") and the record is written
+    once every candidate has been resolved.
+    """
+    provider: str
+    model: str
+    kind: str
+    attempt: int
+    candidates: int = 1
+    call_id: int = field(default_factory=lambda: next(_CALL_IDS))
+    started_at: float = field(default_factory=time.time)
+    # Provider latency of the final attempt, and wall time including rate-limit waits
+    latency: Optional[float] = None
+    elapsed: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    cached_prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    reasoning_tokens: Optional[int] = None
+    rate_limit_retries: int = 0
+    # Retries after transient errors (5xx, timeouts, connection resets)
+    transient_retries: int = 0
+    response_cache_hit: bool = False
+    # A duplicate request was sent (hedging), and whether it answered first
+    hedged: bool = False
+    hedge_won: bool = False
+    # Streamed calls: seconds from the request to the first token and to the complete
+    # answer object, and whether the stream was closed before the provider finished
+    ttft: Optional[float] = None
+    time_to_json: Optional[float] = None
+    stream_cut: bool = False
+    error: Optional[str] = None
+    outcomes: List[str] = field(default_factory=list)
+
+    @property
+    def parse_outcome(self) -> str:
+        """
+        "ok" if every candidate parsed, "repaired" if some only parsed after local
+        repair, otherwise the first failure seen.
+        """
+        if self.error:
+            return "error"
+        failures = [o for o in self.outcomes if o not in ("ok", "repaired")]
+        if failures:
+            return failures[0]
+        if "repaired" in self.outcomes:
+            return "repaired"
+        return "ok" if self.outcomes else "unresolved"
+
+
+def parse_outcome(err: Exception) -> str:
+    """Outcome label for a candidate rejected with `err`."""
+    return "json_error" if isinstance(err, (json.JSONDecodeError, AttributeError)) else "validation_error"
+
+
+class Telemetry:
+    """
+    Collects `CallRecord`s and streams them to an optional JSONL sink.
+
+    Memory stays bounded on long runs: the end-of-run summary is aggregated as
+    records complete (`CallSummary`), and only the `keep` most recent records
+    are held in `records`. The sink has every record.
+    """
+    def __init__(self, path: Optional[Union[str, Path]] = None, keep: int = 1000):
+        self.path = Path(path) if path else None
+        self.records: Deque[CallRecord] = deque(maxlen=keep)
+        self.totals = CallSummary()
+        self._pending: Dict[int, CallRecord] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def finish(self, record: CallRecord) -> None:
+        """Register a completed (or failed) request; written once outcomes are in."""
+        with self._lock:
+            self.records.append(record)
+            if record.error or record.candidates <= len(record.outcomes):
+                self._complete(record)
+            else:
+                self._pending[record.call_id] = record
+
+    def resolve(self, record: Optional[CallRecord], outcome: str) -> None:
+        """Attach the parse outcome of one candidate of `record`."""
+        if record is None:
+            return
+        with self._lock:
+            record.outcomes.append(outcome)
+            if len(record.outcomes) >= record.candidates and record.call_id in self._pending:
+                self._complete(self._pending.pop(record.call_id))
+
+    def close(self) -> None:
+        """Write records whose candidates were never resolved and close the sink."""
+        with self._lock:
+            for record in self._pending.values():
+                self._complete(record)
+            self._pending.clear()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def summarize(
+        self,
+        statements: int,
+        runs: int,
+        pricing: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        """Summary of every completed record; see `summarize`."""
+        with self._lock:
+            return self.totals.summary(statements, runs, pricing)
+
+    def _complete(self, record: CallRecord) -> None:
+        self.totals.add(record)
+        self._write(record)
+
+    def _write(self, record: CallRecord) -> None:
+        if self.path is None:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("a", encoding="utf-8")
+        row = asdict(record)
+        row["parse_outcome"] = record.parse_outcome
+        self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+
+def estimate_cost(record: CallRecord, pricing: Optional[Dict[str, float]]) -> float:
+    """
+    Cost in USD of one record given per-million-token prices
+    ({"input": ..., "cached_input": ..., "output": ...}).
+    """
+    if record.response_cache_hit:
+        return 0.0
+    return _token_cost(_billed(record), pricing)
+
+
+def _billed(record: CallRecord) -> List[int]:
+    """Uncached prompt, cached prompt and completion tokens of `record`."""
+    prompt = record.prompt_tokens or 0
+    cached = record.cached_prompt_tokens or 0
+    return [prompt - cached, cached, record.completion_tokens or 0]
+
+
+def _token_cost(tokens: List[int], pricing: Optional[Dict[str, float]]) -> float:
+    if not pricing:
+        return 0.0
+    uncached, cached, output = tokens
+    return (
+        uncached * pricing.get("input", 0.0)
+        + cached * pricing.get("cached_input", pricing.get("input", 0.0))
+        + output * pricing.get("output", 0.0)
+    ) / 1_000_000
+
+
+class _Reservoir:
+    """Uniform sample of at most `size` values (all of them up to `size`)."""
+    def __init__(self, size: int):
+        self.size = size
+        self.values: List[float] = []
+        self.seen = 0
+        # Seeded, so summaries of the same run are reproducible
+        self._rng = random.Random(0)
+
+    def add(self, value: float) -> None:
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            slot = self._rng.randrange(self.seen)
+            if slot < self.size:
+                self.values[slot] = value
+
+
+class CallStats:
+    """
+    Running totals of one group of calls (one kind, or all calls). Latencies
+    are kept in reservoir samples of `sample_size`, so percentiles are exact up
+    to that many calls and estimated beyond.
+    """
+    def __init__(self, sample_size: int = 10_000):
+        self.calls = 0
+        self.cache_hits = 0
+        self.tokens = 0
+        # Calls that were rate limited or repeated after a transient error
+        self.retried = 0
+        # Attempt numbers of the other calls, to count re-requested runs per `runs`
+        self.attempts: Counter = Counter()
+        self.parse_failures = 0
+        self.repaired = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.streamed = 0
+        self.streams_cut = 0
+        self.latencies = _Reservoir(sample_size)
+        self.ttfts = _Reservoir(sample_size)
+        self.json_times = _Reservoir(sample_size)
+        # Billed tokens (see `_billed`) per "provider/model", all calls and hedged calls
+        self.billed: Dict[str, List[int]] = {}
+        self.hedge_billed: Dict[str, List[int]] = {}
+
+    def add(self, record: CallRecord) -> None:
+        self.calls += 1
+        self.tokens += (record.prompt_tokens or 0) + (record.completion_tokens or 0)
+        if record.rate_limit_retries or record.transient_retries:
+            self.retried += 1
+        else:
+            self.attempts[record.attempt] += 1
+        outcome = record.parse_outcome
+        if outcome == "repaired":
+            self.repaired += 1
+        elif outcome not in ("ok", "unresolved"):
+            self.parse_failures += 1
+        self.hedged += record.hedged
+        self.hedge_wins += record.hedge_won
+        if record.response_cache_hit:
+            self.cache_hits += 1
+            return
+        model = f"{record.provider}/{record.model}"
+        _accumulate(self.billed, model, _billed(record))
+        if record.hedged:
+            _accumulate(self.hedge_billed, model, _billed(record))
+        if record.latency is None:
+            return
+        self.latencies.add(record.latency)
+        if record.ttft is not None:
+            self.streamed += 1
+            self.streams_cut += record.stream_cut
+            self.ttfts.add(record.ttft)
+            if record.time_to_json is not None:
+                self.json_times.add(record.time_to_json)
+
+    def summary(
+        self, statements: int, runs: int, pricing: Optional[Dict[str, Dict[str, float]]] = None
+    ) -> Dict[str, float]:
+        latencies = self.latencies.values or [0.0]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        retries = self.retried + sum(n for attempt, n in self.attempts.items() if attempt > runs)
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "tokens_per_statement": self.tokens / statements if statements else 0.0,
+            "retry_rate": retries / self.calls if self.calls else 0.0,
+            "parse_failures": self.parse_failures,
+            "repaired": self.repaired,
+            "cost": _group_cost(self.billed, pricing),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            # Upper bound: the cancelled duplicate is billed at most like the answer
+            "hedge_cost": _group_cost(self.hedge_billed, pricing),
+            "streamed": self.streamed,
+            "streams_cut": self.streams_cut,
+            "ttft_p50": float(np.median(self.ttfts.values)) if self.ttfts.values else None,
+            "json_p50": float(np.median(self.json_times.values)) if self.json_times.values else None,
+        }
+
+
+def _accumulate(totals: Dict[str, List[int]], key: str, tokens: List[int]) -> None:
+    current = totals.setdefault(key, [0, 0, 0])
+    for i, count in enumerate(tokens):
+        current[i] += count
+
+
+def _group_cost(billed: Dict[str, List[int]], pricing: Optional[Dict[str, Dict[str, float]]]) -> float:
+    return sum(_token_cost(tokens, (pricing or {}).get(model)) for model, tokens in billed.items())
+
+
+class CallSummary:
+    """`CallStats` per kind of call and over all calls, updated one record at a time."""
+    def __init__(self, sample_size: int = 10_000):
+        self.sample_size = sample_size
+        self.kinds: Dict[str, CallStats] = {}
+        self.total = CallStats(sample_size)
+
+    def add(self, record: CallRecord) -> None:
+        if record.kind not in self.kinds:
+            self.kinds[record.kind] = CallStats(self.sample_size)
+        self.kinds[record.kind].add(record)
+        self.total.add(record)
+
+    def summary(
+        self, statements: int, runs: int, pricing: Optional[Dict[str, Dict[str, float]]] = None
+    ) -> Dict[str, Dict[str, float]]:
+        groups = dict(self.kinds)
+        if len(groups) > 1:
+            groups["all"] = self.total
+        return {kind: stats.summary(statements, runs, pricing) for kind, stats in groups.items()}
+
+
+def summarize(
+    records: Iterable[CallRecord],
+    statements: int,
+    runs: int,
+    pricing: Optional[Dict[str, Dict[str, float]]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Per-kind and overall call statistics: latency percentiles, tokens per
+    statement, retry rate, estimated cost, hedged requests and, for streamed
+    calls, median time to first token and to the complete answer object.
+
+    A call counts as a retry when it was rate limited, was repeated after a
+    transient error, or re-requested a run whose earlier attempt failed to parse
+    (attempt > `runs`). `Telemetry.summarize` gives the same summary without
+    keeping the records.
+    """
+    totals = CallSummary()
+    for record in records:
+        totals.add(record)
+    return totals.summary(statements, runs, pricing)
@@ -1,5 +1,5 @@
 import unittest
-from util.aggregation import aggregate_results
+from util.aggregation import IncrementalAggregator, aggregate_results, is_consensus_decided
 
 class TestAggregation(unittest.TestCase):
     def test_basic_consistency(self):
@@ -264,6 +264,110 @@ class TestAggregation(unittest.TestCase):
         }
         aggregated = aggregate_results(data)
         self.assertEqual(aggregated[0]["actual_components"], expected_aggregated)
-    
+
+    def test_consensus_decided_after_agreeing_majority(self):
+        run = {"A": ["commission"], "D": ["shall"], "I": ["optimize"]}
+        self.assertFalse(is_consensus_decided([run, run], total_runs=5))
+        self.assertTrue(is_consensus_decided([run, run, run], total_runs=5))
+
+    def test_consensus_undecided_while_variant_can_reach_threshold(self):
+        results = [
+            {"A": ["commission"], "Bdir": ["public investment"]},
+            {"A": ["commission"], "Bdir": ["public investment"]},
+            {"A": ["commission"], "Bdir": ["investment"]},
+        ]
+        # "public investment" needs one more vote, "investment" could still reach 3.
+        self.assertFalse(is_consensus_decided(results, total_runs=5))
+        results.append({"A": ["commission"], "Bdir": ["public investment"]})
+        self.assertTrue(is_consensus_decided(results, total_runs=5))
+
+    def test_early_stopped_runs_use_requested_threshold(self):
+        data = [
+            {
+                "input": "The commission shall optimize public investment.",
+                "expected_components": {"A": ["commission"]},
+                "runs_requested": 5,
+                "runs_used": 4,
+                "results": [
+                    {"A": ["commission"], "Bdir": ["public investment"]},
+                    {"A": ["commission"], "Bdir": ["public investment"]},
+                    {"A": ["commission"], "Bdir": ["investment"]},
+                    {"A": ["commission"], "Bdir": ["public investment"]},
+                ]
+            }
+        ]
+        aggregated = aggregate_results(data)
+        self.assertEqual(
+            aggregated[0]["actual_components"],
+            {"A": ["commission"], "Bdir": ["public investment"]},
+        )
+
+    def test_refined_consensus_replaces_vote(self):
+        data = [{
+            "input": "The commission shall not optimize or delay investment.",
+            "expected_components": {"A": ["commission"]},
+            "results": [{"A": ["commission"], "I": ["optimize"]}] * 3,
+            "consensus": {"A": ["commission"], "I": ["[NOT] optimize [XOR] delay"]},
+        }]
+        self.assertEqual(
+            aggregate_results(data)[0]["actual_components"],
+            {"A": ["commission"], "I": ["[NOT] optimize [XOR] delay"]},
+        )
+
+class TestIncrementalAggregator(unittest.TestCase):
+    RUNS = [
+        {"A": ["commission"], "Bdir": ["public investment"]},
+        {"A": ["the commission"], "Bdir": ["investment"]},
+        {"A": ["commission", "the commission"], "Bdir": ["public investment"]},
+        {"A": ["commission"], "Bdir": ["investment"], "O": ["x"]},
+        {"A": ["the commission"], "Bdir": ["public investment"]},
+    ]
+
+    def test_consensus_after_every_run(self):
+        # Five runs requested: a variant needs 3 votes
+        expected = [
+            ({}, False),
+            ({}, False),
+            # Every variant has at most 2 votes, but 2 runs could still add a third
+            ({}, False),
+            ({"A": ["commission"]}, False),
+            # "the commission" was not in the first run, so it follows "commission"
+            ({"A": ["commission", "the commission"], "Bdir": ["public investment"]}, True),
+        ]
+        aggregator = IncrementalAggregator(total_runs=5)
+        for run, (consensus, decided) in zip(self.RUNS, expected):
+            aggregator.add_run("s1", run)
+            self.assertEqual(aggregator.consensus("s1"), consensus)
+            self.assertEqual(aggregator.is_decided("s1"), decided)
+
+    def test_defaults_to_runs_added(self):
+        aggregator = IncrementalAggregator()
+        for run in self.RUNS[:3]:
+            aggregator.add_run("s1", run)
+        # Three runs: a variant needs 2 votes
+        self.assertEqual(
+            aggregator.consensus("s1"),
+            {"A": ["commission", "the commission"], "Bdir": ["public investment"]},
+        )
+        self.assertTrue(aggregator.is_decided("s1"))
+
+    def test_order_follows_first_run(self):
+        aggregator = IncrementalAggregator()
+        aggregator.add_run("s1", {"A": ["board", "commission"]})
+        aggregator.add_run("s1", {"A": ["members", "commission", "board"]})
+        aggregator.add_run("s1", {"A": ["members"]})
+        self.assertEqual(aggregator.consensus("s1"), {"A": ["board", "commission", "members"]})
+
+    def test_statements_are_independent(self):
+        aggregator = IncrementalAggregator(total_runs=1)
+        aggregator.add_run("s1", {"A": ["commission"]})
+        aggregator.add_run("s2", {"A": ["board"]})
+        self.assertEqual(aggregator.consensus("s1"), {"A": ["commission"]})
+        self.assertEqual(aggregator.runs("s2"), 1)
+        aggregator.pop("s2")
+        self.assertEqual(aggregator.consensus("s2"), {})
+        self.assertEqual(aggregator.runs("s2"), 0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,159 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import evaluate
+from util.checkpoint import Checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "run.checkpoint.jsonl"
+
+    def test_torn_final_line_is_skipped_and_terminated(self):
+        self.path.write_text('{"input": "a", "results": []}\n{"input": "b", "resu', encoding="utf-8")
+        checkpoint = Checkpoint(self.path)
+        self.assertEqual([row["input"] for row in checkpoint], ["a"])
+        with checkpoint:
+            checkpoint.append({"input": "c", "results": []})
+        self.assertEqual([row["input"] for row in checkpoint], ["a", "c"])
+        self.assertEqual(self.path.read_text(encoding="utf-8").count("\n"), 3)
+
+    def test_index_keeps_latest_row_and_reads_back_by_offset(self):
+        with Checkpoint(self.path) as checkpoint:
+            checkpoint.append({"input": "a", "runs_requested": 1, "results": [1]})
+            checkpoint.append({"input": "b", "runs_requested": 2, "results": [1, 2]})
+            checkpoint.append({"input": "a", "runs_requested": 2, "results": [1, 2]})
+            checkpoint.append({"input": "b", "runs_requested": 1, "results": [3]})
+            checkpoint.append({"note": "no input"})
+        offsets = checkpoint.index()
+        self.assertEqual(len(offsets), 2)
+        self.assertNotIn("no input", offsets)
+        self.assertEqual(
+            [row["results"] for row in checkpoint.rows_at([offsets["b"], offsets["a"]])],
+            [[3], [1, 2]],
+        )
+        # The resume filter of evaluate.main: a statement whose latest row has too few runs is redone
+        done = checkpoint.index(lambda row: row.get("runs_requested", len(row.get("results", []))) >= 2)
+        self.assertEqual(len(done), 1)
+        self.assertEqual(done["a"], offsets["a"])
+        self.assertNotIn("b", done)
+        self.assertIsNone(done.get("b"))
+        self.assertEqual(checkpoint.load()["b"]["results"], [3])
+
+    def test_rows_are_keyed_by_position_and_input(self):
+        with Checkpoint(self.path) as checkpoint:
+            checkpoint.append({"row": 0, "input": "a", "results": [1]})
+            checkpoint.append({"row": 2, "input": "a", "results": [2]})
+            checkpoint.append({"input": "legacy", "results": [3]})
+        offsets = checkpoint.index()
+        self.assertEqual(len(offsets), 3)
+        self.assertIn((0, "a"), offsets)
+        self.assertNotIn("a", offsets)
+        self.assertIsNone(offsets.find(1, "a"))
+        # Rows without a position match the statement at any position
+        self.assertEqual(
+            [row["results"] for row in checkpoint.rows_at(
+                [offsets.find(2, "a"), offsets.find(0, "a"), offsets.find(5, "legacy")]
+            )],
+            [[2], [1], [3]],
+        )
+        self.assertEqual(checkpoint.load()[(2, "a")]["results"], [2])
+
+    def test_fsync_is_batched_and_flushed_on_close(self):
+        with mock.patch("util.checkpoint.os.fsync") as fsync:
+            checkpoint = Checkpoint(self.path, fsync_every=3, fsync_interval=3600)
+            for i in range(4):
+                checkpoint.append({"input": str(i)})
+            self.assertEqual(fsync.call_count, 1)
+            # Rows are flushed (readable) even before they are synced
+            self.assertEqual(len(list(checkpoint)), 4)
+            checkpoint.close()
+            self.assertEqual(fsync.call_count, 2)
+            checkpoint.close()
+            self.assertEqual(fsync.call_count, 2)
+
+
+class TestResume(unittest.TestCase):
+    STEM = "results/mock_easy_regulative_statements_results"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(tmp.name)
+        Path("data").mkdir()
+        Path("results").mkdir()
+
+    def write_statements(self, *lines):
+        Path("data/easy_regulative_statements.csv").write_text(
+            "Input,Output\n" + "".join(line + "\n" for line in lines), encoding="utf-8",
+        )
+
+    def run_main(self, runs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            evaluate.main(
+                runs=runs, statement_type="regulative", difficulty="easy", include_examples=False,
+                provider="mock", bootstrap_iterations=10, mock=dict(mock_latency="fixed:0"),
+            )
+        with open(f"{self.STEM}.jsonl", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def telemetry_calls(self):
+        with open(f"{self.STEM}.telemetry.jsonl", encoding="utf-8") as f:
+            return sum(1 for _ in f)
+
+    def test_main_only_sends_unfinished_statements(self):
+        self.write_statements(
+            "The agency must inspect.,A(agency) D(must) I(inspect)",
+            "The board may appeal.,A(board) D(may) I(appeal)",
+            "The clerk shall record.,A(clerk) D(shall) I(record)",
+        )
+        stem = self.STEM
+        with Checkpoint(f"{stem}.checkpoint.jsonl") as checkpoint:
+            # Finished: kept as is
+            checkpoint.append({"input": "The agency must inspect.", "runs_requested": 2,
+                               "results": [{"A": ["resumed"]}, {"A": ["resumed"]}]})
+            # Too few runs for this experiment: sent again
+            checkpoint.append({"input": "The board may appeal.", "runs_requested": 1,
+                               "results": [{"A": ["stale"]}]})
+
+        rows = self.run_main(runs=2)
+        self.assertEqual([row["input"] for row in rows], [
+            "The agency must inspect.", "The board may appeal.", "The clerk shall record.",
+        ])
+        self.assertEqual(rows[0]["results"], [{"A": ["resumed"]}] * 2)
+        self.assertEqual(rows[1]["results"], [{"A": ["board"], "D": ["may"], "I": ["appeal"]}] * 2)
+        self.assertEqual(len(rows[2]["results"]), 2)
+        self.assertEqual(self.telemetry_calls(), 2)  # one multi-sample call per pending statement
+
+    def test_repeated_statements_resume_separately(self):
+        self.write_statements(
+            "The agency must inspect.,A(agency) D(must) I(inspect)",
+            "The board may appeal.,A(board) D(may) I(appeal)",
+            "The agency must inspect.,A(agency) D(must) I(inspect)",
+        )
+        with Checkpoint(f"{self.STEM}.checkpoint.jsonl") as checkpoint:
+            # Only the first occurrence finished before the interruption
+            checkpoint.append({"row": 0, "input": "The agency must inspect.", "runs_requested": 1,
+                               "results": [{"A": ["resumed"]}]})
+
+        rows = self.run_main(runs=1)
+        self.assertEqual([(row["row"], row["input"]) for row in rows], [
+            (0, "The agency must inspect."), (1, "The board may appeal."), (2, "The agency must inspect."),
+        ])
+        self.assertEqual(rows[0]["results"], [{"A": ["resumed"]}])
+        self.assertEqual(rows[2]["results"], [{"A": ["agency"], "D": ["must"], "I": ["inspect"]}])
+        self.assertEqual(self.telemetry_calls(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+
+import httpx
+
+from services.client_pool import PoolSettings, close_clients, get_async_client, get_client, pool_size
+
+
+def _ctor(key, pool):
+    return {"key": key, "http": pool.http_client(httpx.Client)}
+
+
+class TestClientPool(unittest.TestCase):
+    def tearDown(self):
+        close_clients()
+
+    @staticmethod
+    def _async_ctor(key, pool):
+        return pool.http_client(httpx.AsyncClient)
+
+    def test_same_key_shares_client(self):
+        first = get_client("openai", "k1", None, _ctor)
+        self.assertIs(get_client("openai", "k1", None, _ctor), first)
+        self.assertIsNot(get_client("openai", "k2", None, _ctor), first)
+        self.assertIsNot(get_client("deepseek", "k1", "https://api.deepseek.com", _ctor), first)
+        self.assertEqual(pool_size()["sync"], 3)
+
+    def test_limits_are_applied(self):
+        settings = PoolSettings(max_connections=7, max_keepalive_connections=3, keepalive_expiry=5.0)
+        http = get_client("claude", "k", None, _ctor, settings)["http"]
+        self.assertIsInstance(http, httpx.Client)
+        pool = http._transport._pool
+        self.assertEqual(pool._max_connections, 7)
+        self.assertEqual(pool._max_keepalive_connections, 3)
+        self.assertEqual(pool._keepalive_expiry, 5.0)
+
+    def test_async_clients_are_per_loop(self):
+        async def fetch():
+            return (
+                get_async_client("openai", "k", None, self._async_ctor),
+                get_async_client("openai", "k", None, self._async_ctor),
+            )
+
+        first, again = asyncio.run(fetch())
+        self.assertIs(first, again)
+        second, _ = asyncio.run(fetch())
+        self.assertIsNot(second, first)
+        # The client of the closed first loop was dropped
+        self.assertEqual(pool_size()["async"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import unittest
+
+from model import Constitutive, Regulative
+from services.llm_interface import LLMConfig, LLMInterface
+from services.mock_provider import CODED_FORMAT_MARKER
+from util.convert_to_json import (
+    array_to_dict, extract_coded_components, extract_components, format_components, parse_coded, to_coded,
+)
+
+
+class TestExtractComponents(unittest.TestCase):
+    def test_nested_parentheses_and_alias_symbols(self):
+        text = "A,p(every) A(student) Bdir,p(obligatory) I((attend [AND] pass)) Cex(within 30 days (excluding holidays))"
+        self.assertEqual(parse_coded(text, Regulative), {
+            "A,p": ["every"],
+            "A": ["student"],
+            "Bdir,p": ["obligatory"],
+            "I": ["(attend [AND] pass)"],
+            "Cex": ["within 30 days (excluding holidays)"],
+        })
+
+    def test_skips_prose_and_unknown_symbols(self):
+        text = "Here is the coding (IG 2.0):\n`A(agency),D(must) I(inspect) PDF(s) Bdirp(annual)`\nExplanation: ..."
+        self.assertEqual(
+            extract_coded_components(text),
+            ["A(agency)", "D(must)", "I(inspect)", "Bdirp(annual)"],
+        )
+        self.assertEqual(parse_coded("E(body) F(is) A(agency)", Constitutive), {"E": ["body"], "F": ["is"]})
+
+    def test_unbalanced_and_truncated_components(self):
+        text = "A(council) Cex(see section 3(a) D(shall) I(approve) Bdir(the fund"
+        self.assertEqual(
+            extract_coded_components(text),
+            ["A(council)", "Cex(see section 3(a)", "D(shall)", "I(approve)"],
+        )
+
+    def test_round_trip(self):
+        components = {"A": ["commission"], "D": ["shall"], "I": ["optimize"], "Bind,p": ["junior"]}
+        coded = to_coded(components)
+        self.assertEqual(coded, "A(commission) D(shall) I(optimize) Bind,p(junior)")
+        self.assertEqual(parse_coded(coded, Regulative), components)
+        self.assertEqual(array_to_dict(extract_components(coded), "regulative"), components)
+
+
+class TestGoldComponents(unittest.TestCase):
+    """The gold `Output` column keeps the original, lenient parsing."""
+    def gold(self, output):
+        return format_components("", output, "regulative")["expected_components"]
+
+    def test_nested_component_takes_the_preceding_token(self):
+        self.assertEqual(self.gold("Cac{A(x) I(y)} A(z) I(w)"), {"A": ["z"], "I": ["y", "w"]})
+
+    def test_empty_literal_is_kept(self):
+        self.assertEqual(self.gold("A() I(do)"), {"A": [""], "I": ["do"]})
+
+    def test_components_need_whitespace_between_them(self):
+        self.assertEqual(self.gold("I(act),A(x)"), {"I": ["act", "act),A(x"]})
+
+    def test_coded_answers_use_the_stricter_parser(self):
+        self.assertEqual(parse_coded("I(act),A(x) A() Cac{A(y)}", Regulative), {"I": ["act"], "A": ["x", "y"]})
+
+
+class TestCodedAnswers(unittest.TestCase):
+    def test_coded_answer_is_validated_into_the_model(self):
+        outputs = {}
+        for output_format in ("json", "coded"):
+            llm = LLMInterface(config=LLMConfig(
+                provider="mock", mock_latency="fixed:0", output_format=output_format,
+            ))
+            llm.client.answers = {"The agency must inspect.": [{"A": ["agency"], "D": ["must"], "I": ["inspect"]}]}
+            system_prompt = CODED_FORMAT_MARKER if output_format == "coded" else ""
+            outputs[output_format] = (
+                asyncio.run(llm.arun(
+                    user_prompt="The agency must inspect.", system_prompt=system_prompt,
+                    response_model=Regulative,
+                )),
+                llm.telemetry.records[0],
+            )
+        (plain, plain_record), (coded, record) = outputs["json"], outputs["coded"]
+        self.assertEqual(coded, plain)
+        self.assertEqual(record.parse_outcome, "ok")
+        self.assertLess(record.completion_tokens, plain_record.completion_tokens)
+
+    def test_answer_without_components_is_rejected(self):
+        llm = LLMInterface(config=LLMConfig(provider="mock", output_format="coded"))
+        with self.assertRaises(json.JSONDecodeError):
+            llm._parse_answer("I cannot code this statement.", "", Regulative)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from evaluate import ExtractionInterrupted, run_llm_on_data, stream_llm_on_data
+from services.errors import ServerError
+from services.llm_interface import LLMConfig, LLMInterface
+from services.router import LLMRouter
+from util.checkpoint import Checkpoint
+
+STATEMENTS = [f"Agency {i} must inspect." for i in range(12)]
+
+
+def make_llm() -> LLMInterface:
+    # Random latencies so statements finish out of input order
+    llm = LLMInterface(config=LLMConfig(
+        provider="mock", mock_latency="uniform:0,0.02", mock_seed=3, max_concurrency=4,
+    ))
+    llm.client.answers = {text: [{"A": [text.split(" must")[0]]}] for text in STATEMENTS}
+    return llm
+
+
+def data():
+    return [{"input": text, "expected_components": {"A": [text]}} for text in STATEMENTS]
+
+
+class TestExtractionEngine(unittest.TestCase):
+    def test_rows_keep_input_order(self):
+        finished = []
+        rows = run_llm_on_data(
+            data(), make_llm(), "", runs=2, statement_type="regulative", concurrency=4,
+            on_result=lambda row: finished.append(row["input"]),
+        )
+        self.assertEqual([row["input"] for row in rows], STATEMENTS)
+        self.assertEqual(sorted(finished), sorted(STATEMENTS))
+        for row in rows:
+            self.assertEqual(row["runs_used"], 2)
+            self.assertEqual(row["results"][0], {"A": [row["input"].split(" must")[0]]})
+
+    def test_interrupt_returns_finished_rows_in_order(self):
+        seen = []
+
+        def on_result(row):
+            seen.append(row["input"])
+            if len(seen) == 3:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(ExtractionInterrupted) as caught:
+            run_llm_on_data(
+                data(), make_llm(), "", runs=1, statement_type="regulative", concurrency=4,
+                on_result=on_result,
+            )
+        completed = [row["input"] for row in caught.exception.completed]
+        self.assertEqual(caught.exception.count, 3)
+        self.assertEqual(sorted(completed), sorted(seen))
+        self.assertEqual(completed, sorted(completed, key=STATEMENTS.index))
+
+    def test_streaming_interrupt_reports_count(self):
+        seen = []
+
+        def on_result(row):
+            seen.append(row)
+            if len(seen) == 2:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(ExtractionInterrupted) as caught:
+            stream_llm_on_data(
+                iter(data()), make_llm(), "", runs=1, statement_type="regulative",
+                on_result=on_result, concurrency=4,
+            )
+        self.assertEqual(caught.exception.count, 2)
+        self.assertEqual(caught.exception.completed, [])
+
+
+class TestLOStrategy(unittest.TestCase):
+    RUNS = 3
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.checkpoint = Checkpoint(Path(tmp.name) / "run.checkpoint.jsonl")
+        self.addCleanup(self.checkpoint.close)
+
+    def extract(self, llm, lo_strategy):
+        rows = run_llm_on_data(
+            data(), llm, "", runs=self.RUNS, statement_type="regulative", include_logic=True,
+            concurrency=4, on_result=self.checkpoint.append, lo_strategy=lo_strategy,
+        )
+        self.checkpoint.close()
+        return rows
+
+    def lo_calls(self, llm):
+        return sum(record.kind == "lo" for record in llm.telemetry.records)
+
+    def test_per_run_refines_every_run(self):
+        llm = make_llm()
+        rows = self.extract(llm, "per-run")
+        self.assertEqual(self.lo_calls(llm), self.RUNS * len(STATEMENTS))
+        for row in list(self.checkpoint) + rows:
+            self.assertNotIn("consensus", row)
+            self.assertEqual(row["results"], [{"A": [row["input"].split(" must")[0]]}] * self.RUNS)
+
+    def test_consensus_refines_once_per_statement(self):
+        llm = make_llm()
+        rows = self.extract(llm, "consensus")
+        self.assertEqual(self.lo_calls(llm), len(STATEMENTS))
+        saved = {row["input"]: row for row in self.checkpoint}
+        self.assertEqual(sorted(saved), sorted(STATEMENTS))
+        for row in rows:
+            agency = {"A": [row["input"].split(" must")[0]]}
+            self.assertEqual(row["results"], [agency] * self.RUNS)
+            self.assertEqual(row["consensus"], agency)
+            self.assertNotIn("lo_model", row)
+            self.assertEqual(saved[row["input"]], row)
+
+    def test_consensus_records_failover_target(self):
+        router = LLMRouter(
+            ["mock/primary", "mock/backup"],
+            LLMConfig(provider="mock", mock_latency="fixed:0", max_retries=0),
+            breaker=dict(min_calls=100),
+        )
+        for llm in router.interfaces:
+            llm.client.answers = {text: [{"A": [text.split(" must")[0]]}] for text in STATEMENTS}
+        primary = router.interfaces[0]
+        # Extraction is served by the primary; its LO pass fails over to the backup
+        with mock.patch.object(primary, "arefine", side_effect=ServerError("down", provider="mock")):
+            rows = self.extract(router, "consensus")
+        self.assertEqual(self.lo_calls(router), len(STATEMENTS))
+        for row in list(self.checkpoint) + rows:
+            self.assertEqual(row["model"], "mock/primary")
+            self.assertEqual(row["lo_model"], "mock/backup")
+            self.assertEqual(row["consensus"], {"A": [row["input"].split(" must")[0]]})
+
+
+if __name__ == "__main__":
+    unittest.main()
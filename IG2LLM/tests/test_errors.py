@@ -0,0 +1,78 @@
+import unittest
+
+from services.errors import (
+    AuthenticationError,
+    BadRequestError,
+    ConnectionFailedError,
+    LLMError,
+    RateLimitError,
+    RequestTimeoutError,
+    RetryPolicy,
+    ServerError,
+    classify_error,
+)
+from services.mock_provider import MockAPIError
+
+
+class APIConnectionError(Exception):
+    """Stands in for the SDK class of the same name; matched by name."""
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def wrapped(err):
+    try:
+        try:
+            raise err
+        except Exception as inner:
+            raise RuntimeError("adapter") from inner
+    except RuntimeError as outer:
+        return outer
+
+
+class TestClassifyError(unittest.TestCase):
+    def test_http_statuses(self):
+        cases = {429: RateLimitError, 500: ServerError, 529: ServerError, 408: RequestTimeoutError,
+                 401: AuthenticationError, 403: AuthenticationError, 400: BadRequestError}
+        for status, cls in cases.items():
+            err = classify_error(wrapped(StatusError(status)), "openai")
+            self.assertIs(type(err), cls, status)
+            self.assertEqual(err.status_code, status)
+            self.assertEqual(err.transient, status in (429, 500, 529, 408))
+
+    def test_transport_errors_and_retry_after(self):
+        self.assertIsInstance(classify_error(TimeoutError("read timed out")), RequestTimeoutError)
+        self.assertIsInstance(classify_error(wrapped(APIConnectionError("reset"))), ConnectionFailedError)
+        self.assertIsInstance(classify_error(ValueError("Empty response")), LLMError)
+        self.assertFalse(classify_error(ValueError("Empty response")).transient)
+        err = classify_error(MockAPIError(429, "slow down", retry_after=3.0), "mock")
+        self.assertIsInstance(err, RateLimitError)
+        self.assertEqual(err.retry_after, 3.0)
+        # Already classified errors pass through unchanged
+        self.assertIs(classify_error(err), err)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_backoff_is_bounded_and_honors_retry_after(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=4.0, jitter=0.0)
+        self.assertEqual([policy.backoff(n) for n in range(4)], [1.0, 2.0, 4.0, 4.0])
+        self.assertEqual(policy.backoff(0, retry_after=10.0), 10.0)
+        jittered = RetryPolicy(base_delay=1.0, max_delay=4.0, jitter=1.0)
+        self.assertTrue(all(0.0 <= jittered.backoff(2) <= 4.0 for _ in range(100)))
+
+    def test_budgets_and_elapsed_time(self):
+        policy = RetryPolicy(max_retries=2, max_rate_limit_retries=5, max_elapsed=10.0)
+        server, limited = ServerError("500"), RateLimitError("429")
+        self.assertTrue(policy.allows(server, 1, elapsed=0.0))
+        self.assertFalse(policy.allows(server, 2, elapsed=0.0))
+        self.assertTrue(policy.allows(limited, 4, elapsed=0.0))
+        self.assertFalse(policy.allows(server, 0, elapsed=9.0, delay=2.0))
+        self.assertFalse(policy.allows(BadRequestError("400"), 0, elapsed=0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from util.aggregation import aggregate_results
+from util.fuzzy import VariantClusterer, align_to_expected, normalize_variant
+
+
+class TestNormalizeVariant(unittest.TestCase):
+    def test_trivial_differences(self):
+        for text in ("the commission", "Commission.", "  THE  Commission ", '"commission"'):
+            self.assertEqual(normalize_variant(text), "commission")
+
+    def test_inner_text_kept(self):
+        self.assertEqual(normalize_variant("public-private (joint) board"), "public-private (joint) board")
+
+
+class TestVariantClusterer(unittest.TestCase):
+    def test_merges_near_duplicates_only(self):
+        clusterer = VariantClusterer()
+        first = clusterer.assign("the commission")
+        self.assertEqual(clusterer.assign("Commission."), first)
+        self.assertEqual(clusterer.assign("the commissions"), first)
+        self.assertNotEqual(clusterer.assign("committee"), first)
+
+    def test_label_is_most_frequent_spelling(self):
+        clusterer = VariantClusterer()
+        cluster = clusterer.assign("the commission")
+        clusterer.assign("commission")
+        clusterer.assign("commission")
+        self.assertEqual(clusterer.label(cluster), "commission")
+
+
+class TestFuzzyAggregation(unittest.TestCase):
+    RUNS = [
+        {"A": ["the commission"], "I": ["optimize"]},
+        {"A": ["Commission"], "I": ["optimize,"]},
+        {"A": ["commission"], "I": ["Optimize"]},
+    ]
+
+    def test_near_duplicates_reach_majority(self):
+        data = [{"input": "s", "expected_components": {"A": ["commission"]}, "results": self.RUNS}]
+        # Without clustering every spelling gets one vote (threshold 2).
+        self.assertEqual(aggregate_results(data)[0]["actual_components"], {})
+        fuzzy = aggregate_results(data, fuzzy=0.7)[0]["actual_components"]
+        self.assertEqual(fuzzy, {"A": ["commission"], "I": ["optimize"]})
+
+    def test_run_votes_once_per_cluster(self):
+        runs = [{"A": ["commission", "the commission"]}, {"A": ["board"]}, {"A": ["members"]}]
+        data = [{"input": "s", "expected_components": {}, "results": runs}]
+        self.assertEqual(aggregate_results(data, fuzzy=0.7)[0]["actual_components"], {})
+
+    def test_align_to_expected(self):
+        expected = {"A": ["the commission", "board"], "D": ["shall"]}
+        actual = {"A": ["Commission", "commission.", "board", "members"], "D": ["shall"]}
+        self.assertEqual(
+            align_to_expected(expected, actual),
+            {"A": ["the commission", "board", "members"], "D": ["shall"]},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
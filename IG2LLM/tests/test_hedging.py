@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+
+from services.hedging import Hedger
+from services.llm_interface import LLMConfig, LLMInterface
+from services.telemetry import CallRecord
+
+
+class TestHedger(unittest.TestCase):
+    def test_delay_needs_samples_and_respects_floor(self):
+        hedger = Hedger(percentile=90, min_samples=10, min_delay=0.5, budget=1.0)
+        self.assertIsNone(hedger.delay("extraction"))
+        for latency in range(1, 11):
+            hedger.observe("extraction", float(latency))
+        self.assertAlmostEqual(hedger.delay("extraction"), 9.1)
+        self.assertIsNone(hedger.delay("lo"))
+        for _ in range(10):
+            hedger.observe("lo", 0.01)
+        self.assertEqual(hedger.delay("lo"), 0.5)
+
+    def test_budget(self):
+        hedger = Hedger(budget=0.25)
+        for _ in range(8):
+            hedger.delay("extraction")
+        self.assertTrue(hedger.try_hedge())
+        self.assertTrue(hedger.try_hedge())
+        self.assertFalse(hedger.try_hedge())
+        hedger.refund()
+        self.assertTrue(hedger.try_hedge())
+
+
+class TestHedgedCall(unittest.TestCase):
+    def setUp(self):
+        self.llm = LLMInterface(config=LLMConfig(
+            provider="mock", hedge_percentile=50, hedge_min_samples=1, hedge_min_delay=0.0,
+            hedge_budget=1.0,
+        ))
+        self.llm.hedger.observe("extraction", 0.01)
+
+    def _run(self, delays):
+        """Send requests that take `delays[i]` seconds (None = fail); return (result, record, cancelled)."""
+        calls = iter(range(len(delays)))
+        cancelled = []
+
+        async def request():
+            i = next(calls)
+            try:
+                if delays[i] is None:
+                    raise ValueError(f"request {i} failed")
+                await asyncio.sleep(delays[i])
+                return i
+            except asyncio.CancelledError:
+                cancelled.append(i)
+                raise
+
+        record = CallRecord(provider="mock", model="mock", kind="extraction", attempt=1)
+
+        async def main():
+            result = await self.llm._ahedged_call(request, record, estimate=10)
+            await asyncio.sleep(0)
+            return result
+
+        return asyncio.run(main()), record, cancelled
+
+    def test_straggler_is_hedged_and_cancelled(self):
+        result, record, cancelled = self._run([1.0, 0.01])
+        self.assertEqual(result, 1)
+        self.assertTrue(record.hedged and record.hedge_won)
+        self.assertEqual(cancelled, [0])
+
+    def test_fast_request_is_not_hedged(self):
+        self.llm.hedger.observe("extraction", 1.0)
+        self.llm.hedger.observe("extraction", 1.0)
+        result, record, _ = self._run([0.01, 0.01])
+        self.assertEqual(result, 0)
+        self.assertFalse(record.hedged)
+
+    def test_failed_hedge_falls_back_to_original(self):
+        result, record, _ = self._run([0.05, None])
+        self.assertEqual(result, 0)
+        self.assertTrue(record.hedged)
+        self.assertFalse(record.hedge_won)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import unittest
+from unittest import mock
+
+from model.classes import Regulative
+from services import json_extract
+from services.json_extract import extract_json, extract_json_stream, has_key, matches_model
+
+
+class TestExtractJson(unittest.TestCase):
+    def test_fenced_output(self):
+        raw = '```json\n{"A": ["commission"], "D": ["shall"]}\n```'
+        self.assertEqual(extract_json(raw), {"A": ["commission"], "D": ["shall"]})
+
+    def test_braces_and_quotes_inside_strings(self):
+        raw = 'Answer: {"Cac": ["per {section 4} of the \\"Act\\" }"]} Hope this helps {'
+        self.assertEqual(extract_json(raw), {"Cac": ['per {section 4} of the "Act" }']})
+
+    def test_skips_prose_braces_and_foreign_objects(self):
+        raw = 'The set {A, D, I} applies; e.g. {"foo": 1}. Final: {"A": ["board"]}'
+        self.assertEqual(extract_json(raw, matches_model(Regulative)), {"A": ["board"]})
+
+    def test_unmatched_prose_brace(self):
+        raw = 'Note the set {A, D and then {"A": ["board"], "D": ["may"]} done'
+        self.assertEqual(extract_json(raw), {"A": ["board"], "D": ["may"]})
+
+    def test_object_nested_in_broken_candidate(self):
+        raw = 'Result: { "note": {"A": ["board"]}, see above }'
+        self.assertEqual(extract_json(raw, matches_model(Regulative)), {"A": ["board"]})
+
+    def test_truncated_output_falls_back_to_complete_entry(self):
+        raw = '{"results": [{"id": "1", "components": {"A": ["x"]}}, {"id": "2", "comp'
+        self.assertEqual(extract_json(raw, has_key("results")), {"id": "1", "components": {"A": ["x"]}})
+
+    def test_unmatched_braces_are_scanned_once(self):
+        raw = "Note: the set {A, D and {x " * 400 + '{"A": ["board"]}'
+        scanned = []
+        feed = json_extract.JSONStreamExtractor.feed
+
+        def counting_feed(extractor, chunk):
+            scanned.append(len(chunk))
+            return feed(extractor, chunk)
+
+        with mock.patch.object(json_extract.JSONStreamExtractor, "feed", counting_feed):
+            self.assertEqual(extract_json(raw), {"A": ["board"]})
+        self.assertEqual(sum(scanned), len(raw))
+
+    def test_falls_back_to_first_object(self):
+        self.assertEqual(extract_json('x {"foo": 1}', matches_model(Regulative)), {"foo": 1})
+
+    def test_stream_stops_at_first_object(self):
+        consumed = []
+
+        def chunks():
+            for chunk in ['<think>{x}</think> {"A"', ': ["q\\\\', '"]} trailing', " more"]:
+                consumed.append(chunk)
+                yield chunk
+
+        self.assertEqual(extract_json_stream(chunks()), {"A": ["q\\"]})
+        self.assertEqual(len(consumed), 3)
+
+    def test_no_object(self):
+        with self.assertRaises(json.JSONDecodeError):
+            extract_json("I could not find any components.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from services.json_repair import repair_json
+
+
+class TestJsonRepair(unittest.TestCase):
+    def test_trailing_commas(self):
+        data, kinds = repair_json('{"A": ["commission",], "D": ["shall"],}')
+        self.assertEqual(data, {"A": ["commission"], "D": ["shall"]})
+        self.assertEqual(kinds, ["trailing_commas"])
+
+    def test_single_quotes(self):
+        data, kinds = repair_json("{'A': ['commission'], 'I': ['don\\'t optimize']}")
+        self.assertEqual(data, {"A": ["commission"], "I": ["don't optimize"]})
+        self.assertEqual(kinds, ["single_quotes"])
+
+    def test_unescaped_quotes(self):
+        data, kinds = repair_json('{"Bdir": ["the "public" investment"], "D": ["shall"]}')
+        self.assertEqual(data, {"Bdir": ['the "public" investment'], "D": ["shall"]})
+        self.assertEqual(kinds, ["unescaped_quotes"])
+
+    def test_python_literals_outside_strings_only(self):
+        data, kinds = repair_json('{"A": ["None of the members"], "flag": True}')
+        self.assertEqual(data, {"A": ["None of the members"], "flag": True})
+        self.assertEqual(kinds, ["python_literals"])
+
+    def test_truncation_drops_unfinished_value(self):
+        data, kinds = repair_json('```json\n{"A": ["commission"], "D": ["shall"], "I": ["optim')
+        self.assertEqual(data, {"A": ["commission"], "D": ["shall"], "I": []})
+        self.assertEqual(kinds, ["truncated"])
+
+    def test_combined_repairs(self):
+        data, kinds = repair_json("Here you go: {'A': ['board',], 'D': ['may']")
+        self.assertEqual(data, {"A": ["board"], "D": ["may"]})
+        self.assertEqual(kinds, ["single_quotes", "trailing_commas", "truncated"])
+
+    def test_unrepairable(self):
+        with self.assertRaises(json.JSONDecodeError):
+            repair_json("I cannot help with that.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+import evaluate
+
+from metrics import (
+    compute_aggregate_metrics_with_ci,
+    compute_metrics_with_ci,
+    compute_metrics_with_ci_streaming,
+)
+from metrics.component_metrics import (
+    bootstrap_scores,
+    compute_aggregate_metrics,
+    compute_component_metrics,
+    encode_component_counts,
+)
+
+AGGREGATED = [
+    {
+        "input": "The commission shall optimize public investment.",
+        "expected_components": {"A": ["commission"], "D": ["shall"], "I": ["optimize"], "Bdir": ["investment"]},
+        "actual_components": {"A": ["commission"], "D": ["shall"], "I": ["optimize"], "Bdir": ["public investment"]},
+    },
+    {
+        "input": "Members must register annually.",
+        "expected_components": {"A": ["Members"], "D": ["must"], "I": ["register"], "Cac": ["annually"]},
+        "actual_components": {"A": ["Members"], "D": ["must"], "I": ["register"]},
+    },
+    {
+        "input": "The board may approve the budget.",
+        "expected_components": {"A": ["board"], "D": ["may"], "I": ["approve"], "Bdir": ["budget"]},
+        "actual_components": {"A": ["board"], "D": ["may"], "I": ["approve"], "Bdir": ["budget"], "O": ["x"]},
+    },
+]
+
+
+class TestVectorizedBootstrap(unittest.TestCase):
+    def test_scores_match_set_based_metrics(self):
+        _, counts, present = encode_component_counts(AGGREGATED)
+        rng = np.random.default_rng(0)
+        weights = rng.multinomial(len(AGGREGATED), [1 / len(AGGREGATED)] * len(AGGREGATED), size=50)
+        scores = bootstrap_scores(counts, present, weights)
+
+        for row, w in enumerate(weights):
+            sample = [item for item, k in zip(AGGREGATED, w) for _ in range(k)]
+            expected = compute_aggregate_metrics(compute_component_metrics(sample))
+            self.assertAlmostEqual(scores["micro_f1"][row], expected["micro"]["f1"])
+            self.assertAlmostEqual(scores["macro_f1"][row], expected["macro"]["f1"])
+
+    def test_point_estimates_unchanged(self):
+        expected = compute_aggregate_metrics(compute_component_metrics(AGGREGATED))
+        result = compute_aggregate_metrics_with_ci(AGGREGATED, bootstrap_iterations=200, seed=1)
+        for agg_type in ("micro", "macro"):
+            self.assertAlmostEqual(result[agg_type]["f1"], expected[agg_type]["f1"])
+            lo, hi = result[agg_type]["ci"]
+            self.assertLessEqual(lo, hi)
+
+    def test_component_cis(self):
+        result = compute_metrics_with_ci(AGGREGATED, bootstrap_iterations=200, seed=1)
+        self.assertEqual(set(result["components"]), {"A", "D", "I", "Bdir", "Cac", "O"})
+        # A is always extracted correctly, so its interval collapses to 1.0.
+        self.assertEqual(result["components"]["A"]["ci"], (1.0, 1.0))
+
+    def test_seed_is_reproducible(self):
+        first = compute_aggregate_metrics_with_ci(AGGREGATED, bootstrap_iterations=100, seed=7)
+        second = compute_aggregate_metrics_with_ci(AGGREGATED, bootstrap_iterations=100, seed=7)
+        self.assertEqual(first, second)
+
+
+class TestStreamingBootstrap(unittest.TestCase):
+    def test_point_estimates_match_batch(self):
+        batch = compute_metrics_with_ci(AGGREGATED, bootstrap_iterations=100, seed=3)
+        streamed = compute_metrics_with_ci_streaming(
+            (item for item in AGGREGATED), bootstrap_iterations=100, seed=3, chunk_size=2
+        )
+        self.assertEqual(streamed["statements"], len(AGGREGATED))
+        self.assertEqual(list(streamed["components"]), list(batch["components"]))
+        for agg_type in ("micro", "macro"):
+            self.assertAlmostEqual(streamed["aggregate"][agg_type]["f1"], batch["aggregate"][agg_type]["f1"])
+            lo, hi = streamed["aggregate"][agg_type]["ci"]
+            self.assertLessEqual(lo, hi)
+        for symbol, metrics in batch["components"].items():
+            self.assertAlmostEqual(streamed["components"][symbol]["f1"], metrics["f1"])
+        self.assertEqual(streamed["components"]["A"]["ci"], (1.0, 1.0))
+
+    def test_seed_is_reproducible_for_iterators(self):
+        first = compute_metrics_with_ci_streaming(AGGREGATED, bootstrap_iterations=50, seed=7, chunk_size=1)
+        second = compute_metrics_with_ci_streaming(iter(AGGREGATED), bootstrap_iterations=50, seed=7, chunk_size=1)
+        self.assertEqual(first, second)
+
+    def test_empty_input(self):
+        result = compute_metrics_with_ci_streaming(iter([]), bootstrap_iterations=10, seed=0)
+        self.assertEqual(result["statements"], 0)
+        self.assertEqual(result["components"], {})
+
+
+class TestEvaluateBootstrap(unittest.TestCase):
+    def run_main(self, **kwargs):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(tmp.name)
+        Path("data").mkdir()
+        Path("data/easy_regulative_statements.csv").write_text(
+            "Input,Output\n"
+            "The agency must inspect.,A(agency) D(must) I(inspect)\n"
+            "The board may appeal.,A(board) D(may) I(appeal)\n",
+            encoding="utf-8",
+        )
+        with contextlib.redirect_stdout(io.StringIO()), self.assertLogs(level="INFO") as logs:
+            evaluate.main(
+                runs=1, statement_type="regulative", difficulty="easy", include_examples=False,
+                provider="mock", bootstrap_iterations=10, mock=dict(mock_latency="fixed:0"), **kwargs,
+            )
+        return [record.getMessage() for record in logs.records]
+
+    def test_exact_multinomial_bootstrap_is_default(self):
+        with mock.patch("evaluate.compute_metrics_with_ci", wraps=compute_metrics_with_ci) as exact, \
+                mock.patch("evaluate.compute_metrics_with_ci_streaming") as poisson:
+            messages = self.run_main()
+        exact.assert_called_once()
+        self.assertIsInstance(exact.call_args.args[0], list)
+        self.assertEqual(len(exact.call_args.args[0]), 2)
+        poisson.assert_not_called()
+        self.assertIn("Confidence intervals: multinomial (exact) bootstrap, 10 iterations", messages)
+
+    def test_poisson_bootstrap_behind_flag(self):
+        with mock.patch("evaluate.compute_metrics_with_ci") as exact, \
+                mock.patch("evaluate.compute_metrics_with_ci_streaming",
+                           wraps=compute_metrics_with_ci_streaming) as poisson:
+            messages = self.run_main(poisson_bootstrap=True)
+        poisson.assert_called_once()
+        exact.assert_not_called()
+        self.assertIn("Confidence intervals: Poisson (streaming) bootstrap, 10 iterations", messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
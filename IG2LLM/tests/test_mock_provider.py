@@ -0,0 +1,71 @@
+import asyncio
+import json
+import random
+import unittest
+
+from services.mock_provider import MockAPIError, MockClient, MockTimeoutError, latency_sampler, malform
+from services.rate_limit import http_status, is_rate_limit_error, retry_after_seconds
+
+ANSWERS = {
+    "The commission shall optimize public investment.": [
+        {"A": ["commission"], "D": ["shall"], "I": ["optimize"]},
+        {"A": ["commission"], "I": ["optimize"]},
+    ],
+}
+STATEMENT = next(iter(ANSWERS))
+
+
+class TestMockProvider(unittest.TestCase):
+    def test_latency_specs(self):
+        rng = random.Random(0)
+        self.assertEqual(latency_sampler("fixed:0.25")(rng), 0.25)
+        self.assertTrue(0.1 <= latency_sampler("uniform:0.1,0.2")(rng) <= 0.2)
+        self.assertGreaterEqual(latency_sampler("normal:0,1")(rng), 0.0)
+        for spec in ("gamma:1", "fixed", "uniform:1", "lognormal:a,b"):
+            with self.assertRaises(ValueError):
+                latency_sampler(spec)
+
+    def test_replays_runs_for_extraction_lo_and_packed_prompts(self):
+        client = MockClient(ANSWERS, latency="fixed:0")
+        first, second = client.complete("system", STATEMENT, 2, timeout=1).candidates
+        self.assertEqual(json.loads(first), ANSWERS[STATEMENT][0])
+        self.assertEqual(json.loads(second), ANSWERS[STATEMENT][1])
+
+        lo = client.complete("lo", f"Input: {STATEMENT}\n{{'A': ['commission']}}", 1, timeout=1)
+        self.assertEqual(json.loads(lo.candidates[0]), ANSWERS[STATEMENT][0])
+
+        packed = json.dumps([{"id": "1", "input": STATEMENT}, {"id": "2", "input": "Unknown."}])
+        resp = asyncio.run(client.acomplete("packed", packed, 1, timeout=1))
+        results = json.loads(resp.candidates[0])["results"]
+        self.assertEqual([r["id"] for r in results], ["1", "2"])
+        self.assertEqual(results[1]["components"], {})
+        self.assertGreater(resp.input_tokens, 0)
+
+    def test_injected_errors_look_like_provider_errors(self):
+        client = MockClient(ANSWERS, latency="fixed:0", rate_limit_rate=1.0, retry_after=2.0)
+        with self.assertRaises(MockAPIError) as ctx:
+            client.complete("system", STATEMENT, 1, timeout=1)
+        self.assertTrue(is_rate_limit_error(ctx.exception))
+        self.assertEqual(retry_after_seconds(ctx.exception), 2.0)
+
+        client = MockClient(ANSWERS, latency="fixed:0", server_error_rate=1.0)
+        with self.assertRaises(MockAPIError) as ctx:
+            client.complete("system", STATEMENT, 1, timeout=1)
+        self.assertEqual(http_status(ctx.exception), 500)
+
+        # Latency beyond the request timeout is a timeout as well
+        with self.assertRaises(MockTimeoutError):
+            MockClient(ANSWERS, latency="fixed:5").complete("system", STATEMENT, 1, timeout=0.01)
+
+    def test_malformed_output(self):
+        text = json.dumps(ANSWERS[STATEMENT][0])
+        self.assertTrue(malform(text, "trailing_comma").endswith(",}"))
+        self.assertLess(len(malform(text, "truncated")), len(text))
+        client = MockClient(ANSWERS, latency="fixed:0", malformed_rate=1.0, seed=0)
+        for candidate in client.complete("system", STATEMENT, 4, timeout=1).candidates:
+            with self.assertRaises(json.JSONDecodeError):
+                json.loads(candidate)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import unittest
+from typing import Callable, Dict, List
+
+from model import Regulative
+from services.llm_interface import LLMConfig, LLMInterface
+
+STATEMENTS = {str(i): f"Agency {i} must inspect." for i in range(1, 7)}
+
+
+def answer(text: str) -> Dict[str, List[str]]:
+    return {"A": [text.split(" must")[0]], "D": ["must"]}
+
+
+class TestPackedExtraction(unittest.TestCase):
+    def setUp(self):
+        self.llm = LLMInterface(config=LLMConfig(provider="mock", mock_latency="fixed:0"))
+        self.llm.client.answers = {text: [answer(text)] for text in STATEMENTS.values()}
+        self.requests: List[List[str]] = []
+
+    def edit_responses(self, edit: Callable[[int, Dict], str]) -> None:
+        """Route packed answers through `edit(request number, parsed answer)`."""
+        acomplete = self.llm.client.acomplete
+
+        async def wrapped(system_prompt, user_prompt, n, timeout):
+            resp = await acomplete(system_prompt, user_prompt, n, timeout)
+            number = len(self.requests)
+            self.requests.append([item["id"] for item in json.loads(user_prompt)])
+            return resp._replace(candidates=[edit(number, json.loads(c)) for c in resp.candidates])
+
+        self.llm.client.acomplete = wrapped
+
+    def run_packed(self, pack_size: int) -> Dict[str, List[Dict]]:
+        return asyncio.run(self.llm.arun_packed(
+            list(STATEMENTS.items()), system_prompt="", response_model=Regulative, pack_size=pack_size,
+        ))
+
+    def check(self, out: Dict[str, List[Dict]]) -> None:
+        self.assertEqual(out, {sid: [answer(text)] for sid, text in STATEMENTS.items()})
+
+    def test_only_missing_statements_are_re_requested(self):
+        def drop_second(number, parsed):
+            if number == 0:
+                parsed["results"] = [r for r in parsed["results"] if r["id"] != "2"]
+            return json.dumps(parsed)
+
+        self.edit_responses(drop_second)
+        self.check(self.run_packed(pack_size=6))
+        self.assertEqual(self.requests, [["1", "2", "3", "4", "5", "6"], ["2"]])
+
+    def test_pack_shrinks_after_truncated_answer(self):
+        def truncate_first(number, parsed):
+            text = json.dumps(parsed)
+            if number == 0:
+                # Output budget ran out right after the first entry
+                return text[: text.index(', {"id": "2"')]
+            return text
+
+        self.edit_responses(truncate_first)
+        self.check(self.run_packed(pack_size=6))
+        # The complete entry is kept; the rest is re-requested in packs of half the size
+        self.assertEqual(self.requests, [["1", "2", "3", "4", "5", "6"], ["2", "3", "4"], ["5", "6"]])
+        self.assertEqual(self.llm.repairs["truncated"], 1)
+
+    def test_half_written_entry_is_re_requested(self):
+        def truncate_first(number, parsed):
+            text = json.dumps(parsed)
+            if number == 0:
+                # Cut off inside the second entry's D literal
+                return text[: text.index('"must"', text.index('"id": "2"')) + 3]
+            return text
+
+        self.edit_responses(truncate_first)
+        self.check(self.run_packed(pack_size=6))
+        self.assertEqual(self.requests, [["1", "2", "3", "4", "5", "6"], ["2", "3", "4"], ["5", "6"]])
+
+    def test_pack_shrinks_after_unparseable_answer(self):
+        self.edit_responses(lambda number, parsed: "I cannot help." if number == 0 else json.dumps(parsed))
+        self.check(self.run_packed(pack_size=4))
+        self.assertEqual(self.requests, [["1", "2", "3", "4"], ["5", "6"], ["1", "2"], ["3", "4"]])
+
+    def test_reordered_ids_stay_aligned(self):
+        def reverse(number, parsed):
+            parsed["results"].reverse()
+            return json.dumps(parsed)
+
+        self.edit_responses(reverse)
+        self.check(self.run_packed(pack_size=3))
+        self.assertEqual(self.requests, [["1", "2", "3"], ["4", "5", "6"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from services import llm_interface
+from services.llm_interface import LLMConfig, LLMInterface
+
+SYSTEM = "You extract institutional grammar components."
+
+
+class CacheNotFound(Exception):
+    """Stands in for the google-genai error returned for an expired context cache."""
+    status_code = 404
+
+
+class FakeGemini:
+    """Records context-cache calls; answers fail while they name an expired cache."""
+    def __init__(self):
+        self.created, self.deleted, self.requests = [], [], []
+        self.expired = set()
+        self.caches = SimpleNamespace(create=self.create, delete=self.delete)
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def create(self, model, config):
+        self.created.append(config.system_instruction)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+    def generate_content(self, model, config, contents):
+        self.requests.append(config)
+        if config.cached_content in self.expired:
+            raise CacheNotFound(f"404 NOT_FOUND. CachedContent not found: {config.cached_content}")
+        text = SimpleNamespace(text='{"A": ["agency"]}', thought=False)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[text]))])
+
+
+def make_llm(provider: str, **config) -> LLMInterface:
+    return LLMInterface(config=LLMConfig(provider=provider, **config), api_key="test")
+
+
+class TestRequestCaching(unittest.TestCase):
+    def test_openai_prompt_cache_key(self):
+        request = make_llm("openai")._openai_request(SYSTEM, "statement", 0.0, 15, 1)
+        self.assertEqual(len(request["prompt_cache_key"]), 32)
+        self.assertEqual(
+            make_llm("openai")._openai_request(SYSTEM, "other", 0.0, 15, 1)["prompt_cache_key"],
+            request["prompt_cache_key"],
+        )
+        request = make_llm("openai", prompt_caching=False)._openai_request(SYSTEM, "statement", 0.0, 15, 1)
+        self.assertNotIn("prompt_cache_key", request)
+
+    def test_claude_system_block_is_cacheable(self):
+        request = make_llm("claude")._claude_request(SYSTEM, "statement", 0.0, 15, 1)
+        self.assertEqual(
+            request["system"], [{"type": "text", "text": SYSTEM, "cache_control": {"type": "ephemeral"}}]
+        )
+        request = make_llm("claude", prompt_caching=False)._claude_request(SYSTEM, "statement", 0.0, 15, 1)
+        self.assertEqual(request["system"], SYSTEM)
+
+    def test_gemini_cached_content(self):
+        llm = make_llm("gemini")
+        llm.client = FakeGemini()
+        config = llm._gemini_request(SYSTEM, "statement", 0.0, 15, 1)["config"]
+        self.assertEqual(config.cached_content, "cachedContents/1")
+        self.assertIsNone(config.system_instruction)
+        llm._gemini_request(SYSTEM, "other", 0.0, 15, 1)
+        self.assertEqual(llm.client.created, [SYSTEM])
+
+        llm = make_llm("gemini", prompt_caching=False)
+        llm.client = FakeGemini()
+        config = llm._gemini_request(SYSTEM, "statement", 0.0, 15, 1)["config"]
+        self.assertIsNone(config.cached_content)
+        self.assertEqual(config.system_instruction, SYSTEM)
+        self.assertEqual(llm.client.created, [])
+
+
+class TestGeminiCacheLifetime(unittest.TestCase):
+    def setUp(self):
+        self.llm = make_llm("gemini", gemini_cache_ttl=3600)
+        self.llm.client = FakeGemini()
+
+    def test_recreated_before_ttl_and_deleted_on_close(self):
+        with mock.patch.object(llm_interface.time, "monotonic", return_value=1000.0):
+            self.assertEqual(self.llm._gemini_cached_content(SYSTEM), "cachedContents/1")
+        # Refreshed once less than 5 minutes of the hour are left
+        with mock.patch.object(llm_interface.time, "monotonic", return_value=1000.0 + 3200):
+            self.assertEqual(self.llm._gemini_cached_content(SYSTEM), "cachedContents/1")
+        with mock.patch.object(llm_interface.time, "monotonic", return_value=1000.0 + 3400):
+            self.assertEqual(self.llm._gemini_cached_content(SYSTEM), "cachedContents/2")
+        self.llm.close()
+        self.assertEqual(self.llm.client.deleted, ["cachedContents/1", "cachedContents/2"])
+
+    def test_expired_cache_is_resent_inline(self):
+        self.llm.client.expired.add("cachedContents/1")
+        self.llm._call_gemini(SYSTEM, "statement", 0.0, 15)
+        first, retry = self.llm.client.requests
+        self.assertEqual(first.cached_content, "cachedContents/1")
+        self.assertIsNone(retry.cached_content)
+        self.assertEqual(retry.system_instruction, SYSTEM)
+        self.assertFalse(self.llm._schema_rejected)
+        # The next request creates a new cache
+        self.llm._call_gemini(SYSTEM, "statement", 0.0, 15)
+        self.assertEqual(self.llm.client.requests[-1].cached_content, "cachedContents/2")
+
+    def test_async_expired_cache_is_resent_inline(self):
+        client = self.llm.client
+        client.expired.add("cachedContents/1")
+
+        async def generate_content(**request):
+            return client.generate_content(**request)
+
+        self.llm._async_client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+        with mock.patch.object(LLMInterface, "async_client", property(lambda llm: llm._async_client)):
+            asyncio.run(self.llm._acall_gemini(SYSTEM, "statement", 0.0, 15))
+        self.assertEqual([r.cached_content for r in client.requests], ["cachedContents/1", None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from prompt_templates import registry
+
+FRAGMENTS = {
+    "statement_type": "regulative",
+    "definitions": "A: attribute",
+    "guidelines": "Use the exact words.",
+    "statement_information": "Regulative statements prescribe behaviour.",
+}
+
+
+class TestRenderSystemPrompt(unittest.TestCase):
+    def setUp(self):
+        registry._RENDERED.clear()
+
+    def test_key_tracks_fragments(self):
+        key = registry.prompt_key("regulative", FRAGMENTS)
+        self.assertEqual(key, registry.prompt_key("regulative", dict(FRAGMENTS)))
+        self.assertNotEqual(key, registry.prompt_key("regulative", {**FRAGMENTS, "guidelines": "x"}))
+        self.assertNotEqual(key, registry.prompt_key("regulative_with_examples", FRAGMENTS))
+
+    def test_warm_start_skips_template_build(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = registry.render_system_prompt("regulative", cache_dir=cache_dir, **FRAGMENTS)
+            self.assertIn("Use the exact words.", cold)
+            registry._RENDERED.clear()
+            with mock.patch.object(registry, "get_template") as get_template:
+                warm = registry.render_system_prompt("regulative", cache_dir=cache_dir, **FRAGMENTS)
+            get_template.assert_not_called()
+            self.assertEqual(warm, cold)
+
+    def test_unknown_template(self):
+        with self.assertRaises(ValueError):
+            registry.render_system_prompt("procedural", **FRAGMENTS)
+
+
+if __name__ == "__main__":
+    unittest.main()
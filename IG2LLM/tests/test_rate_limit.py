@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from services.rate_limit import RateLimiter, TokenBucket, get_rate_limiter, retry_after_seconds
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_reserve_and_refill(self):
+        bucket = TokenBucket(60, now=0.0)  # one unit per second
+        self.assertEqual(bucket.reserve(60, now=0.0, scale=1.0), 0.0)
+        self.assertEqual(bucket.reserve(30, now=0.0, scale=1.0), 30.0)
+        # Half the rate doubles the wait for the same debt
+        self.assertEqual(bucket.reserve(0, now=10.0, scale=0.5), 50.0)
+        self.assertEqual(bucket.reserve(0, now=1000.0, scale=1.0), 0.0)
+        self.assertEqual(bucket.tokens, 60.0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def test_reserve_and_try_reserve(self):
+        limiter = RateLimiter(rpm=2, clock=self.clock)
+        self.assertEqual(limiter.reserve(0), 0.0)
+        self.assertTrue(limiter.try_reserve(0))
+        self.assertFalse(limiter.try_reserve(0))  # would need waiting: nothing taken
+        self.assertEqual(limiter.reserve(0), 30.0)
+        self.clock.now = 30.0
+        self.assertFalse(limiter.try_reserve(0))
+        self.clock.now = 60.0
+        self.assertTrue(limiter.try_reserve(0))
+
+    def test_aacquire_sleeps_for_the_delay(self):
+        limiter = RateLimiter(tpm=600, clock=self.clock)  # ten tokens per second
+        with mock.patch("services.rate_limit.asyncio.sleep", new=mock.AsyncMock()) as sleep:
+            asyncio.run(limiter.aacquire(600))
+            sleep.assert_not_awaited()
+            asyncio.run(limiter.aacquire(50))
+            sleep.assert_awaited_once_with(5.0)
+
+    def test_aimd_backoff_and_recovery(self):
+        limiter = RateLimiter(rpm=60, clock=self.clock, recovery_step=0.1)
+        self.assertEqual(limiter.on_rate_limited(), 1.0)
+        self.assertEqual(limiter.on_rate_limited(), 2.0)
+        self.assertEqual(limiter.scale, 0.25)
+        self.assertEqual(limiter.reserve(0), 2.0)  # dispatch paused
+        self.assertEqual(limiter.on_rate_limited(retry_after=5.0), 5.0)
+        self.assertEqual(limiter.blocked_until, 5.0)
+        limiter.on_success()
+        self.assertEqual(limiter.consecutive_limits, 0)
+        self.assertAlmostEqual(limiter.scale, 0.225)
+        for _ in range(20):
+            limiter.on_success()
+        self.assertEqual(limiter.scale, 1.0)
+
+    def test_on_success_reconciles_tokens_and_reads_headers(self):
+        limiter = RateLimiter(rpm=100, tpm=1000, clock=self.clock)
+        limiter.reserve(100)
+        limiter.on_success(
+            {"X-RateLimit-Limit-Requests": "10", "x-ratelimit-remaining-requests": "3"},
+            estimated_tokens=100, actual_tokens=300,
+        )
+        self.assertEqual(limiter.tokens.tokens, 700.0)
+        self.assertEqual(limiter.requests.per_minute, 10.0)
+        self.assertEqual(limiter.requests.tokens, 3.0)
+
+    def test_shared_limiter_takes_new_limits(self):
+        first = get_rate_limiter("test-provider", "test-model", rpm=10, tpm=None)
+        same = get_rate_limiter("test-provider", "test-model", rpm=10, tpm=None)
+        self.assertIs(first, same)
+        updated = get_rate_limiter("test-provider", "test-model", rpm=5, tpm=1000)
+        self.assertIs(updated, first)
+        self.assertEqual(first.requests.per_minute, 5.0)
+        self.assertLessEqual(first.requests.tokens, 5.0)
+        self.assertEqual(first.tokens.per_minute, 1000.0)
+        get_rate_limiter("test-provider", "test-model", rpm=None, tpm=1000)
+        self.assertIsNone(first.requests)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_headers_and_retry_delay(self):
+        def error(headers):
+            err = Exception("rate limited")
+            err.response = SimpleNamespace(headers=headers)
+            return err
+
+        self.assertEqual(retry_after_seconds(error({"retry-after-ms": "1500"})), 1.5)
+        self.assertEqual(retry_after_seconds(error({"retry-after": "bad", "retry-after-ms": "250"})), 0.25)
+        self.assertEqual(retry_after_seconds(error({"retry-after": "2"})), 2.0)
+        self.assertIsNone(retry_after_seconds(error({})))
+
+        wrapper = RuntimeError("call failed")
+        wrapper.__cause__ = Exception("429 RESOURCE_EXHAUSTED {'retryDelay': '7s'}")
+        self.assertEqual(retry_after_seconds(wrapper), 7.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
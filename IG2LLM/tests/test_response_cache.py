@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from model import Regulative
+from services.response_cache import CacheMissError, ResponseCache
+from services.schemas import output_schema
+
+CALL = dict(
+    provider="openai", model="gpt-4o-mini", system_prompt="system", user_prompt="The agency must inspect.",
+    temperature=0.0, run_index=0, lo_pass=False,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cache" / "responses.sqlite"
+        self.clock = Clock()
+        patcher = mock.patch("services.response_cache.time", SimpleNamespace(time=self.clock.time))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_key_is_stable_and_covers_every_input(self):
+        key = ResponseCache.make_key(**CALL)
+        self.assertEqual(key, ResponseCache.make_key(**CALL))
+        schema = output_schema(Regulative)
+        changes = [
+            dict(model="gpt-4o"),
+            dict(system_prompt="system, edited"),
+            dict(user_prompt="The agency may inspect."),
+            dict(temperature=0.7),
+            dict(run_index=1),
+            dict(lo_pass=True),
+            dict(extra=schema.fingerprint()),
+        ]
+        keys = {ResponseCache.make_key(**{**CALL, **change}) for change in changes}
+        self.assertEqual(len(keys), len(changes))
+        self.assertNotIn(key, keys)
+        self.assertNotEqual(
+            ResponseCache.make_key(**CALL, extra=schema.fingerprint()),
+            ResponseCache.make_key(**CALL, extra=output_schema(Regulative, packed=True).fingerprint()),
+        )
+
+    def test_put_get_round_trip_survives_reopen(self):
+        cache = ResponseCache(self.path)
+        key = ResponseCache.make_key(**CALL)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, '{"A": ["agency"]}')
+        self.assertEqual(cache.get(key), '{"A": ["agency"]}')
+        cache.close()
+        reopened = ResponseCache(self.path)
+        self.assertEqual(reopened.get(key), '{"A": ["agency"]}')
+        self.assertEqual(reopened.stats(), {"hits": 1, "misses": 0, "writes": 0, "evictions": 0})
+        reopened.close()
+
+    def test_evicts_least_recently_used_and_expired(self):
+        cache = ResponseCache(self.path, max_bytes=10)
+        for key in ("a", "b", "c"):
+            cache.put(key, "xxxx")
+            self.clock.now += 1
+        cache.get("a")  # "b" is now the least recently used
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "xxxx")
+
+        cache.max_bytes, cache.max_age = None, 10.0
+        self.clock.now += 100
+        cache.put("d", "x")
+        self.assertEqual(cache.evict(), 2)
+        self.assertEqual(cache.get("d"), "x")
+        self.assertEqual(cache.stats()["evictions"], 3)
+        cache.close()
+
+    def test_replay_is_read_only_and_raises_on_miss(self):
+        with self.assertRaises(FileNotFoundError):
+            ResponseCache(self.path, replay=True)
+        writer = ResponseCache(self.path)
+        writer.put("known", "answer")
+        writer.close()
+        cache = ResponseCache(self.path, replay=True)
+        self.assertEqual(cache.get("known"), "answer")
+        cache.put("new", "answer")
+        with self.assertRaises(CacheMissError):
+            cache.get("new")
+        self.assertEqual(cache.evict(), 0)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
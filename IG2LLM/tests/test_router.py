@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from model import Regulative
+from services.errors import ServerError
+from services.llm_interface import LLMConfig
+from services.router import CircuitBreaker, LLMRouter, parse_target
+from util.aggregation import aggregate_results
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(window=4, min_calls=4, failure_rate=0.5, cooldown=10.0,
+                                      slow_call_seconds=2.0, clock=self.clock)
+
+    def test_opens_on_failure_rate_and_slow_calls(self):
+        for ok, latency in [(True, 0.1), (False, 0.1), (True, 0.1)]:
+            self.breaker.record(ok, latency)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record(True, 5.0)  # slow: counts as a failure
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_probe(self):
+        for _ in range(4):
+            self.breaker.record(False, 0.1)
+        self.clock.now = 10.0
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())  # only one probe at a time
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now = 20.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+
+class TestLLMRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = LLMRouter(
+            ["mock/primary", "mock/backup"],
+            LLMConfig(provider="mock", mock_latency="fixed:0", max_retries=0),
+            breaker=dict(min_calls=2, window=2),
+        )
+        self.primary, self.backup = self.router.interfaces
+
+    def _arun(self):
+        return asyncio.run(self.router.arun(
+            user_prompt="The agency must inspect.", system_prompt="", response_model=Regulative,
+        ))
+
+    def test_targets_share_telemetry(self):
+        self.assertEqual(parse_target("claude"), ("claude", None))
+        self.assertEqual(self.router.target, "mock/primary")
+        self.assertIs(self.backup.telemetry, self.router.telemetry)
+        self.assertEqual(self._arun().target, "mock/primary")
+
+    def test_fails_over_and_skips_open_circuit(self):
+        self.primary.client.server_error_rate = 1.0
+        for _ in range(2):
+            self.assertEqual(self._arun().target, "mock/backup")
+        self.assertEqual(self.router.breakers[0].state, CircuitBreaker.OPEN)
+        calls = len(self.router.telemetry.records)
+        self.assertEqual(self._arun().target, "mock/backup")
+        # The open primary is no longer called
+        self.assertEqual(len(self.router.telemetry.records), calls + 1)
+
+    def test_raises_when_every_target_fails(self):
+        self.primary.client.server_error_rate = 1.0
+        self.backup.client.server_error_rate = 1.0
+        with self.assertRaises(ServerError):
+            self._arun()
+
+    def test_aggregation_keeps_model(self):
+        data = [{"input": "s", "expected_components": {"A": ["x"]}, "results": [{"A": ["x"]}],
+                 "model": "mock/backup"}]
+        self.assertEqual(aggregate_results(data)[0]["model"], "mock/backup")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from model import Regulative
+from services.llm_interface import PROVIDERS, LLMConfig, LLMInterface
+
+STATEMENT = "The agency must inspect."
+ANSWER = {"A": ["agency"], "D": ["must"], "I": ["inspect"]}
+
+
+def make_llm(**config) -> LLMInterface:
+    llm = LLMInterface(config=LLMConfig(provider="mock", mock_latency="fixed:0", **config))
+    llm.client.answers = {STATEMENT: [ANSWER]}
+    return llm
+
+
+def run(llm: LLMInterface, runs: int, **kwargs):
+    return llm.run(user_prompt=STATEMENT, system_prompt="", response_model=Regulative, runs=runs, **kwargs)
+
+
+class TestCandidateFanOut(unittest.TestCase):
+    def test_runs_share_requests_up_to_max_candidates(self):
+        llm = make_llm()
+        self.assertEqual(run(llm, 11), [ANSWER] * 11)
+        self.assertEqual(llm.client.requests, 2)
+        self.assertEqual([r.candidates for r in llm.telemetry.records], [8, 3])
+        self.assertEqual([r.attempt for r in llm.telemetry.records], [1, 9])
+
+    def test_async_batches_follow_provider_limit(self):
+        llm = make_llm()
+        with mock.patch.dict(PROVIDERS["mock"], {"max_candidates": 3}):
+            out = asyncio.run(llm.arun(
+                user_prompt=STATEMENT, system_prompt="", response_model=Regulative, runs=7,
+            ))
+        self.assertEqual(out, [ANSWER] * 7)
+        self.assertEqual(sorted(r.candidates for r in llm.telemetry.records), [1, 3, 3])
+
+    def test_without_multi_sample_every_run_is_a_request(self):
+        llm = make_llm(multi_sample=False)
+        self.assertEqual(len(run(llm, 4)), 4)
+        self.assertEqual(llm.client.requests, 4)
+
+    def test_only_uncached_runs_are_requested(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = str(Path(tmp) / "cache.sqlite")
+            run(make_llm(cache_path=cache_path), 2)
+            llm = make_llm(cache_path=cache_path)
+            self.assertEqual(run(llm, 4), [ANSWER] * 4)
+            self.assertEqual(llm.client.requests, 1)
+            records = llm.telemetry.records
+            self.assertEqual([r.response_cache_hit for r in records], [True, True, False])
+            self.assertEqual(records[-1].candidates, 2)
+            llm.cache.close()
+
+    def test_missing_candidates_are_resampled(self):
+        llm = make_llm()
+        complete = llm.client.complete
+        with mock.patch.object(
+            llm.client, "complete",
+            side_effect=lambda system, user, n, timeout: complete(system, user, min(n, 2), timeout),
+        ):
+            self.assertEqual(run(llm, 3), [ANSWER] * 3)
+        first = llm.telemetry.records[0]
+        self.assertEqual(first.candidates, 3)
+        self.assertEqual(sorted(first.outcomes), ["json_error", "ok", "ok"])
+        self.assertEqual(llm.client.requests, 2)
+
+    def test_lo_pass_runs_per_candidate(self):
+        llm = make_llm()
+        self.assertEqual(run(llm, 2, lo_prompt="Revise the components."), [ANSWER] * 2)
+        kinds = [r.kind for r in llm.telemetry.records]
+        self.assertEqual(sorted(kinds), ["extraction", "lo", "lo"])
+        for record in llm.telemetry.records:
+            self.assertEqual(record.parse_outcome, "ok")
+
+    def test_truncated_candidate_does_not_vote(self):
+        llm = make_llm()
+        complete = llm.client.complete
+
+        def truncate_first(system, user, n, timeout):
+            resp = complete(system, user, n, timeout)
+            if llm.client.requests == 1:
+                # Cut off inside the I literal: repair would yield I == []
+                text = resp.candidates[0]
+                resp = resp._replace(candidates=[text[: text.index("inspect") + 3]])
+            return resp
+
+        with mock.patch.object(llm.client, "complete", side_effect=truncate_first):
+            self.assertEqual(run(llm, 1), [ANSWER])
+        self.assertEqual(llm.client.requests, 2)
+        self.assertEqual([r.parse_outcome for r in llm.telemetry.records], ["json_error", "ok"])
+        self.assertEqual(llm.repairs["truncated"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
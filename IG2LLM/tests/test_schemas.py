@@ -0,0 +1,132 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from model.classes import Constitutive, Regulative
+from services.errors import BadRequestError, classify_error
+from services.llm_interface import LLMConfig, LLMInterface
+from services.schemas import output_schema
+from services.telemetry import CallRecord
+
+
+class TestOutputSchema(unittest.TestCase):
+    def test_properties_use_aliases(self):
+        schema = output_schema(Regulative).schema
+        self.assertIn("A,p", schema["properties"])
+        self.assertIn("Bdir,p", schema["properties"])
+        self.assertNotIn("Ap", schema["properties"])
+
+    def test_strict_form(self):
+        schema = output_schema(Constitutive).schema
+        self.assertEqual(schema["required"], list(schema["properties"]))
+        self.assertFalse(schema["additionalProperties"])
+        for prop in schema["properties"].values():
+            self.assertEqual(prop, {"type": "array", "items": {"type": "string"}})
+
+    def test_packed_wraps_components(self):
+        packed = output_schema(Regulative, packed=True)
+        self.assertEqual(packed.name, "RegulativePack")
+        entry = packed.schema["properties"]["results"]["items"]
+        self.assertEqual(entry["properties"]["components"], output_schema(Regulative).schema)
+
+    def test_schema_answer_validates(self):
+        # A schema-conforming answer (every key present, empty lists for absent
+        # components) validates and drops the empty components.
+        answer = {name: [] for name in output_schema(Regulative).schema["properties"]}
+        answer.update({"A": ["commission"], "Bdir,p": ["public"]})
+        self.assertEqual(
+            Regulative.model_validate(answer).to_dict(),
+            {"A": ["commission"], "Bdir,p": ["public"]},
+        )
+
+    def test_tool_keys_are_valid_tool_property_names(self):
+        schema = output_schema(Regulative, tool_keys=True)
+        properties = schema.schema["properties"]
+        self.assertIn("A_p", properties)
+        self.assertIn("Bdir_p", properties)
+        self.assertNotIn("A,p", properties)
+        for key in properties:
+            self.assertRegex(key, r"^[a-zA-Z0-9_.-]{1,64}$")
+        self.assertEqual(schema.schema["required"], list(properties))
+        self.assertNotEqual(schema.fingerprint(), output_schema(Regulative).fingerprint())
+        self.assertEqual(
+            output_schema(Constitutive, tool_keys=True).renamed,
+            (("E_p", "E,p"), ("P_p", "P,p")),
+        )
+
+    def test_tool_keys_are_restored(self):
+        schema = output_schema(Regulative, tool_keys=True)
+        self.assertEqual(
+            schema.restore({"A": ["student"], "A_p": ["every"], "Bdir_p": []}),
+            {"A": ["student"], "A,p": ["every"], "Bdir,p": []},
+        )
+        packed = output_schema(Regulative, packed=True, tool_keys=True)
+        entry = packed.schema["properties"]["results"]["items"]
+        self.assertIn("Bind_p", entry["properties"]["components"]["properties"])
+        self.assertEqual(
+            packed.restore({"results": [{"id": 1, "components": {"A_p": ["every"]}}]}),
+            {"results": [{"id": 1, "components": {"A,p": ["every"]}}]},
+        )
+
+    def test_claude_tool_input_is_restored(self):
+        schema = output_schema(Regulative, tool_keys=True)
+        resp = SimpleNamespace(
+            content=[SimpleNamespace(type="tool_use", input={"A": ["student"], "A_p": ["every"]})],
+            usage=SimpleNamespace(input_tokens=10, output_tokens=5, cache_read_input_tokens=0),
+        )
+        response = LLMInterface._claude_response(resp, {}, schema)
+        self.assertEqual(json.loads(response.text), {"A": ["student"], "A,p": ["every"]})
+        self.assertEqual(Regulative.model_validate(json.loads(response.text)).to_dict(),
+                         {"A": ["student"], "A,p": ["every"]})
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+def adapter_error(message: str) -> BadRequestError:
+    """A provider 400 as raised by the adapters (classified, with the SDK error as cause)."""
+    try:
+        raise BadRequest(message)
+    except BadRequest as err:
+        try:
+            raise classify_error(err, "mock") from err
+        except BadRequestError as classified:
+            return classified
+
+
+class TestSchemaRejection(unittest.TestCase):
+    def setUp(self):
+        self.llm = LLMInterface(config=LLMConfig(provider="mock", mock_latency="fixed:0"))
+        self.record = CallRecord(provider="mock", model="mock", kind="extraction", attempt=1)
+        self.schemas = []
+
+    def dispatch(self, error):
+        call_mock = self.llm._call_mock
+
+        def call(system_prompt, user_prompt, temperature, timeout, n, schema):
+            self.schemas.append(schema)
+            if schema is not None:
+                raise error
+            return call_mock(system_prompt, user_prompt, temperature, timeout, n, schema)
+
+        with mock.patch.object(self.llm, "_call_mock", side_effect=call):
+            return self.llm._dispatch(
+                "", "statement", 0.0, 15, 1, self.record, schema=output_schema(Regulative)
+            )
+
+    def test_schema_error_falls_back_to_text(self):
+        self.dispatch(adapter_error("Invalid schema for response_format 'Regulative'"))
+        self.assertTrue(self.llm._schema_rejected)
+        self.assertEqual([s is None for s in self.schemas], [False, True])
+
+    def test_other_bad_requests_keep_the_schema(self):
+        with self.assertRaises(BadRequestError):
+            self.dispatch(adapter_error("This model's maximum context length is 128000 tokens"))
+        self.assertEqual(len(self.schemas), 1)
+        self.assertFalse(self.llm._schema_rejected)
+        self.assertIsNotNone(self.llm._output_schema(Regulative))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from model import Regulative
+from services.json_extract import matches_model
+from services.llm_interface import LLMConfig, LLMInterface
+from services.streaming import StreamCollector
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class TestStreamCollector(unittest.TestCase):
+    def test_done_once_every_candidate_has_an_answer(self):
+        collector = StreamCollector(2, matches_model(Regulative), clock=Clock())
+        self.assertFalse(collector.feed(0, 'Reasoning {"note": 1} then {"A": ["the'))
+        self.assertFalse(collector.feed(0, ' agency"]}'))
+        self.assertFalse(collector.feed(1, ""))
+        self.assertTrue(collector.feed(1, '{"D": ["must"]} Explanation: ...'))
+        self.assertEqual(collector.first_token, 1.0)
+        self.assertEqual(collector.json_complete, 2.0)
+        self.assertEqual(collector.candidates(), [
+            'Reasoning {"note": 1} then {"A": ["the agency"]}',
+            '{"D": ["must"]} Explanation: ...',
+        ])
+
+    def test_claude_tool_json_events(self):
+        collector = StreamCollector(1, matches_model(Regulative))
+        usage = {}
+        events = [
+            SimpleNamespace(type="message_start", message=SimpleNamespace(usage=SimpleNamespace(
+                input_tokens=10, cache_read_input_tokens=90, cache_creation_input_tokens=0,
+                output_tokens=1,
+            ))),
+            SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(partial_json='{"A": ')),
+            SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(partial_json='["x"]}')),
+        ]
+        stopped = [LLMInterface._feed_claude_event(collector, event, usage) for event in events]
+        self.assertEqual(stopped, [False, False, True])
+        self.assertEqual(usage, {"input_tokens": 100, "cached_input_tokens": 90})
+        self.assertTrue(collector.cut)
+
+
+class TestStreamingCalls(unittest.TestCase):
+    def _llm(self, stream):
+        llm = LLMInterface(config=LLMConfig(
+            provider="mock", stream=stream, mock_latency="fixed:0", mock_explanation_tokens=200,
+        ))
+        llm.client.answers = {"The agency must inspect.": [{"A": ["agency"], "D": ["must"]}]}
+        return llm
+
+    def test_stream_is_closed_after_the_answer(self):
+        results = {}
+        for stream in (False, True):
+            llm = self._llm(stream)
+            out = asyncio.run(llm.arun(
+                user_prompt="The agency must inspect.", system_prompt="", response_model=Regulative,
+            ))
+            results[stream] = (out, llm.telemetry.records[0])
+        (plain, plain_record), (streamed, record) = results[False], results[True]
+        self.assertEqual(streamed, plain)
+        self.assertTrue(record.stream_cut)
+        self.assertIsNotNone(record.ttft)
+        self.assertLessEqual(record.ttft, record.time_to_json)
+        self.assertLess(record.completion_tokens, plain_record.completion_tokens - 150)
+        self.assertIsNone(plain_record.ttft)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.telemetry import CallRecord, CallStats, Telemetry, estimate_cost, summarize
+
+PRICING = {
+    "openai/small": {"input": 1.0, "cached_input": 0.5, "output": 2.0},
+    "openai/large": {"input": 10.0, "output": 20.0},
+}
+
+
+def record(kind="extraction", model="small", latency=1.0, **fields) -> CallRecord:
+    return CallRecord(provider="openai", model=model, kind=kind, attempt=1, latency=latency, **fields)
+
+
+class TestTelemetrySink(unittest.TestCase):
+    def test_record_is_written_once_every_candidate_is_resolved(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "calls.telemetry.jsonl"
+            telemetry = Telemetry(path)
+            sampled = record(candidates=2)
+            failed = record(error="timeout")
+            unresolved = record()
+            for r in (sampled, failed, unresolved):
+                telemetry.finish(r)
+            telemetry.resolve(None, "ok")  # cache-less callers pass no record
+            telemetry.resolve(sampled, "ok")
+            self.assertEqual(len(path.read_text().splitlines()), 1)  # only the failed call
+            telemetry.resolve(sampled, "json_error")
+            telemetry.close()
+            rows = [json.loads(line) for line in path.read_text().splitlines()]
+        self.assertEqual([row["call_id"] for row in rows],
+                         [failed.call_id, sampled.call_id, unresolved.call_id])
+        self.assertEqual([row["parse_outcome"] for row in rows], ["error", "json_error", "unresolved"])
+
+
+class TestCost(unittest.TestCase):
+    def test_estimate_cost(self):
+        call = record(prompt_tokens=1000, cached_prompt_tokens=400, completion_tokens=200)
+        self.assertAlmostEqual(estimate_cost(call, PRICING["openai/small"]), 1200 / 1e6)
+        # Without a cached price, cached tokens are billed as input
+        self.assertAlmostEqual(estimate_cost(call, PRICING["openai/large"]), 14000 / 1e6)
+        self.assertEqual(estimate_cost(call, None), 0.0)
+        call.response_cache_hit = True
+        self.assertEqual(estimate_cost(call, PRICING["openai/small"]), 0.0)
+
+
+class TestSummarize(unittest.TestCase):
+    def test_percentiles_cost_and_cache_hits(self):
+        records = [record(latency=float(i), prompt_tokens=100, completion_tokens=10) for i in range(1, 101)]
+        records += [
+            record(model="large", latency=None, response_cache_hit=True, prompt_tokens=100),
+            record(kind="lo", model="large", latency=2.0, prompt_tokens=1000, completion_tokens=100,
+                   rate_limit_retries=1),
+        ]
+        for r in records:
+            r.outcomes.append("ok")
+        records[0].outcomes = ["repaired"]
+        records[1].outcomes = ["validation_error"]
+
+        summary = summarize(records, statements=10, runs=1, pricing=PRICING)
+        self.assertEqual(set(summary), {"extraction", "lo", "all"})
+        extraction = summary["extraction"]
+        self.assertEqual(extraction["calls"], 101)
+        self.assertEqual(extraction["cache_hits"], 1)
+        # Cache hits have no provider latency and are left out of the percentiles
+        self.assertAlmostEqual(extraction["p50"], 50.5)
+        self.assertAlmostEqual(extraction["p95"], 95.05)
+        self.assertAlmostEqual(extraction["p99"], 99.01)
+        self.assertEqual(extraction["tokens_per_statement"], (100 * 110 + 100) / 10)
+        self.assertEqual((extraction["repaired"], extraction["parse_failures"]), (1, 1))
+        # 100 small calls at 120 µ$ each; the cached large call is free
+        self.assertAlmostEqual(extraction["cost"], 100 * 120 / 1e6)
+        self.assertAlmostEqual(summary["lo"]["cost"], 12000 / 1e6)
+        self.assertEqual(summary["lo"]["retry_rate"], 1.0)
+        self.assertAlmostEqual(summary["all"]["cost"], extraction["cost"] + summary["lo"]["cost"])
+        self.assertEqual(summary["all"]["cache_hits"], 1)
+        self.assertIsNone(summary["all"]["ttft_p50"])
+
+    def test_running_summary_keeps_only_recent_records(self):
+        records = [
+            record(kind=("lo" if i % 3 else "extraction"), model=("large" if i % 2 else "small"),
+                   latency=i / 10, prompt_tokens=100 + i, cached_prompt_tokens=i % 7,
+                   completion_tokens=10, transient_retries=i % 5 == 0,
+                   hedged=i % 4 == 0, ttft=(i / 20 if i % 2 else None))
+            for i in range(50)
+        ]
+        telemetry = Telemetry(keep=10)
+        for i, r in enumerate(records):
+            r.attempt = 1 + i % 3
+            r.outcomes.append("json_error" if r.attempt == 3 else "ok")
+            telemetry.finish(r)
+        telemetry.close()
+        self.assertEqual(list(telemetry.records), records[-10:])
+        self.assertEqual(
+            telemetry.summarize(statements=10, runs=2, pricing=PRICING),
+            summarize(records, statements=10, runs=2, pricing=PRICING),
+        )
+        self.assertEqual(telemetry.summarize(statements=10, runs=2)["all"]["calls"], 50)
+
+    def test_latency_sample_is_bounded(self):
+        stats = CallStats(sample_size=100)
+        for i in range(10_000):
+            stats.add(record(latency=float(i)))
+        self.assertEqual(stats.calls, 10_000)
+        self.assertEqual(len(stats.latencies.values), 100)
+        self.assertLess(abs(stats.summary(statements=1, runs=1)["p50"] - 5000), 1500)
+
+    def test_only_one_kind_has_no_total(self):
+        summary = summarize([record()], statements=1, runs=1)
+        self.assertEqual(list(summary), ["extraction"])
+        self.assertEqual(summary["extraction"]["cost"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
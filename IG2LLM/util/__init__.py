@@ -1,7 +1,22 @@
-from .convert_to_json import csv_to_json
-from .aggregation import aggregate_results
+from .convert_to_json import csv_to_json, iter_csv
+from .aggregation import (
+    IncrementalAggregator,
+    aggregate_results,
+    is_consensus_decided,
+    iter_aggregated,
+    min_presence,
+)
+from .fuzzy import VariantClusterer, align_to_expected, normalize_variant
 
 __all__ = [
     "csv_to_json",
+    "iter_csv",
+    "IncrementalAggregator",
     "aggregate_results",
+    "iter_aggregated",
+    "is_consensus_decided",
+    "min_presence",
+    "VariantClusterer",
+    "align_to_expected",
+    "normalize_variant",
 ]
\ No newline at end of file
@@ -1,14 +1,185 @@
-from collections import defaultdict, Counter
 from math import ceil
+from typing import Dict, Hashable, List, Optional
 import json
 
+from .fuzzy import VariantClusterer, align_to_expected
+
 def order_dict(d):
     """
     Returns a new dictionary with keys sorted alphabetically.
     """
     return {k: d[k] for k in sorted(d)}
 
-def aggregate_results(data, save=False):
+def min_presence(total_runs):
+    """
+    Number of runs a variant must appear in to be kept by `aggregate_results`.
+    """
+    return 1 if total_runs == 1 else max(2, ceil(total_runs / 2))
+
+class _Votes:
+    """Running vote counts for one statement."""
+    __slots__ = ("runs", "counts", "first_run", "clusters")
+
+    def __init__(self):
+        self.runs = 0
+        # symbol -> clusterer mapping variants to cluster ids (fuzzy mode only)
+        self.clusters: Dict[str, VariantClusterer] = {}
+        # symbol -> {variant: count}; dicts keep first-seen order
+        self.counts: Dict[str, Dict[str, int]] = {}
+        # symbol -> {variant: position in the first run}
+        self.first_run: Dict[str, Dict[str, int]] = {}
+
+
+class IncrementalAggregator:
+    """
+    Online counterpart of `aggregate_results`.
+
+    Runs are added one at a time as they arrive (`add_run`), and the current
+    consensus of a statement can be read at any point (`consensus`). Vote counts
+    and first-run positions are kept in dicts, so adding a run costs O(1) per
+    variant and ordering the consensus needs no list lookups.
+
+    With `fuzzy` (a similarity threshold), near-duplicate variants of a symbol
+    ("the commission", "Commission.") are merged by `util.fuzzy.VariantClusterer`
+    before voting; a run votes for a cluster at most once, and the consensus uses
+    each cluster's most frequent spelling.
+
+    Example:
+        aggregator = IncrementalAggregator(total_runs=5)
+        aggregator.add_run("s1", {"A": ["commission"], "D": ["shall"]})
+        aggregator.consensus("s1")
+    """
+    def __init__(self, total_runs: Optional[int] = None, fuzzy: Optional[float] = None):
+        # Runs requested per statement; defaults to the number of runs added so far
+        self.total_runs = total_runs
+        self.fuzzy = fuzzy
+        self._votes: Dict[Hashable, _Votes] = {}
+
+    def add_run(self, statement_id: Hashable, result: Dict[str, List[str]]) -> None:
+        """Count the variants of one run of `statement_id`."""
+        votes = self._votes.get(statement_id)
+        if votes is None:
+            votes = self._votes[statement_id] = _Votes()
+        first = votes.runs == 0
+        for symbol, variants in result.items():
+            counts = votes.counts.setdefault(symbol, {})
+            if self.fuzzy is not None:
+                clusterer = votes.clusters.get(symbol)
+                if clusterer is None:
+                    clusterer = votes.clusters[symbol] = VariantClusterer(self.fuzzy)
+                variants = dict.fromkeys(clusterer.assign(variant) for variant in variants)
+            if first:
+                order = votes.first_run.setdefault(symbol, {})
+            for variant in variants:
+                if first:
+                    order.setdefault(variant, len(order))
+                counts[variant] = counts.get(variant, 0) + 1
+        votes.runs += 1
+
+    def runs(self, statement_id: Hashable) -> int:
+        """Number of runs added for `statement_id`."""
+        votes = self._votes.get(statement_id)
+        return votes.runs if votes is not None else 0
+
+    def _total(self, votes: _Votes, total_runs: Optional[int]) -> int:
+        if total_runs is not None:
+            return total_runs
+        return self.total_runs if self.total_runs is not None else votes.runs
+
+    def consensus(self, statement_id: Hashable, total_runs: Optional[int] = None) -> Dict[str, List[str]]:
+        """
+        Current aggregated components of `statement_id` (symbol -> variants), keeping
+        variants that reach `min_presence(total_runs)`, ordered as in the first run
+        (variants absent from the first run follow in first-seen order).
+        """
+        votes = self._votes.get(statement_id)
+        if votes is None:
+            return {}
+        threshold = min_presence(self._total(votes, total_runs))
+        aggregated = {}
+        for symbol, counts in votes.counts.items():
+            qualifying = [variant for variant, count in counts.items() if count >= threshold]
+            if qualifying:
+                order = votes.first_run.get(symbol, {})
+                qualifying.sort(key=lambda variant: order.get(variant, len(order)))
+                if symbol in votes.clusters:
+                    qualifying = [votes.clusters[symbol].label(cluster) for cluster in qualifying]
+                aggregated[symbol] = qualifying
+        return aggregated
+
+    def is_decided(self, statement_id: Hashable, total_runs: Optional[int] = None) -> bool:
+        """
+        True when the consensus of `statement_id` can no longer change, whatever the
+        remaining runs return (see `is_consensus_decided`).
+        """
+        votes = self._votes.get(statement_id) or _Votes()
+        total_runs = self._total(votes, total_runs)
+        remaining = total_runs - votes.runs
+        if remaining <= 0:
+            return True
+        threshold = min_presence(total_runs)
+        if remaining >= threshold:
+            return False
+        return all(
+            count >= threshold or count + remaining < threshold
+            for counts in votes.counts.values()
+            for count in counts.values()
+        )
+
+    def pop(self, statement_id: Hashable) -> None:
+        """Forget `statement_id` (e.g. once its consensus has been written out)."""
+        self._votes.pop(statement_id, None)
+
+
+def is_consensus_decided(results, total_runs):
+    """
+    Returns True when the aggregated result of a statement can no longer change,
+    whatever the remaining `total_runs - len(results)` runs return.
+
+    A variant is decided once it has reached the minimum presence, or when it could
+    not reach it even if it appeared in every remaining run. Unseen variants are
+    decided as soon as fewer runs remain than the minimum presence.
+    """
+    aggregator = IncrementalAggregator(total_runs)
+    for res in results:
+        aggregator.add_run(0, res)
+    return aggregator.is_decided(0)
+
+def aggregate_item(item, fuzzy=None):
+    """
+    Aggregates the runs of a single test case (see `aggregate_results`).
+    """
+    results_list = item.get("results", [])
+    aggregator = IncrementalAggregator(item.get("runs_requested", len(results_list)), fuzzy=fuzzy)
+    for res in results_list:
+        aggregator.add_run(0, res)
+
+    expected = item.get("expected_components", {})
+    # Rows from the consensus LO strategy carry the refined aggregate
+    actual = item["consensus"] if "consensus" in item else aggregator.consensus(0)
+    if fuzzy is not None:
+        actual = align_to_expected(expected, actual, fuzzy)
+
+    # Sort the dictionaries alphabetically by their keys.
+    aggregated = {
+        "input": item.get("input", ""),
+        "expected_components": order_dict(expected),
+        "actual_components": order_dict(actual)
+    }
+    # Routed runs record the provider/model that produced them
+    if "model" in item:
+        aggregated["model"] = item["model"]
+    return aggregated
+
+def iter_aggregated(data, fuzzy=None):
+    """
+    Lazily aggregates an iterable of test cases, one at a time, so results can be
+    streamed from disk into the metrics without holding them all in memory.
+    """
+    for item in data:
+        yield aggregate_item(item, fuzzy=fuzzy)
+
+def aggregate_results(data, save=False, fuzzy=None):
     """
     Aggregates the results of multiple runs of the same test case.
     
@@ -16,52 +187,25 @@ def aggregate_results(data, save=False):
       - Each result is a dictionary mapping symbols to lists of variants.
       - For each symbol, the variants are counted across runs.
       - A variant is kept if its count is at least the computed minimum presence
-        (based on the number of runs).
+        (based on the number of runs requested; with adaptive sampling this can be
+        more than the number of results recorded).
       - Variants are sorted based on their appearance order in the first run.
       - The aggregated actual components remain as a dictionary (symbol -> [variants])
         and are sorted alphabetically by key.
       - The expected components (provided as a dictionary) are similarly sorted.
+      - Test cases with a "consensus" entry (LO pass run on the aggregate) use it
+        as the aggregated components.
+      - With `fuzzy` (a similarity threshold, e.g. 0.7), near-duplicate variants are
+        merged before voting and aligned to the expected spelling before scoring
+        (see `util.fuzzy`).
     
     Returns a list of dictionaries with:
       - input: the test case input.
       - expected_components: the expected components as a sorted dictionary.
       - actual_components: the aggregated components as a sorted dictionary.
+      - model: the "provider/model" that produced the runs, when recorded.
     """
-    aggregated_items = []
-    
-    for item in data:
-        results_list = item.get("results", [])
-        total_runs = len(results_list)
-        computed_min_presence = 1 if total_runs == 1 else max(2, ceil(total_runs / 2))
-        symbol_variant_counts = defaultdict(Counter)
-        first_run_order = defaultdict(list)
-        
-        # Iterate over all runs and count the occurrences of each variant for each symbol.
-        for i, res in enumerate(results_list):
-            for symbol, variants in res.items():
-                for variant in variants:
-                    if i == 0 and variant not in first_run_order[symbol]:
-                        first_run_order[symbol].append(variant)
-                    symbol_variant_counts[symbol][variant] += 1
-        
-        aggregated_variants = {}
-        # For each symbol, filter variants by the computed minimum presence.
-        # The variants are sorted according to their order in the first run.
-        for symbol, counter in symbol_variant_counts.items():
-            qualifying = [variant for variant, count in counter.items() if count >= computed_min_presence]
-            qualifying.sort(key=lambda x: first_run_order[symbol].index(x) if x in first_run_order[symbol] else 999)
-            if qualifying:
-                aggregated_variants[symbol] = qualifying
-        
-        # Sort the dictionaries alphabetically by their keys.
-        ordered_aggregated = order_dict(aggregated_variants)
-        ordered_expected = order_dict(item.get("expected_components", {}))
-        
-        aggregated_items.append({
-            "input": item.get("input", ""),
-            "expected_components": ordered_expected,
-            "actual_components": ordered_aggregated
-        })
+    aggregated_items = list(iter_aggregated(data, fuzzy=fuzzy))
 
     if save:
         with open("data/aggregated_results.json", "w") as f:
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+# (input position, statement text), or the text alone for rows without a position
+RowKey = Union[Tuple[int, str], str]
+
+
+class CheckpointIndex:
+    """
+    Byte offset of the latest checkpoint row per statement.
+
+    Rows are keyed by their position in the input plus the statement text
+    (`row_key`), so repeated statements are checkpointed separately; rows
+    written before positions were stored are keyed by text alone and still
+    match any position (see `find`). Keys are stored as 16-byte digests, so
+    the index takes a fixed ~150 bytes per statement however long the
+    statement text is; it supports lookups (`in`, `[]`, `get`) but cannot list
+    the statements.
+    """
+    def __init__(self):
+        self._offsets: Dict[bytes, int] = {}
+
+    @staticmethod
+    def _key(key: RowKey) -> bytes:
+        if isinstance(key, tuple):
+            key = f"{key[0]}\x00{key[1]}"
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def __contains__(self, key: RowKey) -> bool:
+        return self._key(key) in self._offsets
+
+    def __getitem__(self, key: RowKey) -> int:
+        return self._offsets[self._key(key)]
+
+    def get(self, key: RowKey, default: Optional[int] = None) -> Optional[int]:
+        return self._offsets.get(self._key(key), default)
+
+    def find(self, row: int, text: str) -> Optional[int]:
+        """Offset of the statement at input position `row`, falling back to a legacy text-only row."""
+        offset = self.get((row, text))
+        return self.get(text) if offset is None else offset
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _set(self, key: RowKey, offset: int) -> None:
+        self._offsets[self._key(key)] = offset
+
+    def _discard(self, key: RowKey) -> None:
+        self._offsets.pop(self._key(key), None)
+
+
+def row_key(row: Dict) -> RowKey:
+    """Index key of a checkpoint row: its "row" position and "input", or the input alone."""
+    return (row["row"], row["input"]) if "row" in row else row["input"]
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished statements.
+
+    Every row is written and flushed as soon as its statement completes; `fsync`
+    is batched (every `fsync_every` rows or `fsync_interval` seconds, whichever
+    comes first) so durability stays cheap on long runs. A torn final line left
+    behind by a crash is ignored when the checkpoint is read back.
+    """
+    def __init__(
+        self,
+        path: Union[str, Path],
+        fsync_every: int = 32,
+        fsync_interval: float = 5.0,
+    ):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _scan(self) -> Iterator[Tuple[int, Dict]]:
+        """Yield (byte offset, row) for every readable line."""
+        if not self.path.exists():
+            return
+        offset = 0
+        with self.path.open("rb") as f:
+            for lineno, line in enumerate(f, 1):
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield start, json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    logger.warning("Skipping corrupt checkpoint line %d in %s", lineno, self.path)
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Yield the rows stored in the checkpoint, skipping unreadable lines."""
+        for _, row in self._scan():
+            yield row
+
+    def load(self) -> Dict[RowKey, Dict]:
+        """Return the stored rows keyed by `row_key` (the latest row wins)."""
+        return {row_key(row): row for row in self if "input" in row}
+
+    def index(self, keep: Optional[Callable[[Dict], bool]] = None) -> CheckpointIndex:
+        """
+        Map each statement (see `row_key`) to the byte offset of its latest row,
+        dropping statements whose latest row fails `keep`. Unlike `load`, neither rows nor
+        statement texts are kept in memory; read the rows back with `rows_at`.
+        """
+        offsets = CheckpointIndex()
+        for offset, row in self._scan():
+            if "input" not in row:
+                continue
+            if keep is None or keep(row):
+                offsets._set(row_key(row), offset)
+            else:
+                offsets._discard(row_key(row))
+        return offsets
+
+    def rows_at(self, offsets: Iterable[int]) -> Iterator[Dict]:
+        """Read the rows starting at `offsets` (as returned by `index`), in the given order."""
+        with self.path.open("rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def append(self, row: Dict) -> None:
+        """Persist one finished statement."""
+        if self._file is None:
+            self._open()
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._pending += 1
+        if (
+            self._pending >= self.fsync_every
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        ):
+            self.sync()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        torn = False
+        if self.path.exists() and self.path.stat().st_size:
+            with self.path.open("rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._file = self.path.open("a", encoding="utf-8")
+        if torn:
+            # Terminate a partially written last line so new rows stay parseable
+            self._file.write("\n")
+
+    def sync(self) -> None:
+        """Force buffered rows to disk."""
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,9 +1,28 @@
 import csv
+import re
 import sys
 import json
-from typing import List, Union
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Type
+from pydantic import BaseModel
 from model.classes import Regulative, Constitutive
 
+# A run of symbol characters directly before "(", not glued to a preceding word
+_SYMBOL = re.compile(r"(?<![A-Za-z0-9_])([A-Za-z,]+)\(")
+
+def component_symbols(model_cls: Type[BaseModel]) -> Dict[str, str]:
+    """
+    Maps every symbol of `model_cls`, by alias ("Bdir,p") and by field name
+    ("Bdirp"), to its field name.
+    """
+    symbols = {}
+    for name, field in model_cls.model_fields.items():
+        symbols[name] = name
+        if field.alias:
+            symbols[field.alias] = name
+    return symbols
+
+SYMBOLS = frozenset(component_symbols(Regulative)) | frozenset(component_symbols(Constitutive))
+
 def extract_components(s: str) -> List[str]:
     """
     Extracts components that follow the pattern <SYMBOL>(<INNER_CONTENT>) from a string.
@@ -36,6 +55,82 @@ def extract_components(s: str) -> List[str]:
             break
     return components
 
+def extract_coded_components(s: str, symbols: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Extracts components that follow the pattern <SYMBOL>(<INNER_CONTENT>) from
+    LLM coded text (see `parse_coded`); the gold data is read with `extract_components`.
+
+    Only known component symbols are matched (`symbols`, default: those of both
+    statement types, by alias or field name). A symbol may follow whitespace or
+    punctuation ("A(x),D(y)", "`A(x)`") but not a letter or digit, so prose such
+    as "PDF(s)" is skipped. The inner content may contain nested parentheses. A
+    component whose parenthesis is never closed (e.g. truncated output) ends at
+    the last ")" before the next component, or is dropped if there is none.
+    """
+    known = SYMBOLS if symbols is None else frozenset(symbols)
+    heads = []
+    for match in _SYMBOL.finditer(s):
+        symbol = match.group(1).lstrip(",")
+        if symbol in known:
+            heads.append((match.end(1) - len(symbol), match.end(1)))
+
+    components = []
+    i = 0
+    for k, (start, pos) in enumerate(heads):
+        if start < i:
+            # Inside the content of the previous component
+            continue
+        depth = 0
+        j = pos
+        while j < len(s):
+            if s[j] == '(':
+                depth += 1
+            elif s[j] == ')':
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        if j == len(s):
+            following = next((h for h, _ in heads[k + 1:] if h > pos), len(s))
+            j = s.rfind(')', pos + 1, following)
+            if j == -1:
+                continue
+        components.append(s[start:j+1])
+        i = j + 1
+    return components
+
+def components_to_dict(components: List[str], model_cls: Type[BaseModel]) -> Dict[str, List[str]]:
+    """
+    Groups extracted components by the alias of their field in `model_cls`
+    ({"A": [...], "Bdir,p": [...]}); unknown symbols and empty literals are skipped.
+    """
+    symbols = component_symbols(model_cls)
+    keys = {
+        name: field.alias or name for name, field in model_cls.model_fields.items()
+    }
+    grouped: Dict[str, List[str]] = {}
+    for token in components:
+        if "(" in token and token.endswith(")"):
+            symbol, inner = token.split("(", 1)
+            inner = inner.rsplit(")", 1)[0].strip()
+            symbol = symbol.strip()
+            if symbol in symbols and inner:
+                grouped.setdefault(keys[symbols[symbol]], []).append(inner)
+    return grouped
+
+def parse_coded(text: str, model_cls: Type[BaseModel]) -> Dict[str, List[str]]:
+    """
+    Parses coded text ("A(commission) D(shall) I(optimize)") into the component
+    dict of `model_cls`, ready for `model_validate`.
+    """
+    return components_to_dict(extract_coded_components(text, component_symbols(model_cls)), model_cls)
+
+def to_coded(components: Mapping[str, List[str]]) -> str:
+    """Inverse of `parse_coded`: one <SYMBOL>(<literal>) per literal, space separated."""
+    return " ".join(
+        f"{symbol}({literal})" for symbol, literals in components.items() for literal in literals
+    )
+
 def array_to_dict(components: List[str], statement_type: str) -> dict:
     if statement_type == "regulative":
         model_cls = Regulative
@@ -78,11 +173,11 @@ def format_components(input_text: str, output_text: str, statement_type: str) ->
         "expected_components": parsed
     }
 
-def csv_to_json(file_path: str, statement_type: str, classification: bool = False) -> List[dict]:
+def iter_csv(file_path: str, statement_type: str, classification: bool = False) -> Iterator[dict]:
     """
-    Converts a CSV file to a list of JSON objects, with optional classification mode.
+    Yields one JSON object per CSV row, with optional classification mode.
+    Rows are read lazily, so memory does not grow with the size of the file.
     """
-    output = []
     formatter = format_classification if classification else format_components
 
     with open(file_path, newline='', encoding='utf-8') as f:
@@ -91,10 +186,13 @@ def csv_to_json(file_path: str, statement_type: str, classification: bool = Fals
                 continue
             input_text = row["Input"].strip()
             output_text = row["Output"].strip()
-            formatted = formatter(input_text, statement_type) if classification else formatter(input_text, output_text, statement_type)
-            output.append(formatted)
+            yield formatter(input_text, statement_type) if classification else formatter(input_text, output_text, statement_type)
 
-    return output
+def csv_to_json(file_path: str, statement_type: str, classification: bool = False) -> List[dict]:
+    """
+    Converts a CSV file to a list of JSON objects, with optional classification mode.
+    """
+    return list(iter_csv(file_path, statement_type, classification=classification))
 
 if __name__ == "__main__":
     # CLI usage: python convert_to_json.py input.csv regulative [--classification]
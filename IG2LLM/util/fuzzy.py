@@ -0,0 +1,115 @@
+import re
+import string
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+# Leading determiners that runs add or drop inconsistently ("the commission")
+_DETERMINERS = re.compile(r"^(?:the|a|an)\s+")
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = string.punctuation + "“”‘’«»"
+
+DEFAULT_THRESHOLD = 0.7
+
+
+@lru_cache(maxsize=65536)
+def normalize_variant(text: str) -> str:
+    """
+    Canonical form of an extracted span: casefolded, whitespace collapsed,
+    surrounding punctuation and a leading determiner removed.
+    """
+    text = _WHITESPACE.sub(" ", text.casefold()).strip(_EDGE_PUNCTUATION + " ")
+    return _DETERMINERS.sub("", text)
+
+
+@lru_cache(maxsize=65536)
+def char_ngrams(text: str, n: int = 3) -> FrozenSet[str]:
+    """Character n-grams of `text`, padded with spaces so short words still match."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class VariantClusterer:
+    """
+    Online clustering of near-duplicate spans for one component symbol.
+
+    Each variant is normalized (`normalize_variant`); identical normal forms share
+    a cluster through a dict lookup. Otherwise the variant joins the most similar
+    cluster whose character n-gram Jaccard similarity is at least `threshold`, or
+    starts a new one. Candidates come from an inverted n-gram index, so only
+    clusters sharing an n-gram are scored and assignment stays cheap however many
+    variants have been seen.
+    """
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, n: int = 3):
+        self.threshold = threshold
+        self.n = n
+        self._exact: Dict[str, int] = {}
+        self._grams: List[FrozenSet[str]] = []
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        # cluster -> {spelling: count}, in first-seen order
+        self._spellings: List[Dict[str, int]] = []
+
+    def assign(self, variant: str) -> int:
+        """Return the cluster id of `variant`, creating a cluster if none is close enough."""
+        key = normalize_variant(variant)
+        cluster = self._exact.get(key)
+        if cluster is None:
+            grams = char_ngrams(key, self.n)
+            cluster = self._nearest(grams)
+            if cluster is None:
+                cluster = len(self._grams)
+                self._grams.append(grams)
+                self._spellings.append({})
+                for gram in grams:
+                    self._index[gram].append(cluster)
+            self._exact[key] = cluster
+        spellings = self._spellings[cluster]
+        spellings[variant] = spellings.get(variant, 0) + 1
+        return cluster
+
+    def label(self, cluster: int) -> str:
+        """Most frequent spelling in `cluster` (the first seen on ties)."""
+        spellings = self._spellings[cluster]
+        return max(spellings, key=spellings.get)
+
+    def _nearest(self, grams: FrozenSet[str]) -> Optional[int]:
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for cluster in self._index.get(gram, ()):
+                shared[cluster] += 1
+        best, best_key = None, None
+        for cluster, overlap in shared.items():
+            score = overlap / (len(grams) + len(self._grams[cluster]) - overlap)
+            key = (score, -cluster)
+            if score >= self.threshold and (best_key is None or key > best_key):
+                best, best_key = cluster, key
+        return best
+
+
+def align_to_expected(
+    expected: Dict[str, List[str]],
+    actual: Dict[str, List[str]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Dict[str, List[str]]:
+    """
+    Rewrite actual variants that are near-duplicates of an expected variant of the
+    same symbol to the expected spelling, so scoring counts them as matches.
+    Near-duplicate actual variants without an expected counterpart are merged into
+    their first spelling. Exact matches are always kept as they are.
+    """
+    aligned = {}
+    for symbol, variants in actual.items():
+        targets = expected.get(symbol, [])
+        exact = set(targets)
+        clusterer = VariantClusterer(threshold)
+        names: Dict[int, str] = {}
+        for target in targets:
+            names.setdefault(clusterer.assign(target), target)
+        out: Dict[str, None] = {}
+        for variant in variants:
+            name = variant if variant in exact else names.setdefault(clusterer.assign(variant), variant)
+            out[name] = None
+        aligned[symbol] = list(out)
+    return aligned